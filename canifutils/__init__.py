@@ -1,6 +1,21 @@
 __version__ = "0.1.0"
 
 from .canif import Canif
+from .canifbus import CanifBus
+from .canifgen import CanifTrafficGen
 from .caniflistener import CanifListener
+from .canifpipeline import CanifPipeline
+from .canifproc import CanifDecodeProcess
+from .canifrecord import CanifRecordReader
+from .canifshm import CanifShmReader
 
-__all__ = ["Canif", "CanifListener"]
+__all__ = [
+    "Canif",
+    "CanifBus",
+    "CanifDecodeProcess",
+    "CanifListener",
+    "CanifPipeline",
+    "CanifRecordReader",
+    "CanifShmReader",
+    "CanifTrafficGen",
+]
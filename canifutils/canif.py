@@ -1,12 +1,23 @@
 import json
 import threading
+import time
 from pathlib import Path
 
 import can
 import cantools
 
+from .canifbus import CanifBus
+from .canifconfig import CanifConfigStore
+from .canifestop import CanifEstop
 from .canifgui import CanifGui
+from .canifmux import CanifMuxTable, build_mux_tables
+from .canifprof import CanifProfiler
+from .canifrecord import CanifRecorder
+from .canifrtt import CanifRttPair
+from .canifshm import CanifShmWriter
+from .canifstore import CanifRxStatsTable, CanifSignalStore
 from .canifterm import CanifTerm
+from .caniftrigger import CanifTrigger
 
 
 class Canif(CanifGui, CanifTerm):
@@ -34,20 +45,37 @@ class Canif(CanifGui, CanifTerm):
             dict: Dictionary containing signal values loaded from the configuration file,
                   or an empty dictionary if the file is not found or cannot be read.
         """
-        sig_dict = {}
-        if fcfg_path is None:
-            fcfg_path = Path("data") / f"cangui_config_params.csv"
+        messages = CanifConfigStore.read(fcfg_path)
+        if messages:
+            print(f"Read config from {fcfg_path or CanifConfigStore.DEFAULT_PATH}")
+        return CanifConfigStore.to_sig_dict(messages)
 
-        if fcfg_path.exists():
-            try:
-                with open(fcfg_path, "r") as fcfg:
-                    sig_dict = json.load(fcfg)
-                print(f"Read config from {fcfg_path}")
-            except FileNotFoundError:
-                print(f"Config file not found at {fcfg_path}")
-            except json.JSONDecodeError:
-                print("Error reading configuration file")
+    @classmethod
+    def load_sig_dict(
+        cls, db: cantools.database.can.Database, fcfg_path: str = None
+    ) -> dict[str, dict[str, int]]:
+        """
+        Create the signal dictionary from the CAN database and apply the values
+        stored in the configuration file.
+
+        Args:
+            db (cantools.database.can.Database): The CAN database object.
+            fcfg_path (str, optional): Path to the configuration file. If None, uses default path.
 
+        Returns:
+            dict: {message_name: {signal_name: signal_value, ...}, ...}
+        """
+        sig_dict = {
+            message.name: {
+                signal.name: signal.initial if signal.initial else 0
+                for signal in message.signals
+            }
+            for message in db.messages
+        }
+        messages = CanifConfigStore.read(fcfg_path)
+        if messages:
+            CanifConfigStore.apply(messages, sig_dict)
+            print(f"Read config from {fcfg_path or CanifConfigStore.DEFAULT_PATH}")
         return sig_dict
 
     @classmethod
@@ -85,12 +113,23 @@ class Canif(CanifGui, CanifTerm):
         bus: can.BusABC = None,
         use_term: bool = False,
         event: threading.Event = None,
+        bus_name: str = "main",
+        lazy_decode: bool = False,
+        decode_queue_size: int = 0,
+        decode_workers: int = 1,
+        bitrate: int = 500000,
+        profile: bool = True,
+        batch_window: float = 0,
+        history_size: int = 0,
+        bus_factory=None,
     ):
         """
         Initialize the Canif interface.
 
         Args:
             sig_vals (dict): Dictionary of signal values by message name.
+                Wrapped in a CanifSignalStore, the dict then holds the same
+                values as Canif.sig_vals.
             vitals_msgs (list): List of message names considered as vitals.
             database (cantools.database.can.Database): CAN database object.
             rx_ids (set, optional): Set of CAN IDs to receive.
@@ -100,22 +139,41 @@ class Canif(CanifGui, CanifTerm):
             bus (can.BusABC, optional): CAN bus interface.
             use_term (bool, optional): Use terminal interface if True, otherwise use GUI.
             event (threading.Event, optional): Event object for synchronization.
+            bus_name (str, optional): Channel name of the main bus used for
+                namespacing when more buses are attached with add_bus.
+            lazy_decode (bool, optional): Decode received frames of the main bus
+                only when they are read by the GUI, terminal or get_signals.
+            decode_queue_size (int, optional): Size of the bounded queue between
+                receiving and decoding on the main bus. 0 decodes inline.
+            decode_workers (int, optional): Number of decode workers.
+            bitrate (int, optional): Nominal bitrate of the main bus for the bus load.
+            profile (bool, optional): Record hot path timers and counters.
+            batch_window (float, optional): Decode received frames of the main
+                bus in batches collected for this many seconds, e.g. 0.005.
+            history_size (int, optional): Decoded frames kept per message in
+                batch mode.
+            bus_factory (callable, optional): Returns a new main bus to
+                replace it after a bus error.
         """
         if node == None and (rx_ids == None or tx_ids == None):
             raise ValueError("Must provide rx & tx ids or node")
-        self.sig_vals: dict[str, dict[str, int]] = sig_vals
+        self.sig_vals: CanifSignalStore = CanifSignalStore.wrap(sig_vals, database)
         self.vitals_msgs: list[str] = vitals_msgs
         self.db: cantools.database.can.Database = database
         self.rx_ids: set[int] = rx_ids
         self.tx_ids: set[int] = tx_ids
         self.node: str = node
         if self.node:
-            self.tx_ids = [
+            self.tx_ids = {
                 msg.frame_id for msg in self.db.messages if self.node in msg.senders
-            ]
-            self.rx_ids = [
+            }
+            self.rx_ids = {
                 msg.frame_id for msg in self.db.messages if self.node in msg.receivers
-            ]
+            }
+        else:
+            # membership is tested per frame and per listed message
+            self.tx_ids = set(tx_ids)
+            self.rx_ids = set(rx_ids)
         self.estop_msg_sig_val: tuple[
             cantools.database.can.Message, str, int
         ] = estop_msg_sig_val
@@ -127,29 +185,396 @@ class Canif(CanifGui, CanifTerm):
         # we want this list to be low to high
         self.cfg_msg_list.reverse()
         cfg_msg_names = [msg.name for msg in self.cfg_msg_list]
-        self.rx_msg_stats: dict = {}
-        for msg in self.sig_vals.keys():
-            if msg not in cfg_msg_names:
-                self.rx_msg_stats[msg] = {
-                    "last_received": 0,
-                    "cycle_time": 0,
-                    "count": 0,
-                    "prev_ts": 0,
-                }
+        self.rx_msg_stats: CanifRxStatsTable = CanifRxStatsTable(
+            msg for msg in self.sig_vals if msg not in cfg_msg_names
+        )
+        self.mux_tables: dict[str, CanifMuxTable] = build_mux_tables(self.db)
+        self.profiler: CanifProfiler = CanifProfiler(enabled=profile)
+        self.shm_writer: CanifShmWriter = None
+        self.recorder: CanifRecorder = None
+        self.buses: dict[str, CanifBus] = {}
+        self.bus_name: str = bus_name
+        if self.bus:
+            self.buses[bus_name] = CanifBus(
+                name=bus_name,
+                bus=self.bus,
+                database=self.db,
+                sig_vals=self.sig_vals,
+                rx_msg_stats=self.rx_msg_stats,
+                rx_ids=self.rx_ids,
+                tx_ids=self.tx_ids,
+                lazy=lazy_decode,
+                queue_size=decode_queue_size,
+                workers=decode_workers,
+                bitrate=bitrate,
+                profiler=self.profiler,
+                batch_window=batch_window,
+                history_size=history_size,
+                bus_factory=bus_factory,
+            )
+        self.estop: CanifEstop = None
+        if self.bus and self.estop_msg_sig_val:
+            (db_msg, sig_name, sig_value) = self.estop_msg_sig_val
+            self.estop = CanifEstop(
+                bus=self.buses[bus_name],
+                message=db_msg,
+                sig_name=sig_name,
+                sig_value=sig_value,
+                sig_vals=dict(self.sig_vals[db_msg.name]),
+                mux_table=self.mux_tables.get(db_msg.name),
+                on_sent=self._on_estop_sent,
+                profiler=self.profiler,
+            )
         self.vitals: dict = {}
         if vitals_msgs:
             for msg in vitals_msgs:
                 self.vitals[msg] = self.sig_vals[msg]
         self.use_term: bool = use_term
+        self.config_store: CanifConfigStore = CanifConfigStore()
+        # config messages changed since the last save, None saves all
+        self._dirty_cfg: set[str] = None
+        # guards _dirty_cfg, marked from the estop and profile threads too
+        self._cfg_lock = threading.Lock()
 
         if self.use_term:
             CanifTerm.__init__(self, event=event)
         else:
             CanifGui.__init__(self)
 
+    def add_bus(
+        self,
+        name: str,
+        bus: can.BusABC,
+        database: cantools.database.can.Database,
+        node: str = None,
+        rx_ids: set[int] = None,
+        tx_ids: set[int] = None,
+        sig_vals: dict[str, dict[str, int]] = None,
+        lazy_decode: bool = False,
+        decode_queue_size: int = 0,
+        decode_workers: int = 1,
+        bitrate: int = 500000,
+        batch_window: float = 0,
+        history_size: int = 0,
+        bus_factory=None,
+    ) -> CanifBus:
+        """
+        Attach an additional CAN bus with its own database and node.
+
+        Args:
+            name (str): Unique channel name, used to namespace its messages.
+            bus (can.BusABC): CAN bus interface.
+            database (cantools.database.can.Database): CAN database for this bus.
+            node (str, optional): Name of node which is the receiver and transmitter
+            rx_ids (set, optional): Set of CAN IDs to receive.
+            tx_ids (set, optional): Set of CAN IDs to send.
+            sig_vals (dict, optional): Dictionary of signal values by message name.
+                Initialized from the database if not given.
+            lazy_decode (bool, optional): Decode received frames only when read.
+            decode_queue_size (int, optional): Decode queue size, 0 decodes inline.
+            decode_workers (int, optional): Number of decode workers.
+            bitrate (int, optional): Nominal bitrate of the bus for the bus load.
+            batch_window (float, optional): Decode received frames in batches
+                collected for this many seconds.
+            history_size (int, optional): Decoded frames kept per message in
+                batch mode.
+            bus_factory (callable, optional): Returns a new bus to replace it
+                after a bus error.
+
+        Returns:
+            CanifBus: The attached bus.
+        """
+        if name in self.buses:
+            raise KeyError(f"Bus '{name}' already attached")
+        if sig_vals is None:
+            sig_vals = {}
+            Canif.init_sig_dict(sig_dict=sig_vals, db=database)
+        canif_bus = CanifBus(
+            name=name,
+            bus=bus,
+            database=database,
+            sig_vals=sig_vals,
+            node=node,
+            rx_ids=rx_ids,
+            tx_ids=tx_ids,
+            lazy=lazy_decode,
+            queue_size=decode_queue_size,
+            workers=decode_workers,
+            bitrate=bitrate,
+            profiler=self.profiler,
+            batch_window=batch_window,
+            history_size=history_size,
+            bus_factory=bus_factory,
+        )
+        self.buses[name] = canif_bus
+        return canif_bus
+
+    def start_buses(self, listeners: dict[str, list[can.Listener]] = None) -> None:
+        """
+        Start the receive thread of every attached bus.
+
+        Args:
+            listeners (dict, optional): Extra listeners per bus name.
+        """
+        listeners = listeners or {}
+        if self.estop:
+            self.estop.start()
+        for name, canif_bus in self.buses.items():
+            canif_bus.start(listeners.get(name))
+
+    def stop_buses(self) -> None:
+        """
+        Stop the receive thread of every attached bus and the estop thread.
+        """
+        for canif_bus in self.buses.values():
+            canif_bus.stop()
+        if self.estop:
+            self.estop.stop()
+
+    def publish_shm(self, name: str = "canif") -> CanifShmWriter:
+        """
+        Publish the latest value and receive time of every received signal
+        into a shared memory table that other processes can read with
+        CanifShmReader. Messages of additional buses are namespaced.
+
+        Call after all buses are attached. Published messages are decoded on
+        receive, also in lazy decode mode.
+
+        Args:
+            name (str, optional): Name of the shared memory block.
+
+        Returns:
+            CanifShmWriter: The writer of the table.
+        """
+        if self.shm_writer:
+            raise RuntimeError("Signal table already published")
+        sig_vals = {}
+        for canif_bus in self.buses.values():
+            for msg_name in canif_bus.rx_msg_stats:
+                if canif_bus.name != self.bus_name:
+                    sig_vals[canif_bus.namespaced(msg_name)] = canif_bus.sig_vals[
+                        msg_name
+                    ]
+                else:
+                    sig_vals[msg_name] = canif_bus.sig_vals[msg_name]
+        self.shm_writer = CanifShmWriter(name=name, sig_vals=sig_vals)
+
+        for canif_bus in self.buses.values():
+            if canif_bus.name == self.bus_name:
+                canif_bus.listener.add_decode_hook(self.shm_writer.publish)
+            else:
+                canif_bus.listener.add_decode_hook(
+                    lambda msg_name, now, canif_bus=canif_bus: self.shm_writer.publish(
+                        canif_bus.namespaced(msg_name), now
+                    )
+                )
+            canif_bus.listener.eager_msgs.update(canif_bus.rx_msg_stats)
+        return self.shm_writer
+
+    def record(
+        self,
+        path: Path,
+        deadband: float = 0.0,
+        deadbands: dict[str, float] = None,
+        flush_interval: float = 1.0,
+    ) -> CanifRecorder:
+        """
+        Record the changes of every received signal into a SQLite database
+        that CanifRecordReader queries. Messages of additional buses are
+        namespaced.
+
+        Call after all buses are attached. Recorded messages are decoded on
+        receive, also in lazy decode mode.
+
+        Args:
+            path (Path): SQLite database file.
+            deadband (float, optional): Change a value must exceed to be
+                recorded, 0 records every change.
+            deadbands (dict, optional): {'Message.Signal': deadband} per signal.
+            flush_interval (float, optional): Seconds between writes.
+
+        Returns:
+            CanifRecorder: The recorder.
+        """
+        if self.recorder:
+            raise RuntimeError("Already recording")
+        self.recorder = CanifRecorder(
+            path=path,
+            deadband=deadband,
+            deadbands=deadbands,
+            flush_interval=flush_interval,
+        )
+        for canif_bus in self.buses.values():
+            prefix = ""
+            if canif_bus.name != self.bus_name:
+                prefix = canif_bus.namespaced("")
+            hook = self.recorder.watch(
+                canif_bus.sig_vals, canif_bus.rx_msg_stats, prefix=prefix
+            )
+            canif_bus.listener.add_decode_hook(hook, canif_bus.rx_msg_stats)
+        self.recorder.start()
+        return self.recorder
+
+    def close_recorder(self) -> None:
+        """
+        Write the pending samples and close the recording. Stop the buses
+        first.
+        """
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def close_shm(self) -> None:
+        """
+        Remove the shared memory signal table. Stop the buses first.
+        """
+        if self.shm_writer:
+            self.shm_writer.close()
+            self.shm_writer = None
+
+    def get_merged_sig_vals(self) -> dict[str, dict[str, int]]:
+        """
+        Returns the signal values of all buses with namespaced message names.
+
+        Returns:
+            dict: {'<bus>.<message>': {signal_name: signal_value, ...}, ...}
+        """
+        merged = {}
+        for canif_bus in self.buses.values():
+            for msg_name, signals in canif_bus.sig_vals.items():
+                merged[canif_bus.namespaced(msg_name)] = signals
+        return merged
+
+    def get_bus_stats(self) -> dict[str, dict]:
+        """
+        Returns receive statistics by bus name.
+        """
+        return {name: bus.get_stats() for name, bus in self.buses.items()}
+
+    def get_bus_load(self, top: int = 5) -> dict[str, dict]:
+        """
+        Returns the bus load, frame rate and top talkers by bus name.
+
+        Args:
+            top (int, optional): Number of top talkers to report per bus.
+        """
+        return {name: bus.get_load(top=top) for name, bus in self.buses.items()}
+
+    def get_signals(self, msg_name: str) -> dict:
+        """
+        Returns the latest signal values of a received message.
+
+        Args:
+            msg_name (str): Message name of the main bus or a namespaced
+                '<bus>.<message>' name of any attached bus.
+
+        Returns:
+            dict: {signal_name: signal_value, ...} of the active mux branch,
+                  or None if the message is unknown.
+        """
+        return self._resolve_rx_msg(msg_name)[0]
+
+    def refresh_rx(self, msg_name: str = None) -> None:
+        """
+        Decode pending frames of buses in lazy decode mode.
+
+        Args:
+            msg_name (str, optional): Message name of the main bus to decode.
+                Only the receive stats of every bus are updated if not given.
+        """
+        if msg_name is None:
+            for canif_bus in self.buses.values():
+                canif_bus.refresh()
+        elif self.bus_name in self.buses:
+            self.buses[self.bus_name].refresh(msg_name)
+
+    def _get_rx_msg_names(self) -> list[str]:
+        """
+        Returns received message names of the main bus followed by the
+        namespaced received message names of the additional buses.
+        """
+        names = list(self.rx_msg_stats.keys())
+        for canif_bus in self.buses.values():
+            if canif_bus.name == self.bus_name:
+                continue
+            names += [canif_bus.namespaced(m) for m in canif_bus.rx_msg_stats]
+        return names
+
+    def _split_namespaced(self, msg_name: str) -> tuple[CanifBus, str]:
+        """
+        Splits a namespaced '<bus>.<message>' name into the attached bus and
+        the message name. Bus names are matched as known prefixes, longest
+        first, since channel names like 'can0.1' can hold the separator.
+
+        Returns:
+            tuple: (CanifBus, message name) or (None, None) if no bus matches.
+        """
+        for bus_name in sorted(self.buses, key=len, reverse=True):
+            prefix = f"{bus_name}{CanifBus.NS_SEP}"
+            if msg_name.startswith(prefix):
+                return self.buses[bus_name], msg_name[len(prefix) :]
+        return None, None
+
+    def _resolve_rx_msg(self, msg_name: str) -> tuple[dict, dict]:
+        """
+        Looks up the signal values and receive stats for a plain message name
+        of the main bus or a namespaced message name of any attached bus.
+
+        Only the active branch is returned for multiplexed messages.
+
+        Returns:
+            tuple: (signal values, receive stats) or (None, None) if unknown.
+        """
+        if msg_name in self.rx_msg_stats:
+            self.refresh_rx(msg_name)
+            signals = self._get_active_sig_vals(msg_name, self.sig_vals[msg_name])
+            return signals, self.rx_msg_stats[msg_name]
+        canif_bus, name = self._split_namespaced(msg_name)
+        if canif_bus and name in canif_bus.rx_msg_stats:
+            canif_bus.refresh(name)
+            signals = canif_bus.sig_vals[name]
+            mux_table = canif_bus.listener.mux_tables.get(name)
+            if mux_table:
+                signals = mux_table.filter(signals)
+            return signals, canif_bus.rx_msg_stats[name]
+        return None, None
+
+    def get_history(self, msg_name: str) -> tuple[tuple, list]:
+        """
+        Returns the decoded frames of a message kept in batch mode.
+
+        Args:
+            msg_name (str): Message name of the main bus or namespaced message
+                name of an attached bus.
+
+        Returns:
+            tuple: (signal names, [(receive time, [values]), ...] oldest first)
+
+        Raises:
+            KeyError: If the message isn't received on any bus.
+        """
+        if msg_name in self.rx_msg_stats and self.bus_name in self.buses:
+            return self.buses[self.bus_name].listener.get_history(msg_name)
+        canif_bus, name = self._split_namespaced(msg_name)
+        if canif_bus and name in canif_bus.rx_msg_stats:
+            return canif_bus.listener.get_history(name)
+        raise KeyError(f"Unknown message '{msg_name}'")
+
+    def _get_active_sig_vals(self, msg_name: str, signals: dict) -> dict:
+        """
+        Returns the signal values of the active multiplexer branch of a
+        message of the main database, or all signal values if it isn't
+        multiplexed.
+        """
+        mux_table = self.mux_tables.get(msg_name)
+        if mux_table:
+            return mux_table.filter(signals)
+        return signals
+
     def send_can_message(self, msg: cantools.database.can.Message, sig_dict: dict):
         """
         Send a CAN message with the specified signal values.
+        Signals outside the active branch of a multiplexed message are dropped.
 
         Args:
             msg (cantools.database.can.Message): The CAN message definition.
@@ -159,18 +584,239 @@ class Canif(CanifGui, CanifTerm):
             NotImplementedError: If no CAN bus is available.
         """
         if self.bus:
+            start = time.perf_counter_ns()
             try:
+                mux_table = self.mux_tables.get(msg.name)
+                if mux_table:
+                    sig_dict = mux_table.filter(sig_dict)
                 can_data = msg.encode(sig_dict)
                 can_msg = can.Message(arbitration_id=msg.frame_id, data=can_data)
-                self.bus.send(can_msg)
+                # held and sent after recovery while the bus is down, rtt
+                # requests are timestamped when transmitted
+                self.buses[self.bus_name].send(can_msg)
+                if self.estop and msg.name == self.estop.message.name:
+                    # keep the other signals of the estop frame current
+                    self.estop.update(sig_dict)
             except can.CanError as e:
+                self.profiler.count("send_errors")
                 print(f"send_can_message: {repr(e)}")
+            self.profiler.add("send", time.perf_counter_ns() - start)
 
         else:
             raise NotImplementedError(
                 "Subclasses must implement the 'send_can_message' method."
             )
 
+    def send_estop(self, source: str = "api") -> None:
+        """
+        Send the emergency stop message. The frame is encoded in advance with
+        the other signals of the message at their last sent values and sent
+        from the estop thread.
+
+        Args:
+            source (str, optional): Requester for the latency stats, e.g.
+                'gui', 'term' or 'trigger'.
+
+        Raises:
+            ValueError: If no emergency stop message is configured.
+            NotImplementedError: If no CAN bus is available.
+        """
+        if not self.estop_msg_sig_val:
+            raise ValueError("No estop message configured")
+        if not self.estop:
+            raise NotImplementedError("No CAN bus to send the estop on")
+        self.estop.trigger(source)
+
+    def _on_estop_sent(self, now: float) -> None:
+        """
+        Runs on the estop thread after the estop frame was sent.
+        """
+        (db_msg, sig_name, sig_value) = self.estop_msg_sig_val
+        self.sig_vals[db_msg.name][sig_name] = sig_value
+        self._mark_cfg_dirty(db_msg.name)
+
+    def listen_estop(self, port: int, host: str = "127.0.0.1") -> int:
+        """
+        Accept estop requests from other local processes as UDP datagrams
+        containing 'estop'.
+
+        Args:
+            port (int): UDP port, 0 picks a free port.
+            host (str, optional): Address to bind, local only by default.
+
+        Returns:
+            int: The bound port.
+
+        Raises:
+            ValueError: If no emergency stop message is configured.
+        """
+        if not self.estop:
+            raise ValueError("No estop message configured")
+        return self.estop.listen(port, host)
+
+    def get_estop_stats(self) -> dict[str, dict]:
+        """
+        Returns the latency from the estop request to bus.send per source.
+
+        Returns:
+            dict: {source: {'count', 'last_ms', 'mean_ms', 'p50_ms',
+                   'p99_ms', 'max_ms'}}
+        """
+        if not self.estop:
+            return {}
+        return self.estop.get_stats()
+
+    def add_trigger(
+        self,
+        expression: str,
+        action,
+        bus_name: str = None,
+        name: str = None,
+        holdoff: float = 0.0,
+    ) -> CanifTrigger:
+        """
+        Add a trigger that runs an action when a condition on received signals
+        becomes true. The condition is compiled once and only evaluated when a
+        message it references is received.
+
+        Args:
+            expression (str): Condition on 'Message.Signal' names, e.g.
+                'PHW_Status.PHW_Vbat > 50'.
+            action (callable or str): Called as action(trigger, receive_time),
+                or one of 'estop', 'marker', 'log[:path]' or
+                'send:MSG[:SIG=VAL,...]'.
+            bus_name (str, optional): Bus the signals are received on. Main bus
+                if not given.
+            name (str, optional): Name of the trigger.
+            holdoff (float, optional): Minimum seconds between two firings.
+
+        Returns:
+            CanifTrigger: The added trigger.
+        """
+        canif_bus = self.buses[bus_name or self.bus_name]
+        if isinstance(action, str):
+            action = self._make_trigger_action(action, canif_bus)
+        return canif_bus.add_trigger(expression, action, name=name, holdoff=holdoff)
+
+    def _make_trigger_action(self, spec: str, canif_bus: CanifBus):
+        """
+        Create a trigger action from a string specification.
+        """
+        kind, _, arg = spec.partition(":")
+        if kind == "estop":
+            return lambda trigger, now: self.send_estop("trigger")
+        if kind == "marker":
+            return canif_bus.triggers.add_marker
+        if kind == "log":
+            log_path = Path(arg or Path("logs") / "triggers.jsonl")
+
+            def log_snapshot(trigger, now):
+                snapshot = {
+                    "time": now,
+                    "trigger": trigger.name,
+                    "signals": {
+                        msg_name: dict(canif_bus.sig_vals[msg_name])
+                        for msg_name in trigger.msg_names
+                    },
+                }
+                log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(log_path, "a") as flog:
+                    flog.write(json.dumps(snapshot) + "\n")
+
+            return log_snapshot
+        if kind == "send":
+            msg_name, _, overrides = arg.partition(":")
+            msg = canif_bus.db.get_message_by_name(msg_name)
+            sig_overrides = {}
+            for item in filter(None, overrides.split(",")):
+                sig_name, _, value = item.partition("=")
+                sig_overrides[sig_name] = float(value)
+
+            def send_message(trigger, now):
+                sig_dict = {**canif_bus.sig_vals[msg.name], **sig_overrides}
+                self.send_can_message(msg, sig_dict)
+
+            return send_message
+        raise ValueError(f"Invalid trigger action '{spec}'")
+
+    def add_rtt_pair(
+        self,
+        request: str,
+        response: str,
+        match: dict[str, float] = None,
+        timeout: float = 1.0,
+        name: str = None,
+    ) -> CanifRttPair:
+        """
+        Measure the round-trip latency from sending a config message to
+        receiving its response on the main bus.
+
+        Args:
+            request (str): Name of a config message.
+            response (str): Name of a received message.
+            match (dict, optional): {signal_name: value} the response must
+                contain to complete a request, e.g. an echoed command id.
+            timeout (float, optional): Seconds to wait for a response.
+            name (str, optional): Name of the pair. 'request->response' if
+                not given.
+
+        Returns:
+            CanifRttPair: The added pair.
+
+        Raises:
+            ValueError: If the messages aren't a config and a received message.
+        """
+        if request not in [msg.name for msg in self.cfg_msg_list]:
+            raise ValueError(f"'{request}' is not a config message")
+        canif_bus = self.buses[self.bus_name]
+        if response not in canif_bus.rx_msg_stats:
+            raise ValueError(f"'{response}' is not a received message")
+        return canif_bus.add_rtt_pair(
+            request=request, response=response, match=match, timeout=timeout, name=name
+        )
+
+    def get_rtt_stats(self) -> list[dict]:
+        """
+        Returns the round-trip latency percentiles and histogram of every
+        request/response pair.
+        """
+        if self.bus_name not in self.buses:
+            return []
+        return self.buses[self.bus_name].rtt.get_stats()
+
+    def get_profile_stats(self) -> dict:
+        """
+        Returns the hot path timers and counters: receive lookup, decode,
+        stats update, GUI sections, terminal print and send.
+
+        Returns:
+            dict: {'timers': {name: {'count', 'total_ms', 'mean_us',
+                   'max_us'}}, 'counters': {name: count}}
+        """
+        return self.profiler.get_stats()
+
+    def sample_profile(self, duration: float, path: Path = None) -> Path:
+        """
+        Record the stacks of all threads for a time window in the background
+        and write them as folded stacks for flame graph tools.
+
+        Args:
+            duration (float): Length of the window in seconds.
+            path (Path, optional): Output file. logs/profile_<time>.txt if not
+                given.
+
+        Returns:
+            Path: The file the profile is written to.
+        """
+        return self.profiler.sample(duration=duration, path=path)
+
+    def get_trigger_stats(self) -> dict[str, list[dict]]:
+        """
+        Returns the stats of every trigger by bus name, including the latency
+        from receiving the frame to completing the action.
+        """
+        return {name: bus.triggers.get_stats() for name, bus in self.buses.items()}
+
     def send_save_config_message(self):
         """
         Send a message to save the current configuration.
@@ -188,10 +834,15 @@ class Canif(CanifGui, CanifTerm):
         """
         Write the current configuration signal values to the configuration file.
 
-        The configuration is stored as a JSON file in the 'data' directory.
+        Only the messages changed since the last save are collected here, the
+        file is written by the config store on a background thread.
         """
+        with self._cfg_lock:
+            dirty, self._dirty_cfg = self._dirty_cfg, set()
         cfg_vals = {}
         for msg in self.cfg_msg_list:
+            if dirty is not None and msg.name not in dirty:
+                continue
             # reset for every new message
             sig_dict = {}
             for signal in msg.signals:
@@ -199,19 +850,120 @@ class Canif(CanifGui, CanifTerm):
 
             cfg_vals[msg.name] = sig_dict
 
-        fcfg_path = Path("data") / f"cangui_config_params.csv"
-        Path(fcfg_path).parent.mkdir(parents=True, exist_ok=True)
-        try:
-            with open(fcfg_path, "w") as fcfg:
-                json.dump(cfg_vals, fcfg, indent=4)
-            print("Wrote updated params to config file")
-        except Exception as e:
-            print("Error: Failed to write new params to config file" + repr(e))
+        self.config_store.save(cfg_vals)
+
+    def _mark_cfg_dirty(self, msg_name: str) -> None:
+        """
+        Mark a config message as changed since the last save.
+        """
+        with self._cfg_lock:
+            if self._dirty_cfg is not None:
+                self._dirty_cfg.add(msg_name)
+
+    def _get_profile_path(self, name: str) -> Path:
+        """
+        Returns the path of a named config profile, stored next to the config file.
+        """
+        return self.config_store.fcfg_path.parent / "cangui_profiles" / f"{name}.json"
+
+    def list_profiles(self) -> list[str]:
+        """
+        Returns the names of the stored config profiles.
+        """
+        profile_dir = self._get_profile_path("").parent
+        if not profile_dir.exists():
+            return []
+        return sorted(path.stem for path in profile_dir.glob("*.json"))
+
+    def save_profile(self, name: str) -> None:
+        """
+        Store the current config values of every config message as a named profile.
+
+        Args:
+            name (str): Name of the profile.
+        """
+        cfg_vals = {}
+        for msg in self.cfg_msg_list:
+            cfg_vals[msg.name] = {
+                signal.name: self._get_cfg_val(signal, msg.name)
+                for signal in msg.signals
+            }
+        CanifConfigStore.write(self._get_profile_path(name), cfg_vals)
+
+    def apply_profile(self, name: str, pace: float = 0.002) -> list[str]:
+        """
+        Apply a named config profile.
+
+        The profile is compared with the current signal values and only the
+        messages that differ are updated and sent, from a background thread
+        with a pause between frames. The GUI fields of every message in the
+        profile are reset to it in one batch.
+
+        Args:
+            name (str): Name of the profile.
+            pace (float, optional): Seconds between two sent messages.
+
+        Returns:
+            list: Names of the messages that differed and are being sent.
+
+        Raises:
+            KeyError: If the profile doesn't exist.
+        """
+        messages = CanifConfigStore.read(self._get_profile_path(name))
+        if not messages:
+            raise KeyError(f"Invalid profile '{name}'")
+        profile = CanifConfigStore.to_sig_dict(messages)
+
+        changes = {}
+        # every field of the profile is shown, also where only the field
+        # held an unsent edit
+        fields = {}
+        to_send = []
+        for msg in self.cfg_msg_list:
+            stored = profile.get(msg.name)
+            if not stored:
+                continue
+            current = self.sig_vals[msg.name]
+            fields[msg.name] = {
+                sig: val for sig, val in stored.items() if sig in current
+            }
+            diff = {
+                sig: val
+                for sig, val in stored.items()
+                if sig in current and current[sig] != val
+            }
+            if diff:
+                current.update(diff)
+                changes[msg.name] = diff
+                to_send.append((msg, dict(current)))
+                self._mark_cfg_dirty(msg.name)
+
+        if to_send:
+            threading.Thread(
+                target=self._send_paced, args=(to_send, pace), daemon=True
+            ).start()
+        if not self.use_term:
+            self._update_cfg_fields(fields)
+        return list(changes)
+
+    def _send_paced(self, to_send: list[tuple], pace: float) -> None:
+        for i, (msg, sig_dict) in enumerate(to_send):
+            if i and pace > 0:
+                time.sleep(pace)
+            self.send_can_message(msg, sig_dict)
 
     """
     Base class overrides
     """
 
+    def _get_cfg_val(self, signal: cantools.database.can.Signal, msg_name: str):
+        """
+        Get the config signal value from the GUI or terminal interface.
+        """
+        if self.use_term:
+            return CanifTerm._get_cfg_val(self, signal, msg_name)
+        return CanifGui._get_cfg_val(self, signal, msg_name)
+
     def launch(self):
         """
         Launch the CAN interface, either in terminal or GUI mode.
@@ -233,3 +985,4 @@ class Canif(CanifGui, CanifTerm):
             CanifTerm.close(self)
         else:
             CanifGui.close(self)
+        self.config_store.flush()
@@ -1,15 +1,19 @@
 import argparse
+import contextlib
 import datetime
+import functools
 import os
+import sys
 import threading
-import time
 from pathlib import Path
 
 import can
 import cantools
 
 from .canif import Canif
-from .caniflistener import CanifListener
+from .caniffault import CanifFaultBus, CanifFaultInjector
+from .canifgen import CanifTrafficGen
+from .canifproc import CanifDecodeProcess
 
 
 def get_args():
@@ -25,6 +29,17 @@ def get_args():
         required=False,
         default=["virtual", "vcan0"],
     )
+    parser.add_argument(
+        "-b",
+        "--bus",
+        nargs="+",
+        action="append",
+        metavar="ARG",
+        help="Attach another bus '-b interface channel dbc [node]'.\
+            Repeat for every extra channel",
+        required=False,
+        default=[],
+    )
     parser.add_argument("-d", "--dbc_file", help="CAN DBC file", required=True)
     parser.add_argument(
         "-l",
@@ -54,6 +69,41 @@ def get_args():
         default=None,
         required=False,
     )
+    parser.add_argument(
+        "--estop-port",
+        type=int,
+        metavar="PORT",
+        help="Send the estop on a UDP datagram 'estop' to 127.0.0.1:PORT",
+        default=None,
+        required=False,
+    )
+    parser.add_argument(
+        "--lazy",
+        help="Decode received frames only when they are displayed",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--bitrate",
+        type=int,
+        default=500000,
+        help="Nominal bitrate of the buses used for the bus load",
+        required=False,
+    )
+    parser.add_argument(
+        "--queue",
+        type=int,
+        default=0,
+        help="Decode received frames in workers behind a queue of this size",
+        required=False,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of decode workers used with --queue",
+        required=False,
+    )
     parser.add_argument(
         "-t",
         "--test",
@@ -61,45 +111,130 @@ def get_args():
         required=False,
         action="store_true",
     )
+    parser.add_argument(
+        "--test-rate",
+        type=float,
+        default=1.0,
+        help="Multiplier for the message rates of the test traffic",
+        required=False,
+    )
+    parser.add_argument(
+        "--test-pattern",
+        choices=CanifTrafficGen.PATTERNS,
+        default="ramp",
+        help="Signal pattern of the test traffic",
+        required=False,
+    )
+    parser.add_argument(
+        "--test-cycle",
+        type=int,
+        default=1000,
+        help="Cycle time in ms of test messages without one in the DBC",
+        required=False,
+    )
+    parser.add_argument(
+        "--test-bus-off",
+        nargs=2,
+        type=float,
+        metavar=("INTERVAL", "DURATION"),
+        help="Put the bus into bus-off for DURATION seconds every INTERVAL "
+        "seconds while sending test messages",
+        default=None,
+        required=False,
+    )
+    parser.add_argument(
+        "--trigger",
+        nargs=2,
+        metavar=("EXPR", "ACTION"),
+        action="append",
+        default=[],
+        help="Run ACTION (estop, marker, log[:path], send:MSG[:SIG=VAL,...]) "
+        "when EXPR (e.g. 'PHW_Status.PHW_Vbat > 50') becomes true",
+        required=False,
+    )
+    parser.add_argument(
+        "--rtt",
+        nargs="+",
+        metavar="MSG",
+        action="append",
+        default=[],
+        help="Measure the latency from sending config message REQUEST to "
+        "receiving RESPONSE: 'REQUEST RESPONSE [SIG=VAL,...]'",
+        required=False,
+    )
+    parser.add_argument(
+        "--no-timers",
+        help="Disable the hot path timers and counters",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--shm",
+        nargs="?",
+        const="canif",
+        metavar="NAME",
+        help="Publish received signals to a shared memory table (default name: canif)",
+        required=False,
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="Record signal changes into a SQLite database, query it with canifrecord",
+        required=False,
+    )
+    parser.add_argument(
+        "--record-deadband",
+        type=float,
+        metavar="VALUE",
+        default=0.0,
+        help="Only record changes larger than VALUE",
+        required=False,
+    )
+    parser.add_argument(
+        "--script",
+        metavar="PATH",
+        help="Run a command script ('-' reads stdin) without the GUI, print "
+        "the send timing and exit",
+        required=False,
+    )
+    parser.add_argument(
+        "--decode-process",
+        help="Receive and decode the main bus in a child process",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--batch",
+        type=float,
+        default=0,
+        metavar="MS",
+        help="Decode received frames in batches collected for MS milliseconds",
+        required=False,
+    )
+    parser.add_argument(
+        "--history",
+        type=int,
+        default=0,
+        help="Decoded frames kept per message in batch mode",
+        required=False,
+    )
 
-    return parser.parse_args()
-
-
-def send_test_messages(args, database, bus, test_stop_event):
-    count = 0
-    val = 0
-    send_message = False
-    while not test_stop_event.is_set():
-        if count == 5:
-            val = 1
-            send_message = True
-        elif count == 10:
-            count = 0
-            send_message = True
-        else:
-            val = 0
-            send_message = False
-
-        count += 1
-
-        for msg in database.messages:
-            if args.node in msg.receivers and send_message:
-                sig_dict = {}
-                for sig in msg.signals:
-                    sig_dict[sig.name] = val
-                data = msg.encode(sig_dict)
-                can_msg = can.Message(arbitration_id=msg.frame_id, data=data)
-                bus.send(can_msg)
+    args = parser.parse_args()
+    for bus_args in args.bus:
+        if len(bus_args) not in (3, 4):
+            parser.error("-b/--bus expects 'interface channel dbc [node]'")
+    for rtt_args in args.rtt:
+        if len(rtt_args) not in (2, 3):
+            parser.error("--rtt expects 'REQUEST RESPONSE [SIG=VAL,...]'")
 
-        time.sleep(1)
+    return args
 
 
 def main():
     args = get_args()
     database = cantools.database.load_file(args.dbc_file)
     db_name = os.path.splitext(os.path.basename(args.dbc_file))[0]
-    sig_dict = Canif.get_sig_dict_from_config()
-    Canif.init_sig_dict(sig_dict=sig_dict, db=database)
+    sig_dict = Canif.load_sig_dict(db=database)
 
     if args.estop:
         estop_msg_sig_val = (
@@ -110,15 +245,51 @@ def main():
     else:
         estop_msg_sig_val = None
 
-    can_notifier = None
+    script = None
+    if args.script == "-":
+        script = sys.stdin.readlines()
+    elif args.script:
+        script = Path(args.script).read_text().splitlines()
+
+    gui = None
     test_stop_event = None
     test_thread = None
+    traffic_gen = None
     try:
-        with can.Bus(
-            interface=args.canbusif[0],
-            channel=args.canbusif[1],
-            receive_own_messages=True,
-        ) as bus:
+        with contextlib.ExitStack() as stack:
+            bus_kwargs = {
+                "interface": args.canbusif[0],
+                "channel": args.canbusif[1],
+                "receive_own_messages": True,
+            }
+            test_messages = [
+                msg for msg in database.messages if args.node in msg.receivers
+            ]
+            if args.decode_process:
+                # logging and test traffic run in the process owning the bus
+                bus = stack.enter_context(
+                    CanifDecodeProcess(
+                        bus_kwargs=bus_kwargs,
+                        dbc_path=args.dbc_file,
+                        bitrate=args.bitrate,
+                        queue_size=args.queue,
+                        workers=args.workers,
+                        log_path=args.log,
+                        test_traffic={
+                            "messages": [msg.name for msg in test_messages],
+                            "rate": args.test_rate,
+                            "pattern": args.test_pattern,
+                            "default_cycle_time": args.test_cycle,
+                        }
+                        if args.test
+                        else None,
+                    )
+                )
+            else:
+                bus_factory = functools.partial(can.Bus, **bus_kwargs)
+                if args.test and args.test_bus_off:
+                    bus_factory = functools.partial(CanifFaultBus, **bus_kwargs)
+                bus = stack.enter_context(bus_factory())
             gui = Canif(
                 sig_vals=sig_dict,
                 node=args.node,
@@ -126,45 +297,116 @@ def main():
                 estop_msg_sig_val=estop_msg_sig_val,
                 bus=bus,
                 database=database,
-                use_term=False,
+                use_term=script is not None,
+                bus_name=args.canbusif[1],
+                lazy_decode=args.lazy,
+                decode_queue_size=args.queue,
+                decode_workers=args.workers,
+                bitrate=args.bitrate,
+                profile=not args.no_timers,
+                batch_window=args.batch / 1000,
+                history_size=args.history,
+                bus_factory=None if args.decode_process else bus_factory,
             )
-            can_listener = CanifListener(
-                sig_vals=sig_dict, database=database, rx_msg_stats=gui.rx_msg_stats
-            )
-            listeners = [can_listener]
-            if args.log:
+            for interface, channel, dbc_file, *node in args.bus:
+                extra_bus_factory = functools.partial(
+                    can.Bus,
+                    interface=interface,
+                    channel=channel,
+                    receive_own_messages=True,
+                )
+                extra_bus = stack.enter_context(extra_bus_factory())
+                gui.add_bus(
+                    name=channel,
+                    bus=extra_bus,
+                    database=cantools.database.load_file(dbc_file),
+                    node=node[0] if node else args.node,
+                    lazy_decode=args.lazy,
+                    decode_queue_size=args.queue,
+                    decode_workers=args.workers,
+                    bitrate=args.bitrate,
+                    batch_window=args.batch / 1000,
+                    history_size=args.history,
+                    bus_factory=extra_bus_factory,
+                )
+            for request, response, *match in args.rtt:
+                gui.add_rtt_pair(
+                    request=request,
+                    response=response,
+                    match={
+                        sig_name: float(value)
+                        for sig_name, value in (
+                            item.split("=") for item in match[0].split(",")
+                        )
+                    }
+                    if match
+                    else None,
+                )
+            for expression, action in args.trigger:
+                gui.add_trigger(expression=expression, action=action)
+            if args.shm:
+                gui.publish_shm(name=args.shm)
+            if args.record:
+                gui.record(path=args.record, deadband=args.record_deadband)
+            if args.estop_port is not None:
+                gui.listen_estop(args.estop_port)
+
+            listeners = []
+            if args.log and not args.decode_process:
                 Path(args.log).parent.mkdir(parents=True, exist_ok=True)
                 log_writer = can.Logger(args.log)
                 listeners.append(log_writer)
-            can_notifier = can.Notifier(bus, listeners)
+            gui.start_buses({args.canbusif[1]: listeners})
 
             # test framework
-            if args.test:
+            if args.test and not args.decode_process:
+                test_bus = bus
+                if args.test_bus_off:
+                    # the other node keeps sending while our bus is off
+                    test_bus = stack.enter_context(can.Bus(**bus_kwargs))
+                traffic_gen = CanifTrafficGen(
+                    bus=test_bus,
+                    messages=test_messages,
+                    rate=args.test_rate,
+                    pattern=args.test_pattern,
+                    default_cycle_time=args.test_cycle,
+                )
                 test_stop_event = threading.Event()
                 test_thread = threading.Thread(
-                    target=send_test_messages,
-                    args=(args, database, bus, test_stop_event),
+                    target=traffic_gen.run, args=(test_stop_event,)
                 )
                 test_thread.start()
+                if args.test_bus_off:
+                    injector = CanifFaultInjector(args.canbusif[1], *args.test_bus_off)
+                    threading.Thread(
+                        target=injector.run, args=(test_stop_event,), daemon=True
+                    ).start()
 
-            # blocking call while the gui is running
-            gui.launch()
+            if script is not None:
+                gui.run_script(script)
+            else:
+                # blocking call while the gui is running
+                gui.launch()
 
-            can_notifier.stop()
-            if args.test:
+            gui.stop_buses()
+            if test_thread:
                 test_stop_event.set()
                 test_thread.join()
 
     except Exception as e:
         print(repr(e))
     finally:
-        if can_notifier:
-            can_notifier.stop()
+        if gui:
+            gui.stop_buses()
+            gui.close_shm()
+            gui.close_recorder()
         if args.test:
             if test_stop_event:
                 test_stop_event.set()
             if test_thread:
                 test_thread.join()
+            if traffic_gen:
+                traffic_gen.report()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,24 @@
 import argparse
-import base64
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
 
 import cantools
 import pandas as pd
 
+from .canifcache import CanifDecodeCache
+from .canifpipeline import (
+    CanifCallbackSink,
+    CanifCsvSink,
+    CanifCsvSource,
+    CanifDecodeStage,
+    CanifLogSource,
+    CanifPipeline,
+    CanifResampleStage,
+)
+from .canifresample import CanifResampler
+from .canifsummary import CanifLogSummary
+
 
 class CanifCsvDecoder:
     def __init__(self, dbc_file: str, csv_file: str, enum: int = 0):
@@ -11,33 +26,356 @@ class CanifCsvDecoder:
         self.enum = enum
         self.csv_file = csv_file
         self.db = cantools.database.load_file(dbc_file)
-        self.df = pd.read_csv(csv_file)
+        self.messages = {msg.frame_id: msg for msg in self.db.messages}
+        # signal columns always decoded to ints, see _cast()
+        self._int_signals = self._get_int_signals(self.db)
+        self._df = None
         self.decoded_df = None
 
-    def decode(self) -> pd.DataFrame:
-        decoded_rows = []
-
-        for _, row in self.df.iterrows():
-            try:
-                arbitration_id = int(row["arbitration_id"], 16) - self.enum
-                data_bytes = base64.b64decode(row["data"])
-                message = self.db.get_message_by_frame_id(arbitration_id)
-
-                if message:
-                    decoded_signals = message.decode(data_bytes)
-                    decoded_rows.append(
-                        {
-                            "timestamp": row["timestamp"],
-                            "arbitration_id": hex(arbitration_id + self.enum),
-                            **decoded_signals,
-                        }
-                    )
-            except Exception as e:
-                print(f"[WARN] Skipping row due to error: {e}")
-
-        self.decoded_df = pd.DataFrame(decoded_rows)
+    @property
+    def df(self) -> pd.DataFrame:
+        # read on first use, decoding reads the log in chunks
+        if self._df is None:
+            self._df = pd.read_csv(self.csv_file)
+        return self._df
+
+    def _source(self, chunksize: int) -> Iterable[pd.DataFrame]:
+        if Path(self.csv_file).suffix.lower() == ".csv":
+            return CanifCsvSource(self.csv_file, chunksize)
+        return CanifLogSource(self.csv_file, chunksize)
+
+    @staticmethod
+    def _get_int_signals(database: cantools.database.can.Database) -> set[str]:
+        ints = set()
+        floats = set()
+        for msg in database.messages:
+            for signal in msg.signals:
+                is_int = (
+                    not signal.is_float
+                    and isinstance(signal.scale, int)
+                    and isinstance(signal.offset, int)
+                )
+                (ints if is_int else floats).add(signal.name)
+        return ints - floats
+
+    def decode(self, chunksize: int = 100000) -> pd.DataFrame:
+        tables, _ = self._decode_tables(self._source(chunksize))
+        # chunks are cast to the dtypes of the whole log, like one table
+        dtypes = self._dtypes(tables)
+        tables = [self._cast(table, dtypes) for table in tables if len(table)]
+        # only the active branch of a mux message is decoded, the other
+        # branch columns are left empty for its rows
+        self.decoded_df = (
+            pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+        )
         return self.decoded_df
 
+    def _decode_tables(
+        self, source: Iterable[pd.DataFrame]
+    ) -> tuple[list[pd.DataFrame], list[int]]:
+        """
+        Returns a decoded table and the number of log rows per source chunk.
+        """
+        decode_stage = CanifDecodeStage(self.db, self.enum, decode_choices=True)
+        tables = []
+        rows = []
+
+        def counted(chunks):
+            for chunk in chunks:
+                rows.append(len(chunk))
+                yield chunk
+
+        CanifPipeline(
+            counted(source),
+            [decode_stage],
+            [
+                CanifCallbackSink(
+                    lambda samples: tables.append(decode_stage.to_table(samples))
+                )
+            ],
+        ).run()
+        return tables, rows
+
+    @staticmethod
+    def _complete_end(path: str) -> int:
+        """
+        Returns the byte offset after the last complete line, a line still
+        being written is left for the next run.
+        """
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            pos = size
+            while pos > 0:
+                block = min(pos, 1 << 16)
+                pos -= block
+                f.seek(pos)
+                newline = f.read(block).rfind(b"\n")
+                if newline >= 0:
+                    return pos + newline + 1
+        return 0
+
+    @staticmethod
+    def _line_offset(path: str, start: int, lines: int) -> int:
+        """
+        Returns the byte offset after the given number of lines from start.
+        A start of 0 skips the header line first.
+        """
+        with open(path, "rb") as f:
+            f.seek(start)
+            if start == 0:
+                f.readline()
+            pos = f.tell()
+            while lines > 0:
+                block = f.read(1 << 20)
+                if not block:
+                    break
+                count = block.count(b"\n")
+                if count < lines:
+                    lines -= count
+                    pos += len(block)
+                    continue
+                index = -1
+                for _ in range(lines):
+                    index = block.index(b"\n", index + 1)
+                return pos + index + 1
+        return pos
+
+    @staticmethod
+    def _dtypes(tables: list[pd.DataFrame]) -> dict[str, str]:
+        """
+        Returns {column: dtype name} of the tables concatenated, as decode()
+        writes them. Chunks without decoded frames don't count.
+        """
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return {}
+        table = pd.concat(tables, ignore_index=True)
+        return {column: str(dtype) for column, dtype in table.dtypes.items()}
+
+    def _appendable(self, state: dict, dtypes: dict[str, str]) -> bool:
+        """
+        Returns True if rows of the given column dtypes can be appended to
+        the output of a cache state without changing the rows before them.
+        """
+        if not dtypes:
+            return True
+        if not set(dtypes) <= set(state["columns"]):
+            return False
+        for column, dtype in state["dtypes"].items():
+            kind = pd.api.types.pandas_dtype(dtype).kind
+            added = dtypes.get(column)
+            added_kind = pd.api.types.pandas_dtype(added).kind if added else None
+            if kind in "iu" and added_kind not in ("i", "u", "O"):
+                # missing values or floats would turn the column into floats
+                return False
+            if kind == "f" and added_kind == "O" and column in self._int_signals:
+                # choice names would turn the integers back from floats
+                return False
+        return True
+
+    def _cast(self, table: pd.DataFrame, dtypes: dict[str, str]) -> pd.DataFrame:
+        """
+        Returns a chunk table with the columns cast like the given dtypes of
+        the whole output, so it is written like one table of the whole log:
+        integers in a float column as floats, and integer signals that are
+        floats next to missing values as integers in an object column of
+        choice names.
+        """
+        casts = {}
+        for column in table:
+            if column not in dtypes:
+                continue
+            kind = table[column].dtype.kind
+            target = pd.api.types.pandas_dtype(dtypes[column]).kind
+            if kind in "iu" and target == "f":
+                casts[column] = table[column].astype(dtypes[column])
+            elif kind == "f" and target == "O" and column in self._int_signals:
+                casts[column] = pd.Series(
+                    [
+                        value if value != value else int(value)
+                        for value in table[column]
+                    ],
+                    index=table.index,
+                    dtype=object,
+                )
+        return table.assign(**casts) if casts else table
+
+    def decode_incremental(
+        self,
+        output_file: str = "decoded_output.csv",
+        cache_file: str = None,
+        chunksize: int = 100000,
+    ) -> int:
+        """
+        Decode a growing CSV log, only the rows appended since the last call.
+
+        The output is the same as decode() followed by to_csv(). The log is
+        decoded in chunks of chunksize rows like decode(). The cache holds
+        the byte offset and output size after the last complete chunk, so a
+        later call only decodes from there: the output of the last partial
+        chunk is cut off and decoded again with the appended rows. The cache
+        is only used with the same DBC content, enum offset, chunk size, log
+        file and an unchanged output. Otherwise, and when the appended rows
+        add signal columns, the log is decoded from the start.
+
+        Appended rows are written with the column dtypes of the output, so
+        integers in a float column are written as floats. An integer column,
+        a signal present in every row so far, that the appended rows turn
+        into floats, or a float column of an integer signal that they turn
+        into choice names, changes how the earlier rows are written, so the
+        log is then decoded from the start too.
+
+        Args:
+            output_file (str, optional): Output CSV file path.
+            cache_file (str, optional): Cache file, '<output_file>.cache.json'
+                by default.
+            chunksize (int, optional): Rows read per chunk, 100000 like
+                decode().
+
+        Returns:
+            int: Number of decoded rows written.
+
+        Raises:
+            ValueError: If the log isn't a CSV log.
+        """
+        if Path(self.csv_file).suffix.lower() != ".csv":
+            raise ValueError("Incremental decode needs a CSV log")
+        cache = CanifDecodeCache(cache_file or f"{output_file}.cache.json")
+        key = {**cache.key(self.dbc_file, self.enum), "chunksize": chunksize}
+        end = self._complete_end(self.csv_file)
+        state = cache.load(key, self.csv_file, output_file)
+        if state is None:
+            print("[INFO] No valid decode cache, decoding from the start")
+
+        start = state["offset"] if state else 0
+        tables, rows = self._decode_tables(
+            CanifCsvSource(self.csv_file, chunksize, start, end)
+        )
+        dtypes = self._dtypes(tables)
+        if state and not self._appendable(state, dtypes):
+            print("[INFO] New signal columns or column types, decoding from the start")
+            state = None
+            start = 0
+            tables, rows = self._decode_tables(
+                CanifCsvSource(self.csv_file, chunksize, 0, end)
+            )
+            dtypes = self._dtypes(tables)
+        if state:
+            columns = state["columns"]
+            dtypes = state["dtypes"]
+        else:
+            columns = list(dict.fromkeys(c for t in tables for c in t.columns))
+
+        # chunks after the last complete one are decoded again next time
+        full = len(tables) if rows and rows[-1] == chunksize else len(tables) - 1
+        full = max(full, 0)
+        if state:
+            with open(output_file, "r+b") as f:
+                f.truncate(state["boundary_size"])
+        written = 0
+        with open(output_file, "a" if state else "w", newline="") as f:
+            if not state:
+                pd.DataFrame(columns=columns).to_csv(f, index=False)
+            for i, part in enumerate((tables[:full], tables[full:])):
+                # chunks without decoded frames would change the dtypes
+                part = [
+                    self._cast(table.reindex(columns=columns), dtypes)
+                    for table in part
+                    if len(table)
+                ]
+                if part:
+                    table = pd.concat(part, ignore_index=True)
+                    table.to_csv(f, header=False, index=False)
+                    written += len(table)
+                if i == 0:
+                    f.flush()
+                    boundary_size = f.tell()
+        boundary = self._line_offset(self.csv_file, start, full * chunksize)
+
+        cache.save(
+            key, self.csv_file, boundary, output_file, columns, dtypes, boundary_size
+        )
+        print(
+            f"[INFO] Decoded {written} rows from byte {start} to {end}, "
+            f"saved to '{output_file}'"
+        )
+        return written
+
+    def iter_decoded(
+        self, chunksize: int = 100000
+    ) -> Iterator[dict[str, pd.DataFrame]]:
+        """
+        Decode the log chunk by chunk, all frames of a message at once.
+
+        Signal values are raw numbers, choices are not converted to names.
+
+        Args:
+            chunksize (int, optional): Rows read per chunk.
+
+        Yields:
+            dict: {msg_name: DataFrame with a 'timestamp' column and a column
+                   per signal} of the frames in the chunk.
+        """
+        decode_stage = CanifDecodeStage(self.db, self.enum)
+        for frames in self._source(chunksize):
+            yield decode_stage.process(frames)
+
+    def resample(
+        self,
+        period: float,
+        method: str = "last",
+        signals: list[str] = None,
+        output_file: str = "resampled_output.csv",
+        chunksize: int = 100000,
+    ) -> int:
+        """
+        Decode the log and write the signals on a fixed time grid.
+
+        The log is read and written chunk by chunk, so memory doesn't grow
+        with the log length. Timestamps must be in increasing order.
+
+        Args:
+            period (float): Grid period in seconds.
+            method (str, optional): 'last', 'mean' or 'interp', see
+                CanifResampler.
+            signals (list, optional): 'Message' or 'Message.Signal' names,
+                all database signals by default.
+            output_file (str, optional): Output CSV file path.
+            chunksize (int, optional): Rows read per chunk.
+
+        Returns:
+            int: Number of rows written.
+        """
+        resample_stage = CanifResampleStage(self.db, period, method, signals)
+        sink = CanifCsvSink(output_file, resample_stage.resampler.columns)
+        CanifPipeline(
+            self._source(chunksize),
+            [CanifDecodeStage(self.db, self.enum), resample_stage],
+            [sink],
+        ).run()
+        print(f"[INFO] {sink.rows} resampled rows saved to '{output_file}'")
+        return sink.rows
+
+    def summary(self, chunksize: int = 100000) -> pd.DataFrame:
+        """
+        Summarize the log in one streaming pass without keeping the decoded
+        frames.
+
+        Args:
+            chunksize (int, optional): Rows read per chunk.
+
+        Returns:
+            pd.DataFrame: Per message counts and cycle time statistics and
+                per signal min, max and mean, see CanifLogSummary.report().
+        """
+        log_summary = CanifLogSummary()
+        CanifPipeline(
+            self._source(chunksize),
+            [CanifDecodeStage(self.db, self.enum)],
+            [CanifCallbackSink(log_summary.update)],
+        ).run()
+        return log_summary.report()
+
     def to_csv(self, output_file: str = "decoded_output.csv"):
         if self.decoded_df is not None:
             self.decoded_df.to_csv(output_file, index=False)
@@ -56,12 +394,78 @@ def main():
         type=int,
         default=0,
     )
-    parser.add_argument("--csv", required=True, help="Path to CAN log CSV file")
+    parser.add_argument(
+        "--csv",
+        required=True,
+        help="Path to CAN log CSV file, or a log readable by can.LogReader (ASC, BLF)",
+    )
     parser.add_argument("--out", required=True, help="Output CSV file path")
+    parser.add_argument(
+        "--resample",
+        required=False,
+        help="Write the signals on a time grid with this period in seconds",
+        type=float,
+    )
+    parser.add_argument(
+        "--method",
+        required=False,
+        help="Value at every grid time",
+        choices=CanifResampler.METHODS,
+        default="last",
+    )
+    parser.add_argument(
+        "--signals",
+        required=False,
+        nargs="+",
+        help="Message or Message.Signal names to resample, all by default",
+    )
+    parser.add_argument(
+        "--summary",
+        required=False,
+        help="Only write per message and per signal summary statistics",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--incremental",
+        required=False,
+        help="Only decode the rows appended to a growing CSV log since the last run "
+        "and append them to the output",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--chunksize",
+        required=False,
+        help="Rows read per chunk when resampling, summarizing or decoding incrementally",
+        type=int,
+        default=100000,
+    )
 
     args = parser.parse_args()
 
     decoder = CanifCsvDecoder(args.dbc, args.csv, args.enum)
+    if args.summary:
+        report = decoder.summary(args.chunksize)
+        report.to_csv(args.out, index=False)
+        with pd.option_context(
+            "display.max_rows", None, "display.width", None, "display.precision", 3
+        ):
+            print(report.fillna("").to_string(index=False))
+        print(f"[INFO] Summary saved to '{args.out}'")
+        return
+    if args.resample:
+        try:
+            decoder.resample(
+                args.resample, args.method, args.signals, args.out, args.chunksize
+            )
+        except (KeyError, ValueError) as e:
+            print(f"[ERROR] {repr(e)}")
+        return
+    if args.incremental:
+        try:
+            decoder.decode_incremental(args.out, chunksize=args.chunksize)
+        except ValueError as e:
+            print(f"[ERROR] {repr(e)}")
+        return
     decoder.decode()
     decoder.to_csv(args.out)
 
@@ -0,0 +1,251 @@
+import argparse
+import threading
+import time
+
+import can
+import cantools
+
+from .canifbus import CanifBus
+from .canifgen import CanifTrafficGen
+from .canifproc import CanifDecodeProcess
+
+
+class CanifDecodeBench:
+    """
+    Compares receive throughput and GUI frame time of in-process decoding
+    with decoding in a CanifDecodeProcess.
+
+    The main thread stands in for the Tk GUI: every frame it refreshes the
+    bus and formats every signal value, like the measurement window does.
+    With the virtual interface the test traffic is generated in the process
+    that owns the bus; use a real interface and generate_traffic=False to
+    measure external traffic.
+    """
+
+    # seconds to wait for the first batch of the decoder process
+    STARTUP_TIMEOUT = 10.0
+
+    def __init__(
+        self,
+        bus_kwargs: dict,
+        dbc_path: str,
+        rate: float = 100.0,
+        frame_period: float = 0.02,
+        generate_traffic: bool = True,
+    ):
+        """
+        Initialize CanifDecodeBench instance.
+
+        Args:
+            bus_kwargs (dict): Arguments of can.Bus.
+            dbc_path (str): CAN database file.
+            rate (float, optional): Multiplier of the test traffic rates.
+            frame_period (float, optional): Seconds between two GUI frames.
+            generate_traffic (bool, optional): Send test traffic for every
+                database message.
+        """
+        self.bus_kwargs: dict = bus_kwargs
+        self.dbc_path: str = dbc_path
+        self.db: cantools.database.can.Database = cantools.database.load_file(dbc_path)
+        self.rate: float = rate
+        self.frame_period: float = frame_period
+        self.generate_traffic: bool = generate_traffic
+
+    def _new_bus(self, bus) -> CanifBus:
+        return CanifBus(
+            name="bench",
+            bus=bus,
+            database=self.db,
+            sig_vals={
+                msg.name: {signal.name: 0 for signal in msg.signals}
+                for msg in self.db.messages
+            },
+            rx_ids=set(msg.frame_id for msg in self.db.messages),
+            tx_ids=set(),
+        )
+
+    def _run_frames(self, canif_bus: CanifBus, duration: float) -> dict:
+        frame_times = []
+        lateness = []
+        start = time.perf_counter()
+        deadline = start
+        while deadline < start + duration:
+            deadline += self.frame_period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            frame_start = time.perf_counter()
+            lateness.append(frame_start - deadline)
+            canif_bus.refresh()
+            rows = [
+                f"{signal_name}: {value}"
+                for signals in canif_bus.sig_vals.values()
+                for signal_name, value in signals.items()
+            ]
+            rows += [
+                f"{msg_name} {stats['last_received']} {stats['count']}"
+                for msg_name, stats in canif_bus.rx_msg_stats.items()
+            ]
+            frame_times.append(time.perf_counter() - frame_start)
+
+        frame_times.sort()
+        lateness.sort()
+
+        def percentile(values, p):
+            return round(1000 * values[min(len(values) - 1, int(p * len(values)))], 3)
+
+        return {
+            "frame_p50_ms": percentile(frame_times, 0.5),
+            "frame_p99_ms": percentile(frame_times, 0.99),
+            "frame_max_ms": round(1000 * frame_times[-1], 3),
+            "late_p99_ms": percentile(lateness, 0.99),
+        }
+
+    def _received(self, canif_bus: CanifBus) -> int:
+        canif_bus.refresh()
+        return sum(stats["count"] for stats in canif_bus.rx_msg_stats.values())
+
+    def run_in_process(self, duration: float) -> dict:
+        """
+        Receive and decode on a thread of this process.
+
+        Args:
+            duration (float): Length of the run in seconds.
+
+        Returns:
+            dict: {'rx_fps', 'frame_p50_ms', 'frame_p99_ms', 'frame_max_ms',
+                   'late_p99_ms'}
+        """
+        with can.Bus(**self.bus_kwargs) as bus, can.Bus(**self.bus_kwargs) as tx_bus:
+            canif_bus = self._new_bus(bus)
+            canif_bus.start()
+            stop = threading.Event()
+            if self.generate_traffic:
+                traffic_gen = CanifTrafficGen(
+                    bus=tx_bus, messages=self.db.messages, rate=self.rate
+                )
+                gen_thread = threading.Thread(target=traffic_gen.run, args=(stop,))
+                gen_thread.start()
+            start_count = self._received(canif_bus)
+            start = time.perf_counter()
+            results = self._run_frames(canif_bus, duration)
+            received = self._received(canif_bus) - start_count
+            elapsed = time.perf_counter() - start
+            stop.set()
+            if self.generate_traffic:
+                gen_thread.join()
+            canif_bus.stop()
+        return {"rx_fps": round(received / elapsed, 1), **results}
+
+    def run_decode_process(self, duration: float) -> dict:
+        """
+        Receive and decode in a CanifDecodeProcess.
+
+        Args:
+            duration (float): Length of the run in seconds.
+
+        Returns:
+            dict: {'rx_fps', 'frame_p50_ms', 'frame_p99_ms', 'frame_max_ms',
+                   'late_p99_ms'}
+        """
+        test_traffic = None
+        if self.generate_traffic:
+            test_traffic = {
+                "messages": [msg.name for msg in self.db.messages],
+                "rate": self.rate,
+            }
+        process = CanifDecodeProcess(
+            bus_kwargs=self.bus_kwargs,
+            dbc_path=self.dbc_path,
+            test_traffic=test_traffic,
+        )
+        canif_bus = self._new_bus(process)
+        canif_bus.start()
+        # wait for the child process to come up
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        try:
+            while not process.batches:
+                process.check_alive()
+                if time.monotonic() > deadline:
+                    raise TimeoutError("No batch from the decoder process")
+                time.sleep(0.05)
+        except (can.CanOperationError, TimeoutError):
+            canif_bus.stop()
+            raise
+        start_count = self._received(canif_bus)
+        start = time.perf_counter()
+        results = self._run_frames(canif_bus, duration)
+        received = self._received(canif_bus) - start_count
+        elapsed = time.perf_counter() - start
+        canif_bus.stop()
+        return {"rx_fps": round(received / elapsed, 1), **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare in-process decoding with a decoder process"
+    )
+    parser.add_argument("-d", "--dbc_file", help="CAN DBC file", required=True)
+    parser.add_argument(
+        "-c",
+        "--canbusif",
+        nargs=2,
+        metavar=("INTERFACE", "CHANNEL"),
+        default=["virtual", "canifbench"],
+        help="CAN bus interface and channel",
+        required=False,
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=100.0,
+        help="Multiplier for the message rates of the test traffic",
+        required=False,
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=5.0,
+        help="Seconds per mode",
+        required=False,
+    )
+    parser.add_argument(
+        "--frame",
+        type=float,
+        default=20,
+        help="GUI frame period in ms",
+        required=False,
+    )
+    parser.add_argument(
+        "--no-traffic",
+        help="Don't generate test traffic, measure the traffic on the bus",
+        required=False,
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    bench = CanifDecodeBench(
+        bus_kwargs={"interface": args.canbusif[0], "channel": args.canbusif[1]},
+        dbc_path=args.dbc_file,
+        rate=args.rate,
+        frame_period=args.frame / 1000,
+        generate_traffic=not args.no_traffic,
+    )
+    for mode, run in (
+        ("in-process", bench.run_in_process),
+        ("decode process", bench.run_decode_process),
+    ):
+        try:
+            results = run(args.duration)
+        except Exception as e:
+            print(f"{mode}: {repr(e)}")
+            continue
+        print(
+            f"{mode}: rx={results['rx_fps']} frames/s "
+            f"gui frame p50={results['frame_p50_ms']} p99={results['frame_p99_ms']} "
+            f"max={results['frame_max_ms']} ms late p99={results['late_p99_ms']} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+import threading
+import time
+from collections import deque
+
+import can
+import cantools
+
+from .canifbusload import CanifBusLoad
+from .caniflistener import CanifListener
+from .canifproc import CanifDecodeProcess
+from .canifprof import CanifProfiler
+from .canifrtt import CanifRttPair, CanifRttTracker
+from .canifstore import CanifRxStatsTable, CanifSignalStore
+from .caniftrigger import CanifTrigger, CanifTriggerEngine
+
+
+class CanifBus:
+    """
+    A single CAN channel attached to a Canif instance.
+
+    Each bus owns its database, signal dictionary, receive statistics and
+    CanifListener. Starting a bus creates a can.Notifier for it, so every
+    attached bus gets its own receive thread.
+
+    When receiving or sending fails, e.g. after a bus-off, the bus is
+    reopened with the bus factory in a recovery thread, retrying with
+    exponential backoff, and the listeners are attached to a new notifier.
+    Frames sent meanwhile are held in a bounded queue and sent in order
+    once the bus is back. Errors raised by listeners don't count as bus
+    errors, they are printed and counted as 'listener_errors'.
+    """
+
+    # separator used for namespaced message names in merged views
+    NS_SEP = "."
+    # seconds between reopen attempts, doubled after every failure
+    BACKOFF_MIN = 0.1
+    BACKOFF_MAX = 5.0
+
+    def __init__(
+        self,
+        name: str,
+        bus: can.BusABC,
+        database: cantools.database.can.Database,
+        sig_vals: dict[str, dict[str, int]],
+        rx_msg_stats: dict = None,
+        node: str = None,
+        rx_ids: set[int] = None,
+        tx_ids: set[int] = None,
+        lazy: bool = False,
+        queue_size: int = 0,
+        workers: int = 1,
+        bitrate: int = 500000,
+        profiler: CanifProfiler = None,
+        batch_window: float = 0,
+        history_size: int = 0,
+        bus_factory=None,
+        tx_queue_size: int = 1000,
+    ):
+        """
+        Initialize a CanifBus.
+
+        Args:
+            name (str): Channel name used to namespace messages of this bus.
+            bus (can.BusABC or CanifDecodeProcess): CAN bus interface. With a
+                CanifDecodeProcess, frames are received and decoded in its
+                child process and applied in batches on refresh().
+            database (cantools.database.can.Database): CAN database for this bus.
+            sig_vals (dict): Dictionary of signal values by message name.
+                Wrapped in a CanifSignalStore unless it is one, the dict then
+                holds the same values as the store.
+            rx_msg_stats (CanifRxStatsTable, optional): Receive statistics by
+                message name. Created from the database if not given, a dict
+                is copied into a table.
+            node (str, optional): Name of node which is the receiver and transmitter
+            rx_ids (set, optional): Set of CAN IDs to receive.
+            tx_ids (set, optional): Set of CAN IDs to send.
+            lazy (bool, optional): Decode received frames only when read.
+            queue_size (int, optional): Decode queue size, 0 decodes inline.
+            workers (int, optional): Number of decode workers behind the queue.
+            bitrate (int, optional): Nominal bitrate used for the bus load.
+            profiler (CanifProfiler, optional): Records the receive path times.
+            batch_window (float, optional): Decode received frames in batches
+                collected for this many seconds, 0 decodes every frame.
+            history_size (int, optional): Decoded frames kept per message in
+                batch mode.
+            bus_factory (callable, optional): Returns a new can.BusABC to
+                replace the bus after an error. Without it the bus is only
+                polled until it works again.
+            tx_queue_size (int, optional): Frames held while the bus is
+                down, the oldest are dropped beyond it.
+        """
+        if node == None and (rx_ids == None or tx_ids == None):
+            raise ValueError("Must provide rx & tx ids or node")
+        self.name: str = name
+        self.bus: can.BusABC = bus
+        self.db: cantools.database.can.Database = database
+        self.sig_vals: CanifSignalStore = CanifSignalStore.wrap(sig_vals, database)
+        self.node: str = node
+        self.rx_ids: set[int] = rx_ids
+        self.tx_ids: set[int] = tx_ids
+        if self.node:
+            self.tx_ids = {
+                msg.frame_id for msg in self.db.messages if self.node in msg.senders
+            }
+            self.rx_ids = {
+                msg.frame_id for msg in self.db.messages if self.node in msg.receivers
+            }
+        else:
+            # membership is tested per frame and per listed message
+            self.tx_ids = set(tx_ids)
+            self.rx_ids = set(rx_ids)
+        if rx_msg_stats is None:
+            rx_msg_stats = CanifRxStatsTable(
+                msg.name for msg in self.db.messages if msg.frame_id not in self.tx_ids
+            )
+        self.rx_msg_stats: CanifRxStatsTable = CanifRxStatsTable.wrap(rx_msg_stats)
+        self.listener: CanifListener = CanifListener(
+            sig_vals=self.sig_vals,
+            database=self.db,
+            rx_msg_stats=self.rx_msg_stats,
+            lazy=lazy,
+            queue_size=queue_size,
+            workers=workers,
+            profiler=profiler,
+            batch_window=batch_window,
+            history_size=history_size,
+        )
+        self.bus_load: CanifBusLoad = CanifBusLoad(bitrate=bitrate)
+        self.listener.add_observer(self.bus_load.on_frame)
+        self.triggers: CanifTriggerEngine = CanifTriggerEngine(self.sig_vals)
+        self.listener.add_decode_hook(self.triggers.on_decoded)
+        self.rtt: CanifRttTracker = CanifRttTracker(self.sig_vals)
+        # {frame_id: request message name} of the rtt pairs
+        self._rtt_requests: dict[int, str] = {}
+        self.listener.add_decode_hook(self.rtt.on_decoded)
+        self.notifier: can.Notifier = None
+        self.remote: bool = isinstance(bus, CanifDecodeProcess)
+        # latest queue and load counters of a decode process
+        self._remote_stats: dict = None
+        # applies the batches of a decode process as they arrive
+        self._remote_thread: threading.Thread = None
+        self._start_time: float = 0
+        self._start_count: int = 0
+        self.bus_factory = bus_factory
+        # listeners attached next to the CanifListener
+        self._listeners: list[can.Listener] = []
+        self.tx_queue_size: int = tx_queue_size
+        self._tx_queue: deque[can.Message] = deque()
+        # guards the down state and the held frames
+        self._tx_lock = threading.Lock()
+        self._down: bool = False
+        self._down_since: float = 0
+        self._recovery: threading.Thread = None
+        self._stop_event = threading.Event()
+        # the bus was opened by the recovery and is shut down on stop
+        self._owns_bus: bool = False
+        self._reopen_on_start: bool = False
+        # [faults, recoveries, downtime in s, dropped tx frames]
+        self._fault_stats: list = [0, 0, 0.0, 0]
+        if not self.remote:
+            self.listener.error_handler = self._on_rx_error
+
+    def start(self, listeners: list[can.Listener] = None) -> None:
+        """
+        Start receiving on this bus.
+
+        Args:
+            listeners (list, optional): Extra listeners (e.g. a can.Logger)
+                to attach next to the CanifListener.
+        """
+        if self.notifier or self._recovery or self._remote_thread:
+            return
+        self._start_time = time.time()
+        self._start_count = self._get_rx_count()
+        if self.remote:
+            if listeners:
+                print(f"{self.name}: listeners are not supported by a decode process")
+            self._stop_event.clear()
+            self.bus.start()
+            self._remote_thread = threading.Thread(
+                target=self._remote_loop, name=f"canif-remote-{self.name}", daemon=True
+            )
+            self._remote_thread.start()
+            return
+        self._stop_event.clear()
+        self._listeners = list(listeners or [])
+        if self._reopen_on_start:
+            self.bus = self.bus_factory()
+            self._owns_bus = True
+            self._reopen_on_start = False
+        self._attach()
+
+    def stop(self) -> None:
+        """
+        Stop receiving on this bus. A bus opened by the recovery is shut
+        down.
+        """
+        self._stop_event.set()
+        if self._recovery:
+            self._recovery.join()
+            self._recovery = None
+        if self._remote_thread:
+            self._remote_thread.join()
+            self._remote_thread = None
+        if self.remote:
+            self.bus.stop()
+            # the last batches drained while the process stopped
+            self._apply_remote()
+        if self.notifier:
+            self.notifier.stop()
+            self.notifier = None
+        if self._owns_bus:
+            self.bus.shutdown()
+            self._owns_bus = False
+            self._reopen_on_start = True
+
+    def _attach(self) -> None:
+        self.listener.start()
+        self.notifier = can.Notifier(self.bus, [self.listener] + self._listeners)
+
+    def _detach(self) -> None:
+        # keep the extra listeners, e.g. a can.Logger, open
+        for listener in self._listeners:
+            self.notifier.remove_listener(listener)
+        self.notifier.stop()
+        self.notifier = None
+
+    def send(self, msg: can.Message, timeout: float = None) -> None:
+        """
+        Send a frame, or hold it while the bus is down. Held frames are sent
+        in order when the bus is back, the oldest are dropped when more than
+        tx_queue_size are held.
+
+        Args:
+            msg (can.Message): Frame to send.
+            timeout (float, optional): Send timeout of the bus.
+
+        Raises:
+            can.CanError: If sending fails on a bus that can't recover.
+        """
+        if not self._down:
+            try:
+                self.bus.send(msg, timeout)
+                self._on_transmitted(msg)
+                return
+            except can.CanError as e:
+                if self.remote:
+                    raise
+                self._on_bus_error(e)
+        with self._tx_lock:
+            if self._down:
+                if len(self._tx_queue) >= self.tx_queue_size:
+                    self._tx_queue.popleft()
+                    self._fault_stats[3] += 1
+                self._tx_queue.append(msg)
+                return
+        # recovered meanwhile
+        self.bus.send(msg, timeout)
+        self._on_transmitted(msg)
+
+    def _on_transmitted(self, msg: can.Message) -> None:
+        # held frames count from their transmission, not from the request
+        request = self._rtt_requests.get(msg.arbitration_id)
+        if request:
+            self.rtt.on_sent(request, time.time())
+
+    def _on_rx_error(self, exc: Exception) -> None:
+        if not self._is_bus_fault(exc):
+            # raised by a listener, e.g. a can.Logger on a full disk, the bus
+            # itself works
+            self.listener.profiler.count("listener_errors")
+            print(f"{self.name}: listener error: {repr(exc)}")
+            return
+        self._on_bus_error(exc)
+        # the notifier retries receiving right away
+        time.sleep(0.01)
+
+    @staticmethod
+    def _is_bus_fault(exc: Exception) -> bool:
+        """
+        Returns True for an error of the bus, raised by receiving, and False
+        for errors raised while the notifier passed a frame to the listeners.
+        """
+        if not isinstance(exc, (can.CanError, OSError)):
+            return False
+        tb = exc.__traceback__
+        while tb is not None:
+            if tb.tb_frame.f_code.co_name == "_on_message_received":
+                return False
+            tb = tb.tb_next
+        return True
+
+    def _on_bus_error(self, exc: Exception) -> None:
+        with self._tx_lock:
+            if self._down or self._stop_event.is_set():
+                return
+            self._down = True
+            self._down_since = time.time()
+            self._fault_stats[0] += 1
+        print(f"{self.name}: bus error, recovering: {repr(exc)}")
+        self._recovery = threading.Thread(
+            target=self._recover, name=f"canif-recover-{self.name}", daemon=True
+        )
+        self._recovery.start()
+
+    def _recover(self) -> None:
+        """
+        Reopen the bus with backoff until it works, then reattach the
+        listeners and send the held frames.
+        """
+        delay = self.BACKOFF_MIN
+        while not self._stop_event.is_set():
+            if self.notifier:
+                self._detach()
+            try:
+                self._reopen()
+                self._attach()
+                self._flush()
+            except (can.CanError, OSError) as e:
+                print(f"{self.name}: recovery failed, retry in {delay} s: {repr(e)}")
+                if self._stop_event.wait(delay):
+                    return
+                delay = min(2 * delay, self.BACKOFF_MAX)
+                continue
+            print(f"{self.name}: bus recovered")
+            return
+
+    def _reopen(self) -> None:
+        if self.bus_factory is None:
+            # no way to reopen, poll until the bus works again
+            msg = self.bus.recv(0)
+            if msg:
+                self.listener.on_message_received(msg)
+            return
+        try:
+            self.bus.shutdown()
+        except (can.CanError, OSError):
+            pass
+        self.bus = self.bus_factory()
+        self._owns_bus = True
+
+    def _flush(self) -> None:
+        """
+        Send the held frames in order and mark the bus up.
+
+        Raises:
+            can.CanError: If a send fails, the unsent frames stay held.
+        """
+        with self._tx_lock:
+            while self._tx_queue:
+                self.bus.send(self._tx_queue[0])
+                self._on_transmitted(self._tx_queue.popleft())
+            self._down = False
+            self._fault_stats[1] += 1
+            self._fault_stats[2] += time.time() - self._down_since
+
+    def add_trigger(
+        self, expression: str, action, name: str = None, holdoff: float = 0.0
+    ) -> CanifTrigger:
+        """
+        Add a trigger evaluated when the messages it references are received.
+
+        Args:
+            expression (str): Condition on 'Message.Signal' names.
+            action (callable): Called as action(trigger, receive_time).
+            name (str, optional): Name of the trigger.
+            holdoff (float, optional): Minimum seconds between two firings.
+        """
+        trigger = self.triggers.add(expression, action, name=name, holdoff=holdoff)
+        # referenced messages are decoded on receive, even in lazy mode
+        self.listener.eager_msgs.update(trigger.msg_names)
+        return trigger
+
+    def add_rtt_pair(
+        self,
+        request: str,
+        response: str,
+        match: dict[str, float] = None,
+        timeout: float = 1.0,
+        name: str = None,
+    ) -> CanifRttPair:
+        """
+        Measure the round-trip latency from sending a request message to
+        receiving its response message on this bus.
+
+        Args:
+            request (str): Name of the sent request message.
+            response (str): Name of the received response message.
+            match (dict, optional): {signal_name: value} the response must
+                contain to complete a request.
+            timeout (float, optional): Seconds to wait for a response.
+            name (str, optional): Name of the pair.
+        """
+        try:
+            frame_id = self.db.get_message_by_name(request).frame_id
+        except KeyError:
+            raise ValueError(f"Unknown request message '{request}'")
+        pair = self.rtt.add(
+            request=request, response=response, match=match, timeout=timeout, name=name
+        )
+        # requests are timestamped by send() when they are transmitted
+        self._rtt_requests[frame_id] = request
+        # responses are timestamped on receive, even in lazy mode
+        self.listener.eager_msgs.add(response)
+        return pair
+
+    def namespaced(self, msg_name: str) -> str:
+        """
+        Returns the message name prefixed with this bus name.
+        """
+        return f"{self.name}{self.NS_SEP}{msg_name}"
+
+    def refresh(self, msg_name: str = None) -> None:
+        """
+        Apply the batches of a decode process, or decode pending frames when
+        the listener is in lazy mode.
+
+        Args:
+            msg_name (str, optional): Message to decode. Only the receive
+                stats are updated if not given.
+        """
+        if self.remote:
+            if not self._remote_thread:
+                self._apply_remote()
+            return
+        if not self.listener.lazy:
+            return
+        if msg_name is None:
+            self.listener.refresh_stats()
+        else:
+            self.listener.refresh(msg_name)
+
+    def _remote_loop(self) -> None:
+        # decode hooks (triggers, rtt, shm, recorder) run on receive, not
+        # only when the UI refreshes
+        while not self._stop_event.is_set():
+            try:
+                self._apply_remote(timeout=0.05)
+            except can.CanOperationError as e:
+                print(f"{self.name}: {repr(e)}")
+                return
+
+    def _apply_remote(self, timeout: float = 0) -> None:
+        for batch in self.bus.poll(timeout):
+            for msg_name, (values, stats, now) in batch["signals"].items():
+                # only received messages, not the echo of our own config
+                if msg_name in self.rx_msg_stats:
+                    self.listener.apply_decoded(msg_name, values, stats, now)
+            self._remote_stats = batch
+
+    def get_load(self, top: int = 5) -> dict:
+        """
+        Returns the bus load with message names added to the top talkers.
+
+        Args:
+            top (int, optional): Number of top talkers to report.
+
+        Returns:
+            dict: {'load': utilization in percent, 'fps': frames per second,
+                   'top': [(frame_id, msg_name, fps, load in percent), ...]}
+        """
+        if self.remote:
+            self.refresh()
+            load = dict(self._remote_stats["load"]) if self._remote_stats else {}
+            load.setdefault("load", 0)
+            load.setdefault("fps", 0)
+            load["top"] = load.get("top", [])[:top]
+        else:
+            load = self.bus_load.get_load(top=top)
+        talkers = []
+        for frame_id, fps, id_load in load["top"]:
+            try:
+                msg_name = self.db.get_message_by_frame_id(frame_id).name
+            except KeyError:
+                msg_name = ""
+            talkers.append((frame_id, msg_name, fps, id_load))
+        load["top"] = talkers
+        return load
+
+    def _get_rx_count(self) -> int:
+        self.refresh()
+        return self.rx_msg_stats.total_count()
+
+    def get_stats(self) -> dict:
+        """
+        Returns receive statistics for this bus.
+
+        Returns:
+            dict: {'frames': total received, 'messages': message types seen,
+                   'rate': average frames per second since start,
+                   'depth', 'high_water', 'dropped': decode queue counters,
+                   'load', 'fps': bus load in percent and frames per second,
+                   'batch_latency_ms': max receive to decode time in batch mode,
+                   'state': 'up' or 'down', 'faults', 'recoveries',
+                   'downtime_s': total time down, 'tx_held': frames held,
+                   'tx_dropped': held frames dropped}
+        """
+        frames = self._get_rx_count()
+        load = self.get_load(top=0)
+        queue_stats = self.listener.get_queue_stats()
+        if self._remote_stats:
+            queue_stats = self._remote_stats["queue"]
+        seen = self.rx_msg_stats.seen()
+        elapsed = time.time() - self._start_time if self._start_time else 0
+        rate = (frames - self._start_count) / elapsed if elapsed > 0 else 0
+        return {
+            "frames": frames,
+            "messages": seen,
+            "rate": round(rate, 1),
+            **queue_stats,
+            "load": load["load"],
+            "fps": load["fps"],
+            "batch_latency_ms": self.listener.get_batch_stats()["latency_max_ms"],
+            **self.get_fault_stats(),
+        }
+
+    def get_fault_stats(self) -> dict:
+        """
+        Returns the bus error and recovery counters.
+
+        Returns:
+            dict: {'state': 'up' or 'down', 'faults', 'recoveries',
+                   'downtime_s': total time down, 'tx_held': frames held,
+                   'tx_dropped': held frames dropped}
+        """
+        faults, recoveries, downtime, dropped = self._fault_stats
+        if self._down:
+            downtime += time.time() - self._down_since
+        return {
+            "state": "down" if self._down else "up",
+            "faults": faults,
+            "recoveries": recoveries,
+            "downtime_s": round(downtime, 3),
+            "tx_held": len(self._tx_queue),
+            "tx_dropped": dropped,
+        }
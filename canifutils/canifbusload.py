@@ -0,0 +1,123 @@
+import heapq
+import threading
+import time
+from collections import deque
+
+import can
+
+
+class CanifBusLoad:
+    """
+    Estimates CAN bus utilization from the received frames.
+
+    Every frame is converted to the number of bits it occupies on the bus,
+    including a worst-case estimate of the stuff bits, and kept in a
+    sliding time window. The load is the share of the bitrate used by the
+    frames in the window.
+    """
+
+    # SOF, ID, RTR, IDE, r0, DLC and CRC: the bit stuffed part of a standard frame
+    STD_STUFFED_BITS = 34
+    # SOF, ID, SRR, IDE, ID extension, RTR, r1, r0, DLC and CRC
+    EXT_STUFFED_BITS = 54
+    # CRC delimiter, ACK slot and delimiter, EOF and interframe space
+    FIXED_BITS = 13
+
+    def __init__(self, bitrate: int = 500000, window: float = 1.0):
+        """
+        Initialize CanifBusLoad instance.
+
+        Args:
+            bitrate (int, optional): Nominal bitrate of the bus in bit/s.
+            window (float, optional): Length of the sliding window in seconds.
+        """
+        self.bitrate: int = bitrate
+        self.window: float = window
+        # (timestamp, bits, frame id) of every frame in the window
+        self._frames: deque = deque()
+        self._bits: int = 0
+        self._id_counts: dict[int, int] = {}
+        self._id_bits: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def frame_bits(cls, dlc: int, is_extended_id: bool) -> int:
+        """
+        Returns the worst-case number of bits a frame occupies on the bus.
+
+        Args:
+            dlc (int): Number of data bytes.
+            is_extended_id (bool): True for a 29 bit identifier.
+        """
+        if is_extended_id:
+            stuffed = cls.EXT_STUFFED_BITS + 8 * dlc
+        else:
+            stuffed = cls.STD_STUFFED_BITS + 8 * dlc
+        # worst case is a stuff bit after the first 5 and then every 4 bits
+        stuff = (stuffed - 1) // 4
+        return stuffed + stuff + cls.FIXED_BITS
+
+    def on_frame(self, msg: can.Message, now: float) -> None:
+        """
+        Add a received frame to the window.
+
+        Args:
+            msg (can.Message): The received CAN message.
+            now (float): Receive time in seconds.
+        """
+        dlc = 0 if msg.is_remote_frame else len(msg.data)
+        bits = self.frame_bits(dlc, msg.is_extended_id)
+        frame_id = msg.arbitration_id
+        with self._lock:
+            self._frames.append((now, bits, frame_id))
+            self._bits += bits
+            self._id_counts[frame_id] = self._id_counts.get(frame_id, 0) + 1
+            self._id_bits[frame_id] = self._id_bits.get(frame_id, 0) + bits
+            self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        start = now - self.window
+        frames = self._frames
+        while frames and frames[0][0] < start:
+            _, bits, frame_id = frames.popleft()
+            self._bits -= bits
+            count = self._id_counts[frame_id] - 1
+            if count:
+                self._id_counts[frame_id] = count
+                self._id_bits[frame_id] -= bits
+            else:
+                del self._id_counts[frame_id]
+                del self._id_bits[frame_id]
+
+    def get_load(self, top: int = 5) -> dict:
+        """
+        Returns the bus utilization over the window.
+
+        Args:
+            top (int, optional): Number of top talkers to report.
+
+        Returns:
+            dict: {'load': utilization in percent, 'fps': frames per second,
+                   'top': [(frame_id, frames per second, load in percent), ...]}
+        """
+        capacity = self.bitrate * self.window
+        with self._lock:
+            self._prune(time.time())
+            frames = len(self._frames)
+            bits = self._bits
+            talkers = heapq.nlargest(
+                top, self._id_bits.items(), key=lambda item: item[1]
+            )
+            talkers = [
+                (
+                    frame_id,
+                    round(self._id_counts[frame_id] / self.window, 1),
+                    round(100 * id_bits / capacity, 2),
+                )
+                for frame_id, id_bits in talkers
+            ]
+        return {
+            "load": round(100 * bits / capacity, 2),
+            "fps": round(frames / self.window, 1),
+            "top": talkers,
+        }
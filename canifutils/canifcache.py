@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+class CanifDecodeCache:
+    """
+    State of an incremental decode of a growing CSV log.
+
+    The state records how far the log was decoded (byte offset of the next
+    row to decode), the output written so far (its columns and their
+    dtypes, its size and its size up to that row) and the key it is valid
+    for: the DBC content hash, the enum offset and the identity of the log
+    file (device, inode and a hash of its first bytes). A state is only
+    reused when the key matches, the log didn't shrink and the output is
+    unchanged since it was written.
+    """
+
+    # bump when the decoded output format changes
+    VERSION = 3
+    # bytes at the start of the log hashed to detect a replaced log
+    HEAD_BYTES = 4096
+
+    def __init__(self, path: Path):
+        """
+        Initialize CanifDecodeCache instance.
+
+        Args:
+            path (Path): JSON file holding the state.
+        """
+        self.path: Path = Path(path)
+
+    @staticmethod
+    def _sha256(path: Path, size: int = None) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            if size is None:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            else:
+                digest.update(f.read(size))
+        return digest.hexdigest()
+
+    @classmethod
+    def key(cls, dbc_file: Path, enum: int) -> dict:
+        """
+        Returns the part of the key that doesn't depend on the log.
+
+        Args:
+            dbc_file (Path): DBC file the log is decoded with.
+            enum (int): Enumeration offset of the node IDs.
+        """
+        return {
+            "version": cls.VERSION,
+            "dbc_sha256": cls._sha256(dbc_file),
+            "enum": enum,
+        }
+
+    @classmethod
+    def log_identity(cls, log_file: Path, offset: int) -> dict:
+        """
+        Returns the identity of a log decoded up to a byte offset.
+
+        Args:
+            log_file (Path): The log.
+            offset (int): Bytes of the log decoded.
+        """
+        stat = os.stat(log_file)
+        head = min(cls.HEAD_BYTES, offset)
+        return {
+            "path": str(Path(log_file).resolve()),
+            "device": stat.st_dev,
+            "inode": stat.st_ino,
+            "head_bytes": head,
+            "head_sha256": cls._sha256(log_file, head),
+        }
+
+    def load(self, key: dict, log_file: Path, output_file: Path) -> dict:
+        """
+        Returns the saved state if it is valid for the key, the log and the
+        output, otherwise None.
+
+        Args:
+            key (dict): From key().
+            log_file (Path): The log to decode.
+            output_file (Path): The output written so far.
+
+        Returns:
+            dict: {'offset', 'columns', 'dtypes', 'boundary_size', ...} or
+                None.
+        """
+        try:
+            state = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+        if state.get("key") != key:
+            return None
+        offset = state.get("offset", 0)
+        try:
+            if os.path.getsize(log_file) < offset:
+                # truncated or rotated
+                return None
+            if state.get("log") != self.log_identity(log_file, offset):
+                return None
+            if os.path.getsize(output_file) != state.get("output_size"):
+                return None
+        except OSError:
+            return None
+        return state
+
+    def save(
+        self,
+        key: dict,
+        log_file: Path,
+        offset: int,
+        output_file: Path,
+        columns: list[str],
+        dtypes: dict[str, str],
+        boundary_size: int,
+    ) -> None:
+        """
+        Save the state after writing the output, replacing it atomically.
+
+        Args:
+            key (dict): From key().
+            log_file (Path): The decoded log.
+            offset (int): Byte offset of the next row to decode.
+            output_file (Path): The output written so far.
+            columns (list): Columns of the output.
+            dtypes (dict): {column: dtype name} of the output columns.
+            boundary_size (int): Size of the output up to the rows decoded
+                before offset.
+        """
+        state = {
+            "key": key,
+            "log": self.log_identity(log_file, offset),
+            "offset": offset,
+            "output_size": os.path.getsize(output_file),
+            "columns": columns,
+            "dtypes": dtypes,
+            "boundary_size": boundary_size,
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(state, indent=1))
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        """
+        Remove the saved state.
+        """
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+
+
+class CanifConfigStore:
+    """
+    Persists configuration signal values off the UI thread.
+
+    Saves are debounced: changes handed to save() within the debounce time
+    are merged and written once by a background thread. The file is written
+    to a temporary file and atomically replaced, so an interrupted save
+    never leaves a truncated config file behind.
+
+    The file is compact JSON with a version stamp. Every message stores a
+    checksum of its signal names next to its values, so loading is a plain
+    apply of the values when the database layout didn't change.
+    """
+
+    VERSION = 2
+    DEFAULT_PATH = Path("data") / "cangui_config_params.csv"
+
+    def __init__(self, fcfg_path: Path = None, debounce: float = 0.5):
+        """
+        Initialize CanifConfigStore instance.
+
+        Args:
+            fcfg_path (Path, optional): Path to the configuration file.
+            debounce (float, optional): Seconds to wait for more changes
+                before writing.
+        """
+        self.fcfg_path: Path = Path(fcfg_path or self.DEFAULT_PATH)
+        self.debounce: float = debounce
+        # {msg_name: [signature, [signal names], [values]]} as on disk
+        self._doc: dict = None
+        self._pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer: threading.Thread = None
+
+    @staticmethod
+    def signature(names) -> int:
+        """
+        Returns a checksum of the signal names of a message.
+        """
+        return zlib.crc32(",".join(names).encode())
+
+    @classmethod
+    def read(cls, fcfg_path: Path = None) -> dict:
+        """
+        Read a configuration file.
+
+        Args:
+            fcfg_path (Path, optional): Path to the configuration file.
+
+        Returns:
+            dict: {msg_name: [signature, [signal names], [values]]}. Files
+                  in the legacy {msg_name: {signal_name: value}} format are
+                  converted. Empty if the file doesn't exist or is invalid.
+        """
+        fcfg_path = Path(fcfg_path or cls.DEFAULT_PATH)
+        if not fcfg_path.exists():
+            return {}
+        try:
+            with open(fcfg_path, "r") as fcfg:
+                doc = json.load(fcfg)
+        except (OSError, json.JSONDecodeError):
+            print("Error reading configuration file")
+            return {}
+
+        messages = cls._parse(doc)
+        if messages is None:
+            print("Error reading configuration file")
+            return {}
+        return messages
+
+    @classmethod
+    def _parse(cls, doc) -> dict:
+        """
+        Returns the messages of a configuration document, or None if its
+        version or shape is unknown.
+        """
+        if not isinstance(doc, dict):
+            return None
+        if "version" in doc:
+            messages = doc.get("messages")
+            if doc["version"] != cls.VERSION or not isinstance(messages, dict):
+                return None
+            for entry in messages.values():
+                if (
+                    not isinstance(entry, list)
+                    or len(entry) != 3
+                    or not isinstance(entry[1], list)
+                    or not isinstance(entry[2], list)
+                    or len(entry[1]) != len(entry[2])
+                ):
+                    return None
+            return messages
+        # legacy format
+        messages = {}
+        for msg_name, signals in doc.items():
+            if not isinstance(signals, dict):
+                return None
+            names = list(signals.keys())
+            messages[msg_name] = [cls.signature(names), names, list(signals.values())]
+        return messages
+
+    @classmethod
+    def to_sig_dict(cls, messages: dict) -> dict[str, dict]:
+        """
+        Converts messages as returned by read() to {msg_name: {signal_name: value}}.
+        """
+        return {
+            msg_name: dict(zip(names, values))
+            for msg_name, (_, names, values) in messages.items()
+        }
+
+    @classmethod
+    def apply(cls, messages: dict, sig_dict: dict[str, dict]) -> None:
+        """
+        Apply stored values onto an initialized signal dictionary.
+
+        Messages with an unchanged signal layout are applied directly, the
+        others are merged by signal name.
+
+        Args:
+            messages (dict): Messages as returned by read().
+            sig_dict (dict): Signal dictionary with an entry for every message.
+        """
+        for msg_name, (sig, names, values) in messages.items():
+            msg_vals = sig_dict.get(msg_name)
+            if msg_vals is None:
+                continue
+            if sig == cls.signature(msg_vals.keys()):
+                msg_vals.update(zip(names, values))
+            else:
+                for name, value in zip(names, values):
+                    if name in msg_vals:
+                        msg_vals[name] = value
+
+    def save(self, changes: dict[str, dict]) -> None:
+        """
+        Schedule changed messages to be written.
+
+        Args:
+            changes (dict): {msg_name: {signal_name: value, ...}, ...} of the
+                messages that changed since the last save.
+        """
+        if not changes:
+            return
+        with self._lock:
+            for msg_name, signals in changes.items():
+                self._pending[msg_name] = dict(signals)
+            if not self._writer:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+        self._wake.set()
+
+    def flush(self) -> None:
+        """
+        Write pending changes now, on the calling thread.
+        """
+        self._write_pending()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            # coalesce changes arriving within the debounce time
+            while self._wake.is_set():
+                self._wake.clear()
+                self._wake.wait(self.debounce)
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+            if not pending:
+                return
+            if self._doc is None:
+                self._doc = self.read(self.fcfg_path)
+
+            changed = False
+            for msg_name, signals in pending.items():
+                names = list(signals.keys())
+                entry = [self.signature(names), names, list(signals.values())]
+                if self._doc.get(msg_name) != entry:
+                    self._doc[msg_name] = entry
+                    changed = True
+            if not changed:
+                return
+            try:
+                self._write_doc(self.fcfg_path, self._doc)
+                print("Wrote updated params to config file")
+            except Exception as e:
+                print("Error: Failed to write new params to config file" + repr(e))
+
+    @classmethod
+    def _write_doc(cls, fcfg_path: Path, messages: dict) -> None:
+        """
+        Write messages in the read() format to a temporary file and replace
+        the configuration file with it.
+        """
+        data = json.dumps(
+            {"version": cls.VERSION, "messages": messages},
+            separators=(",", ":"),
+        )
+        fcfg_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = fcfg_path.with_name(fcfg_path.name + ".tmp")
+        with open(tmp_path, "w") as fcfg:
+            fcfg.write(data)
+            fcfg.flush()
+            os.fsync(fcfg.fileno())
+        os.replace(tmp_path, fcfg_path)
+
+    @classmethod
+    def write(cls, fcfg_path: Path, sig_dict: dict[str, dict]) -> None:
+        """
+        Write a complete configuration file on the calling thread, e.g. a
+        profile. The file is replaced atomically.
+
+        Args:
+            fcfg_path (Path): Path to the configuration file.
+            sig_dict (dict): {msg_name: {signal_name: value, ...}, ...}
+        """
+        messages = {}
+        for msg_name, signals in sig_dict.items():
+            names = list(signals.keys())
+            messages[msg_name] = [cls.signature(names), names, list(signals.values())]
+        cls._write_doc(Path(fcfg_path), messages)
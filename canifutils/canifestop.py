@@ -0,0 +1,260 @@
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+
+import can
+import cantools
+
+from .canifmux import CanifMuxTable
+from .canifprof import CanifProfiler
+
+
+class CanifEstop:
+    """
+    Sends a pre-encoded emergency stop frame from a dedicated thread.
+
+    The frame is encoded when the estop is set up and again only when the
+    other signals of the message change, so a request only hands a
+    timestamp to the estop thread. The thread asks for a real-time or raised
+    scheduling priority where the OS allows it. Callers yield the GIL after
+    a request so the estop thread runs next.
+
+    Requests come from the GUI button, the terminal, trigger actions and
+    optionally a local UDP socket. The latency from the request to the call
+    of bus.send is recorded per source.
+    """
+
+    # datagram that requests an estop on the UDP socket
+    UDP_REQUEST = b"estop"
+
+    def __init__(
+        self,
+        bus: can.BusABC,
+        message: cantools.database.can.Message,
+        sig_name: str,
+        sig_value: int,
+        sig_vals: dict,
+        mux_table: CanifMuxTable = None,
+        on_sent=None,
+        profiler: CanifProfiler = None,
+        samples: int = 1000,
+    ):
+        """
+        Initialize CanifEstop instance.
+
+        Args:
+            bus (can.BusABC or CanifBus): Bus the frame is sent on. A CanifBus
+                holds the frame while the bus recovers from an error.
+            message (cantools.database.can.Message): Emergency stop message.
+            sig_name (str): Signal set to the stop value.
+            sig_value (int): Stop value of the signal.
+            sig_vals (dict): Current values of the message signals, the other
+                signals of the frame keep them.
+            mux_table (CanifMuxTable, optional): Mux table of the message.
+            on_sent (callable, optional): Called as on_sent(receive_time) on
+                the estop thread after the frame was sent.
+            profiler (CanifProfiler, optional): Records the latency as the
+                'estop' timer.
+            samples (int, optional): Latencies kept per source for the
+                percentiles.
+        """
+        self.bus: can.BusABC = bus
+        self.message: cantools.database.can.Message = message
+        self.sig_name: str = sig_name
+        self.sig_value: int = sig_value
+        self.mux_table: CanifMuxTable = mux_table
+        self.on_sent = on_sent
+        self.profiler: CanifProfiler = profiler or CanifProfiler()
+        self.frame: can.Message = None
+        self.update(sig_vals)
+        self._requests: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread = None
+        self._socket: socket.socket = None
+        self._udp_thread: threading.Thread = None
+        self.samples: int = samples
+        # {source: [count, total, max, last, deque of latencies]} in seconds
+        self._stats: dict[str, list] = {}
+        self._stats_lock = threading.Lock()
+
+    def update(self, sig_vals: dict) -> None:
+        """
+        Encode the frame again with new values of the other signals.
+
+        Args:
+            sig_vals (dict): {signal_name: value} of the message.
+        """
+        sig_dict = {**sig_vals, self.sig_name: self.sig_value}
+        if self.mux_table:
+            sig_dict = self.mux_table.filter(sig_dict)
+        self.frame = can.Message(
+            arbitration_id=self.message.frame_id,
+            data=self.message.encode(sig_dict),
+            is_extended_id=self.message.is_extended_frame,
+        )
+
+    def start(self) -> None:
+        """
+        Start the estop thread.
+        """
+        if self._thread:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="canif-estop", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the estop thread and the UDP socket. Pending requests are sent
+        first.
+        """
+        if self._socket:
+            sock = self._socket
+            self._socket = None
+            # closing doesn't wake a blocked recvfrom, an empty datagram does
+            sock.sendto(b"", sock.getsockname())
+            self._udp_thread.join()
+            sock.close()
+        if self._thread:
+            self._requests.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def trigger(self, source: str = "api") -> None:
+        """
+        Request an emergency stop. Sent inline if the estop thread isn't
+        running.
+
+        Args:
+            source (str, optional): Name of the requester for the latency
+                stats, e.g. 'gui', 'term', 'trigger' or 'udp'.
+        """
+        request = (time.perf_counter(), source)
+        if not self._thread:
+            self._send(*request)
+            return
+        self._requests.put(request)
+        # give up the GIL so the estop thread sends right away
+        time.sleep(0)
+
+    def listen(self, port: int, host: str = "127.0.0.1") -> int:
+        """
+        Accept estop requests as UDP datagrams, e.g.
+        'echo -n estop | nc -u -w0 127.0.0.1 <port>'. Every request is
+        answered with 'ok <latency ms>'.
+
+        Args:
+            port (int): UDP port, 0 picks a free port.
+            host (str, optional): Address to bind, local only by default.
+
+        Returns:
+            int: The bound port.
+        """
+        if self._socket:
+            raise RuntimeError("Estop socket already listening")
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._udp_thread = threading.Thread(
+            target=self._serve_udp, name="canif-estop-udp", daemon=True
+        )
+        self._udp_thread.start()
+        return self._socket.getsockname()[1]
+
+    def _serve_udp(self) -> None:
+        sock = self._socket
+        while True:
+            try:
+                data, addr = sock.recvfrom(64)
+            except OSError:
+                break
+            if self._socket is not sock:
+                # stopped
+                break
+            start = time.perf_counter()
+            if data.strip().lower() != self.UDP_REQUEST:
+                continue
+            # sent inline, the socket thread is as dedicated as the estop thread
+            latency = self._send(start, "udp")
+            try:
+                sock.sendto(f"ok {1000 * latency:.3f}".encode(), addr)
+            except OSError:
+                pass
+
+    def _raise_priority(self) -> None:
+        # best effort, needs CAP_SYS_NICE for real-time or negative nice
+        tid = threading.get_native_id()
+        try:
+            os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(1))
+            return
+        except (AttributeError, OSError):
+            pass
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, -10)
+        except (AttributeError, OSError):
+            pass
+
+    def _run(self) -> None:
+        self._raise_priority()
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            self._send(*request)
+
+    def _send(self, requested: float, source: str) -> float:
+        start = time.perf_counter()
+        try:
+            self.bus.send(self.frame)
+        except can.CanError as e:
+            self.profiler.count("estop_errors")
+            print(f"CanifEstop: {repr(e)}")
+        latency = start - requested
+        self.profiler.add("estop", int(latency * 1e9))
+        with self._stats_lock:
+            stats = self._stats.get(source)
+            if stats is None:
+                stats = self._stats[source] = [
+                    0,
+                    0.0,
+                    0.0,
+                    0.0,
+                    deque(maxlen=self.samples),
+                ]
+            stats[0] += 1
+            stats[1] += latency
+            stats[2] = max(stats[2], latency)
+            stats[3] = latency
+            stats[4].append(latency)
+        if self.on_sent:
+            self.on_sent(time.time())
+        return latency
+
+    def get_stats(self) -> dict[str, dict]:
+        """
+        Returns the latency from request to bus.send per source.
+
+        Returns:
+            dict: {source: {'count', 'last_ms', 'mean_ms', 'p50_ms',
+                   'p99_ms', 'max_ms'}}
+        """
+        result = {}
+        with self._stats_lock:
+            for source, (count, total, worst, last, samples) in self._stats.items():
+                ordered = sorted(samples)
+
+                def percentile(p):
+                    index = min(len(ordered) - 1, int(p * len(ordered)))
+                    return round(1000 * ordered[index], 3)
+
+                result[source] = {
+                    "count": count,
+                    "last_ms": round(1000 * last, 3),
+                    "mean_ms": round(1000 * total / count, 3),
+                    "p50_ms": percentile(0.5),
+                    "p99_ms": percentile(0.99),
+                    "max_ms": round(1000 * worst, 3),
+                }
+        return result
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import can
+
+
+class CanifFaultBus(can.BusABC):
+    """
+    Wraps a can.Bus and injects bus-off faults, to test error recovery.
+
+    While a channel is bus-off, recv() and send() raise can.CanOperationError
+    and opening a CanifFaultBus on it raises can.CanInitializationError.
+    Faults belong to the channel, so a reopened bus sees them too. Frames
+    received during a fault are dropped.
+    """
+
+    # {channel: monotonic end of the bus-off}
+    _bus_off_until: dict = {}
+    _lock = threading.Lock()
+
+    def __init__(self, channel, **kwargs):
+        """
+        Initialize CanifFaultBus instance.
+
+        Args:
+            channel: Channel of the wrapped bus.
+            **kwargs: Arguments of can.Bus, e.g. interface='virtual'.
+
+        Raises:
+            can.CanInitializationError: If the channel is bus-off.
+        """
+        self._check_open(channel)
+        self._bus: can.BusABC = can.Bus(channel=channel, **kwargs)
+        self.channel = channel
+        self.channel_info = f"fault injection on {self._bus.channel_info}"
+        super().__init__(channel=channel)
+
+    @classmethod
+    def bus_off(cls, channel, duration: float) -> None:
+        """
+        Put a channel into bus-off.
+
+        Args:
+            channel: Channel to fail.
+            duration (float): Seconds until the channel works again.
+        """
+        with cls._lock:
+            cls._bus_off_until[channel] = time.monotonic() + duration
+
+    @classmethod
+    def is_bus_off(cls, channel) -> bool:
+        """
+        Returns True while the channel is bus-off.
+        """
+        return time.monotonic() < cls._bus_off_until.get(channel, 0)
+
+    @classmethod
+    def _check_open(cls, channel) -> None:
+        if cls.is_bus_off(channel):
+            raise can.CanInitializationError(f"Channel {channel} is bus-off")
+
+    def _check(self) -> None:
+        if self.is_bus_off(self.channel):
+            raise can.CanOperationError(f"Channel {self.channel} is bus-off")
+
+    def _recv_internal(self, timeout: float):
+        self._check()
+        msg = self._bus.recv(timeout)
+        # the fault may have started while waiting
+        self._check()
+        return msg, False
+
+    def send(self, msg: can.Message, timeout: float = None) -> None:
+        self._check()
+        self._bus.send(msg, timeout)
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self._bus.shutdown()
+
+
+class CanifFaultInjector:
+    """
+    Puts a channel into bus-off periodically, for soak tests of the bus
+    recovery.
+    """
+
+    def __init__(self, channel, interval: float, duration: float):
+        """
+        Initialize CanifFaultInjector instance.
+
+        Args:
+            channel: Channel to fail.
+            interval (float): Seconds between the start of two faults.
+            duration (float): Length of every fault in seconds.
+        """
+        self.channel = channel
+        self.interval: float = interval
+        self.duration: float = duration
+        self.faults: int = 0
+
+    def run(self, stop_event: threading.Event) -> None:
+        """
+        Inject faults until stopped.
+
+        Args:
+            stop_event (threading.Event): Set to stop injecting.
+        """
+        while not stop_event.wait(self.interval):
+            CanifFaultBus.bus_off(self.channel, self.duration)
+            self.faults += 1
@@ -0,0 +1,230 @@
+import heapq
+import math
+import random
+import threading
+import time
+
+import can
+import cantools
+
+from .canifmux import CanifMuxTable
+
+
+class CanifTrafficGen:
+    """
+    Sends synthetic traffic for database messages at their cycle time.
+
+    Signal values follow a pattern (ramp, sine, random or enum cycling) and
+    every frame is encoded ahead of time, so sending only picks the next
+    prepared can.Message. Send times follow a fixed schedule on the
+    monotonic clock, so a late frame doesn't delay the following ones.
+    """
+
+    PATTERNS = ("ramp", "sine", "random")
+
+    def __init__(
+        self,
+        bus: can.BusABC,
+        messages: list[cantools.database.can.Message],
+        rate: float = 1.0,
+        pattern: str = "ramp",
+        steps: int = 100,
+        default_cycle_time: int = 1000,
+    ):
+        """
+        Initialize CanifTrafficGen instance.
+
+        Args:
+            bus (can.BusABC): CAN bus interface to send on.
+            messages (list): Database messages to generate.
+            rate (float, optional): Multiplier applied to the message rates.
+            pattern (str, optional): Pattern for signals without choices:
+                'ramp', 'sine' or 'random' within the signal min/max.
+                Signals with choices always cycle through their choices.
+            steps (int, optional): Number of frames prepared per message.
+            default_cycle_time (int, optional): Cycle time in ms for messages
+                without a cycle time in the database.
+        """
+        if pattern not in self.PATTERNS:
+            raise ValueError(f"Invalid pattern '{pattern}'")
+        if rate <= 0:
+            raise ValueError(f"Invalid rate '{rate}'")
+        self.bus: can.BusABC = bus
+        self.messages: list[cantools.database.can.Message] = messages
+        self.rate: float = rate
+        self.pattern: str = pattern
+        self.steps: int = steps
+        self.periods: list[float] = [
+            (msg.cycle_time or default_cycle_time) / 1000 / rate for msg in messages
+        ]
+        self.frames: list[list[can.Message]] = [
+            self._encode_frames(
+                msg, CanifMuxTable(msg) if msg.is_multiplexed() else None
+            )
+            for msg in messages
+        ]
+        # per message: [sent, total lateness, max lateness, first, last]
+        self._stats: list[list[float]] = []
+        self.overruns: int = 0
+
+    @classmethod
+    def _raw_range(cls, signal: cantools.database.can.Signal) -> tuple:
+        if signal.is_float:
+            low, high = -1000.0, 1000.0
+            if signal.minimum is not None and signal.maximum is not None:
+                low, high = signal.minimum, signal.maximum
+            return low, high
+
+        if signal.is_signed:
+            low, high = -(2 ** (signal.length - 1)), 2 ** (signal.length - 1) - 1
+        else:
+            low, high = 0, 2**signal.length - 1
+        if (
+            signal.minimum is not None
+            and signal.maximum is not None
+            and signal.maximum > signal.minimum
+        ):
+            # limit to the raw values inside the physical min/max
+            raw = sorted(
+                (
+                    (signal.minimum - signal.offset) / signal.scale,
+                    (signal.maximum - signal.offset) / signal.scale,
+                )
+            )
+            low = max(low, math.ceil(raw[0]))
+            high = min(high, math.floor(raw[1]))
+        return low, high
+
+    def _pattern_values(self, signal: cantools.database.can.Signal) -> list:
+        """
+        Returns the raw signal values of every prepared frame.
+        """
+        if signal.choices:
+            choices = list(signal.choices.keys())
+            return [choices[i % len(choices)] for i in range(self.steps)]
+
+        low, high = self._raw_range(signal)
+        span = high - low
+        if self.pattern == "ramp":
+            values = [
+                low + span * i / max(1, self.steps - 1) for i in range(self.steps)
+            ]
+        elif self.pattern == "sine":
+            values = [
+                low + span * (1 + math.sin(2 * math.pi * i / self.steps)) / 2
+                for i in range(self.steps)
+            ]
+        else:
+            values = [random.uniform(low, high) for _ in range(self.steps)]
+        if not signal.is_float:
+            values = [min(high, max(low, int(value))) for value in values]
+        return values
+
+    def _encode_frames(self, msg, mux_table) -> list[can.Message]:
+        columns = {signal.name: self._pattern_values(signal) for signal in msg.signals}
+        if mux_table:
+            # step through the branches of a multiplexed message
+            mux_values = list(mux_table.branches) or [0]
+            columns[mux_table.mux_signal] = [
+                mux_values[i % len(mux_values)] for i in range(self.steps)
+            ]
+
+        frames = []
+        for i in range(self.steps):
+            sig_dict = {name: values[i] for name, values in columns.items()}
+            if mux_table:
+                sig_dict = mux_table.filter(sig_dict)
+            data = msg.encode(sig_dict, scaling=False, strict=False)
+            frames.append(
+                can.Message(
+                    arbitration_id=msg.frame_id,
+                    is_extended_id=msg.is_extended_frame,
+                    data=data,
+                )
+            )
+        return frames
+
+    def run(self, stop_event: threading.Event, duration: float = None) -> None:
+        """
+        Send the prepared frames until stopped.
+
+        Args:
+            stop_event (threading.Event): Set to stop sending.
+            duration (float, optional): Stop after this many seconds.
+        """
+        self._stats = [[0, 0.0, 0.0, 0.0, 0.0] for _ in self.messages]
+        self.overruns = 0
+        if not self.messages:
+            return
+        start = time.perf_counter()
+        end = start + duration if duration else math.inf
+        # (deadline, message index)
+        schedule = [(start, i) for i in range(len(self.messages))]
+        heapq.heapify(schedule)
+        while not stop_event.is_set():
+            deadline, i = schedule[0]
+            if deadline >= end:
+                break
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                stop_event.wait(delay)
+                continue
+
+            stats = self._stats[i]
+            frame = self.frames[i][stats[0] % self.steps]
+            try:
+                self.bus.send(frame)
+            except can.CanError as e:
+                print(f"CanifTrafficGen: {repr(e)}")
+            now = time.perf_counter()
+            lateness = now - deadline
+            if not stats[0]:
+                stats[3] = now
+            stats[0] += 1
+            stats[1] += lateness
+            stats[2] = max(stats[2], lateness)
+            stats[4] = now
+
+            # stay on the fixed schedule, skip slots that are already missed
+            period = self.periods[i]
+            next_deadline = deadline + period
+            if next_deadline < now:
+                missed = math.ceil((now - next_deadline) / period)
+                self.overruns += missed
+                next_deadline += missed * period
+            heapq.heapreplace(schedule, (next_deadline, i))
+
+    def get_stats(self) -> dict[str, dict]:
+        """
+        Returns the achieved send rate and jitter by message name.
+
+        Returns:
+            dict: {msg_name: {'sent', 'target_rate', 'rate', 'jitter_mean_ms',
+                              'jitter_max_ms'}}
+        """
+        results = {}
+        for msg, period, stats in zip(self.messages, self.periods, self._stats):
+            sent, total, worst, first, last = stats
+            rate = (sent - 1) / (last - first) if sent > 1 and last > first else 0
+            results[msg.name] = {
+                "sent": sent,
+                "target_rate": round(1 / period, 2),
+                "rate": round(rate, 2),
+                "jitter_mean_ms": round(1000 * total / sent, 3) if sent else 0,
+                "jitter_max_ms": round(1000 * worst, 3),
+            }
+        return results
+
+    def report(self) -> None:
+        """
+        Prints the achieved send rate and jitter of every message.
+        """
+        total = 0
+        for msg_name, stats in self.get_stats().items():
+            total += stats["rate"]
+            print(
+                f"{msg_name}: sent={stats['sent']} rate={stats['rate']}/"
+                f"{stats['target_rate']} Hz jitter mean={stats['jitter_mean_ms']} ms "
+                f"max={stats['jitter_max_ms']} ms"
+            )
+        print(f"Total rate={round(total, 1)} frames/s overruns={self.overruns}")
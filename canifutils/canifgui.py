@@ -8,22 +8,47 @@ import cantools
 
 
 class CanifGui:
+    # number of config message panels kept built after being collapsed
+    MAX_CFG_PANELS = 20
+
     def __init__(self):
         self.displayed_cfg = {}
+        # config panels: bodies by message, build order and unsent edits of
+        # recycled panels
+        self._cfg_panel_bodies = {}
+        self._cfg_panel_order = []
+        self._cfg_pending = {}
         self.displayed_signals = {}
         self.last_selected_msg = None
         self.vitals_tree = None
         self.responses_tree = None
         self.responses_combobox = None
         self.rx_msg_tree = None
+        self.bus_tree = None
+        self.talkers_tree = None
+        self.rtt_tree = None
+        self.prof_tree = None
         self.clock_label = None
         self.last_save_label = None
         self.root = None
 
+    def _remove_inactive_rows(self, tree, message, signals):
+        """
+        Removes the rows of signals outside the active mux branch of a message
+        """
+        for item in tree.get_children():
+            if tree.item(item, "text") != message:
+                continue
+            if tree.item(item, "values")[0] not in signals:
+                tree.delete(item)
+
     def _update_response_section(self, message):
-        signals = self.sig_vals.get(message, {})
+        signals, stats = self._resolve_rx_msg(message)
+        if signals is None:
+            return
+        self._remove_inactive_rows(self.responses_tree, message, signals)
         for signal_name, signal_value in signals.items():
-            timestamp = self.rx_msg_stats[message]["last_received"]
+            timestamp = stats["last_received"]
             iid = f"{message}_{signal_name}"
 
             # Check if the item exists before trying to update it
@@ -63,80 +88,164 @@ class CanifGui:
         self.clock_label.after(1000, self._update_clock)
 
     def _update_meas_gui(self):
-        if self.vitals_msgs:
-            # Update the vitals section without flickering
-            for msg, signals in self.vitals.items():
-                timestamp = self.rx_msg_stats[msg]["last_received"]
-                for signal_name, signal_value in signals.items():
-                    iid = f"{msg}_{signal_name}"
-
-                    # If the signal is already displayed, update its value
-                    if iid in self.displayed_signals:
-                        self.vitals_tree.item(
-                            iid, values=(signal_name, signal_value, timestamp)
-                        )
-                        self.displayed_signals[iid] = signal_value
+        with self.profiler.timed("gui_vitals"):
+            # decode pending frames of buses in lazy decode mode
+            self.refresh_rx()
+            if self.vitals_msgs:
+                # Update the vitals section without flickering
+                for msg, signals in self.vitals.items():
+                    self.refresh_rx(msg)
+                    timestamp = self.rx_msg_stats[msg]["last_received"]
+                    if msg in self.mux_tables:
+                        signals = self._get_active_sig_vals(msg, signals)
+                        self._remove_inactive_rows(self.vitals_tree, msg, signals)
+                    for signal_name, signal_value in signals.items():
+                        iid = f"{msg}_{signal_name}"
+
+                        # If the signal is already displayed, update its value
+                        if self.vitals_tree.exists(iid):
+                            self.vitals_tree.item(
+                                iid, values=(signal_name, signal_value, timestamp)
+                            )
+                            self.displayed_signals[iid] = signal_value
+                        else:
+                            # Insert a new signal if it doesn't exist
+                            self.vitals_tree.insert(
+                                "",
+                                "end",
+                                iid=iid,
+                                text=msg,
+                                values=(signal_name, signal_value, timestamp),
+                            )
+                            self.displayed_signals[iid] = signal_value
+
+        with self.profiler.timed("gui_rx_stats"):
+            # Update the response section with available messages in the dropdown
+            self.responses_combobox["values"] = self._get_rx_msg_names()
+
+            # Update CAN message stats
+            for message, stats in self.rx_msg_stats.items():
+                message_iid = message
+                last_received = stats["last_received"]
+                cycle_time = stats["cycle_time"]
+                received_count = stats["count"]
+
+                # Check if the message already exists
+                if not self.rx_msg_tree.exists(message_iid):
+                    self.rx_msg_tree.insert(
+                        "",
+                        "end",
+                        iid=message_iid,
+                        values=(message, last_received, cycle_time, received_count),
+                    )
+                else:
+                    # Update the existing message stats
+                    self.rx_msg_tree.item(
+                        message_iid,
+                        values=(message, last_received, cycle_time, received_count),
+                    )
+
+        # Update per bus stats
+        with self.profiler.timed("gui_bus_stats"):
+            if self.bus_tree:
+                for bus_name, stats in self.get_bus_stats().items():
+                    values = (
+                        bus_name,
+                        stats["frames"],
+                        stats["messages"],
+                        stats["rate"],
+                        stats["load"],
+                        stats["depth"],
+                        stats["high_water"],
+                        stats["dropped"],
+                        stats["batch_latency_ms"],
+                        stats["state"],
+                        stats["faults"],
+                        stats["downtime_s"],
+                    )
+                    if not self.bus_tree.exists(bus_name):
+                        self.bus_tree.insert("", "end", iid=bus_name, values=values)
                     else:
-                        # Insert a new signal if it doesn't exist
-                        self.vitals_tree.insert(
+                        self.bus_tree.item(bus_name, values=values)
+
+            # Update bus load top talkers
+            if self.talkers_tree:
+                self.talkers_tree.delete(*self.talkers_tree.get_children())
+                for bus_name, load in self.get_bus_load().items():
+                    for frame_id, msg_name, fps, id_load in load["top"]:
+                        self.talkers_tree.insert(
                             "",
                             "end",
-                            iid=iid,
-                            values=(signal_name, signal_value, timestamp),
+                            values=(bus_name, hex(frame_id), msg_name, fps, id_load),
                         )
-                        self.displayed_signals[iid] = signal_value
-
-        # Update the response section with available messages in the dropdown
-        self.responses_combobox["values"] = list(self.rx_msg_stats.keys())
 
-        # Update CAN message stats
-        for message, stats in self.rx_msg_stats.items():
-            message_iid = message
-            last_received = stats["last_received"]
-            cycle_time = stats["cycle_time"]
-            received_count = stats["count"]
-
-            # Check if the message already exists
-            if not self.rx_msg_tree.exists(message_iid):
-                self.rx_msg_tree.insert(
-                    "",
-                    "end",
-                    iid=message_iid,
-                    values=(message, last_received, cycle_time, received_count),
-                )
-            else:
-                # Update the existing message stats
-                self.rx_msg_tree.item(
-                    message_iid,
-                    values=(message, last_received, cycle_time, received_count),
-                )
+        # Update request/response latency
+        with self.profiler.timed("gui_rtt"):
+            if self.rtt_tree:
+                for stats in self.get_rtt_stats():
+                    values = (
+                        stats["name"],
+                        stats["sent"],
+                        stats["received"],
+                        stats["timeouts"],
+                        stats["p50_ms"],
+                        stats["p90_ms"],
+                        stats["p99_ms"],
+                        stats["max_ms"],
+                        " ".join(str(count) for _, count in stats["histogram"]),
+                    )
+                    if not self.rtt_tree.exists(stats["name"]):
+                        self.rtt_tree.insert(
+                            "", "end", iid=stats["name"], values=values
+                        )
+                    else:
+                        self.rtt_tree.item(stats["name"], values=values)
 
         # Preserve the last selected message in the dropdown
-        if self.last_selected_msg:
-            if self.last_selected_msg in self.sig_vals:
-                self.responses_combobox.set(self.last_selected_msg)
-                self._update_response_section(self.last_selected_msg)
-            else:
-                self.responses_combobox.set("Select a message")
+        with self.profiler.timed("gui_responses"):
+            if self.last_selected_msg:
+                if self._resolve_rx_msg(self.last_selected_msg)[0] is not None:
+                    self.responses_combobox.set(self.last_selected_msg)
+                    self._update_response_section(self.last_selected_msg)
+                else:
+                    self.responses_combobox.set("Select a message")
+
+        # Update hot path timers
+        if self.prof_tree:
+            timers = self.get_profile_stats()["timers"]
+            for name, stats in timers.items():
+                values = (
+                    name,
+                    stats["count"],
+                    stats["total_ms"],
+                    stats["mean_us"],
+                    stats["max_us"],
+                )
+                if not self.prof_tree.exists(name):
+                    self.prof_tree.insert("", "end", iid=name, values=values)
+                else:
+                    self.prof_tree.item(name, values=values)
 
         self.root.after(1000, self._update_meas_gui)
 
     def _send_estop(self, label):
-        sig_dict = {}
+        # send first, the widgets follow
+        self.send_estop("gui")
         (db_msg, sig_name, sig_value) = self.estop_msg_sig_val
-        for signal in db_msg.signals:
-            if signal.name == sig_name:
-                sig_dict[signal.name] = sig_value
-                entry, var = self.displayed_cfg[db_msg.name][sig_name]
-                display_value = signal.choices.get(sig_value)
-                var.set(display_value)
-                self.sig_vals[db_msg.name][signal.name] = sig_value
-            else:
-                sig_dict[signal.name] = self.sig_vals[db_msg.name][signal.name]
-        self.send_can_message(db_msg, sig_dict)
+        if db_msg.name in self.displayed_cfg:
+            signal = db_msg.get_signal_by_name(sig_name)
+            entry, var = self.displayed_cfg[db_msg.name][sig_name]
+            display_value = signal.choices.get(sig_value)
+            var.set(display_value)
+        else:
+            self._cfg_pending.get(db_msg.name, {}).pop(sig_name, None)
         label.config(text=f'Last sent: {time.strftime("%H:%M:%S")}')
 
     def _get_cfg_val(self, signal: cantools.database.can.Signal, msg_name: str):
+        if msg_name not in self.displayed_cfg:
+            # the panel of this message isn't built
+            pending = self._cfg_pending.get(msg_name, {})
+            return pending.get(signal.name, self.sig_vals[msg_name][signal.name])
         entry, var = self.displayed_cfg[msg_name][signal.name]
         val = 0
         if signal.choices:
@@ -153,6 +262,48 @@ class CanifGui:
 
         return val
 
+    def _update_cfg_fields(self, changes: dict[str, dict]):
+        """
+        Show new config values in the config window in one batch
+        """
+        for msg_name, signals in changes.items():
+            displayed = self.displayed_cfg.get(msg_name, {})
+            pending = self._cfg_pending.get(msg_name, {})
+            for signal_name, value in signals.items():
+                pending.pop(signal_name, None)
+                if signal_name not in displayed:
+                    continue
+                entry, var = displayed[signal_name]
+                if isinstance(entry, tk.OptionMenu):
+                    signal = self.db.get_message_by_name(msg_name).get_signal_by_name(
+                        signal_name
+                    )
+                    var.set(signal.choices.get(value, str(value)))
+                else:
+                    var.set(value)
+
+    def _apply_profile(self, name, label):
+        try:
+            changed = self.apply_profile(name)
+            label.config(text=f"Applied {name}: {len(changed)} changed")
+        except KeyError as e:
+            messagebox.showerror("Profiles", repr(e))
+
+    def _sample_profile(self, label):
+        try:
+            path = self.sample_profile(duration=10)
+            label.config(text=f"Sampling to {path}")
+        except RuntimeError as e:
+            messagebox.showerror("Profile", repr(e))
+
+    def _save_profile(self, name, label, combobox):
+        if not name:
+            messagebox.showerror("Profiles", "Enter a profile name")
+            return
+        self.save_profile(name)
+        combobox["values"] = self.list_profiles()
+        label.config(text=f'Saved {name}: {time.strftime("%H:%M:%S")}')
+
     def _save_cfg_values(self, label):
         try:
             self.send_save_config_message()
@@ -203,6 +354,63 @@ class CanifGui:
 
         return (entry, var)
 
+    def _toggle_cfg_panel(self, msg, body, toggle_button):
+        """
+        Expands or collapses the signal fields of a config message. The fields
+        are created on the first expand.
+        """
+        if body.winfo_manager():
+            body.pack_forget()
+            toggle_button.config(text=f"+ {msg.name}")
+            return
+
+        if msg.name not in self.displayed_cfg:
+            self._build_cfg_panel(msg, body)
+        self._cfg_panel_order.remove(msg.name)
+        self._cfg_panel_order.append(msg.name)
+        body.pack(fill="x")
+        toggle_button.config(text=f"- {msg.name}")
+        self._recycle_cfg_panels()
+
+    def _build_cfg_panel(self, msg, body):
+        self.displayed_cfg[msg.name] = {}
+        self._cfg_panel_bodies[msg.name] = body
+        self._cfg_panel_order.append(msg.name)
+        pending = self._cfg_pending.pop(msg.name, {})
+        # loop to add all the signals for this message
+        for row, signal in enumerate(msg.signals):
+            (entry, var) = self._create_editable_field(
+                frame=body,
+                row=row,
+                col=0,
+                signal=signal,
+                value=pending.get(signal.name, self.sig_vals[msg.name][signal.name]),
+            )
+            self.displayed_cfg[msg.name][signal.name] = (entry, var)
+            var.trace_add("write", lambda *_, m=msg.name: self._mark_cfg_dirty(m))
+
+    def _recycle_cfg_panels(self):
+        """
+        Destroys the fields of the least recently expanded collapsed panels
+        when more than MAX_CFG_PANELS are built. Unsent edits are kept.
+        """
+        for msg_name in list(self._cfg_panel_order):
+            if len(self._cfg_panel_order) <= self.MAX_CFG_PANELS:
+                break
+            body = self._cfg_panel_bodies[msg_name]
+            if body.winfo_manager():
+                continue
+            msg = self.db.get_message_by_name(msg_name)
+            self._cfg_pending[msg_name] = {
+                signal.name: self._get_cfg_val(signal, msg_name)
+                for signal in msg.signals
+            }
+            for child in body.winfo_children():
+                child.destroy()
+            del self.displayed_cfg[msg_name]
+            del self._cfg_panel_bodies[msg_name]
+            self._cfg_panel_order.remove(msg_name)
+
     def _create_cfg_gui(self, cfg_window):
         cfg_window.title("Configurations")
         # Create a canvas to hold the entire UI and add a vertical scrollbar
@@ -263,48 +471,64 @@ class CanifGui:
         quit_button = tk.Button(cfg_frame, text="Quit", command=self.close)
         quit_button.grid(row=0, column=3, padx=5, pady=0, stick="w")
 
-        # start on the 2nd row
-        curr_row = 2
-        next_row = 2
-        col = 0
-        for msg in self.cfg_msg_list:
-            title_label = tk.Label(
-                cfg_frame, text=msg.name, font=("Helvetica", 12, "bold")
+        # Create the config profile selection
+        profile_frame = tk.Frame(cfg_frame)
+        profile_frame.grid(row=0, column=4, rowspan=2, padx=5, pady=0, sticky="w")
+        profile_label = tk.Label(profile_frame, text="Profile: None")
+        profile_combobox = ttk.Combobox(profile_frame, values=self.list_profiles())
+        profile_combobox.grid(row=0, column=0, padx=(5, 0), pady=0, sticky="w")
+        apply_profile_button = tk.Button(
+            profile_frame,
+            text="Apply profile",
+            command=lambda: self._apply_profile(profile_combobox.get(), profile_label),
+        )
+        apply_profile_button.grid(row=0, column=1, padx=(5, 0), pady=0, sticky="w")
+        save_profile_button = tk.Button(
+            profile_frame,
+            text="Save profile",
+            command=lambda: self._save_profile(
+                profile_combobox.get(), profile_label, profile_combobox
+            ),
+        )
+        save_profile_button.grid(row=0, column=2, padx=(5, 0), pady=0, sticky="w")
+        profile_label.grid(row=1, column=0, columnspan=3, padx=(5, 0), sticky="w")
+
+        # start on the 2nd row, one collapsed panel per message in two columns.
+        # The signal fields of a message are only created when it is expanded.
+        for i, msg in enumerate(self.cfg_msg_list):
+            panel = tk.Frame(cfg_frame)
+            panel.grid(
+                row=2 + i // 2,
+                column=(i % 2) * 2,
+                columnspan=2,
+                padx=5,
+                pady=(10, 0),
+                sticky="nw",
+            )
+            header = tk.Frame(panel)
+            header.pack(fill="x")
+            body = tk.Frame(panel)
+            toggle_button = tk.Button(
+                header,
+                text=f"+ {msg.name}",
+                font=("Helvetica", 12, "bold"),
+                relief="flat",
+                anchor="w",
+            )
+            toggle_button.config(
+                command=lambda m=msg, b=body, t=toggle_button: self._toggle_cfg_panel(
+                    m, b, t
+                )
             )
-            title_label.grid(row=curr_row, column=col, padx=5, pady=(20, 0), sticky="w")
-            last_send_label = tk.Label(cfg_frame, text="Last sent: None")
+            toggle_button.pack(side="left")
+            last_send_label = tk.Label(header, text="Last sent: None")
             send_button = tk.Button(
-                cfg_frame,
+                header,
                 text="Send",
                 command=lambda m=msg, l=last_send_label: self._send_cfg_message(m, l),
             )
-            send_button.grid(
-                row=curr_row, column=col + 1, padx=(0, 5), pady=(20, 0), sticky="w"
-            )
-            last_send_label.grid(
-                row=curr_row + 1, column=col, padx=5, pady=0, stick="w"
-            )
-            self.displayed_cfg[msg.name] = {}
-            row = curr_row + 2
-            # loop to add all the signals for this message
-            for signal in msg.signals:
-                (entry, var) = self._create_editable_field(
-                    frame=cfg_frame,
-                    row=row,
-                    col=col,
-                    signal=signal,
-                    value=self.sig_vals[msg.name][signal.name],
-                )
-                self.displayed_cfg[msg.name][signal.name] = (entry, var)
-                row += 1
-                next_row = max(row, next_row)
-
-            col += 2
-            col = col % 4
-            if col == 0:
-                curr_row = next_row
-            else:
-                row = curr_row
+            send_button.pack(side="left", padx=(5, 5))
+            last_send_label.pack(side="left")
 
         cfg_frame.update_idletasks()
         canvas.config(scrollregion=canvas.bbox("all"))
@@ -377,6 +601,140 @@ class CanifGui:
         rx_msg_tree.pack(fill="both", expand=True)
         self.rx_msg_tree = rx_msg_tree
 
+        # Section 4: Per bus stats
+        if self.buses:
+            bus_frame = tk.Frame(root)
+            bus_frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+            bus_label = tk.Label(
+                bus_frame, text="CAN Bus Stats", font=("Helvetica", 16)
+            )
+            bus_label.pack()
+
+            bus_tree = ttk.Treeview(
+                bus_frame,
+                columns=(
+                    "Bus",
+                    "Frames",
+                    "Messages",
+                    "Rate",
+                    "Load",
+                    "Queue",
+                    "High Water",
+                    "Dropped",
+                    "Batch Latency",
+                    "State",
+                    "Faults",
+                    "Downtime",
+                ),
+                show="headings",
+                height=len(self.buses),
+            )
+            bus_tree.heading("Bus", text="Bus")
+            bus_tree.heading("Frames", text="Frames")
+            bus_tree.heading("Messages", text="Messages")
+            bus_tree.heading("Rate", text="Frames/s")
+            bus_tree.heading("Load", text="Load %")
+            bus_tree.heading("Queue", text="Queue")
+            bus_tree.heading("High Water", text="High Water")
+            bus_tree.heading("Dropped", text="Dropped")
+            bus_tree.heading("Batch Latency", text="Batch Latency ms")
+            bus_tree.heading("State", text="State")
+            bus_tree.heading("Faults", text="Faults")
+            bus_tree.heading("Downtime", text="Downtime s")
+            bus_tree.pack(fill="both", expand=True)
+            self.bus_tree = bus_tree
+
+            talkers_tree = ttk.Treeview(
+                bus_frame,
+                columns=("Bus", "ID", "Message", "Frames/s", "Load"),
+                show="headings",
+                height=5,
+            )
+            talkers_tree.heading("Bus", text="Bus")
+            talkers_tree.heading("ID", text="Top Talker ID")
+            talkers_tree.heading("Message", text="Message")
+            talkers_tree.heading("Frames/s", text="Frames/s")
+            talkers_tree.heading("Load", text="Load %")
+            talkers_tree.pack(fill="both", expand=True)
+            self.talkers_tree = talkers_tree
+
+        # Section 5: Request/response latency
+        rtt_stats = self.get_rtt_stats()
+        if rtt_stats:
+            rtt_frame = tk.Frame(root)
+            rtt_frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+            rtt_label = tk.Label(
+                rtt_frame, text="Response Latency (ms)", font=("Helvetica", 16)
+            )
+            rtt_label.pack()
+
+            rtt_tree = ttk.Treeview(
+                rtt_frame,
+                columns=(
+                    "Pair",
+                    "Sent",
+                    "Received",
+                    "Timeouts",
+                    "p50",
+                    "p90",
+                    "p99",
+                    "Max",
+                    "Histogram",
+                ),
+                show="headings",
+                height=len(rtt_stats),
+            )
+            rtt_tree.heading("Pair", text="Request -> Response")
+            rtt_tree.heading("Sent", text="Sent")
+            rtt_tree.heading("Received", text="Received")
+            rtt_tree.heading("Timeouts", text="Timeouts")
+            rtt_tree.heading("p50", text="p50")
+            rtt_tree.heading("p90", text="p90")
+            rtt_tree.heading("p99", text="p99")
+            rtt_tree.heading("Max", text="Max")
+            edges = [edge for edge, _ in rtt_stats[0]["histogram"]][:-1]
+            rtt_tree.heading(
+                "Histogram",
+                text="Histogram (<= " + " ".join(f"{edge:g}" for edge in edges) + " >)",
+            )
+            rtt_tree.pack(fill="both", expand=True)
+            self.rtt_tree = rtt_tree
+
+        # Section 6: Hot path timers
+        if self.profiler.enabled:
+            prof_frame = tk.Frame(root)
+            prof_frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+            prof_label = tk.Label(
+                prof_frame, text="Hot Path Timers", font=("Helvetica", 16)
+            )
+            prof_label.pack()
+
+            prof_tree = ttk.Treeview(
+                prof_frame,
+                columns=("Timer", "Count", "Total", "Mean", "Max"),
+                show="headings",
+                height=5,
+            )
+            prof_tree.heading("Timer", text="Timer")
+            prof_tree.heading("Count", text="Count")
+            prof_tree.heading("Total", text="Total ms")
+            prof_tree.heading("Mean", text="Mean us")
+            prof_tree.heading("Max", text="Max us")
+            prof_tree.pack(fill="both", expand=True)
+            self.prof_tree = prof_tree
+
+            sample_label = tk.Label(prof_frame, text="")
+            sample_button = tk.Button(
+                prof_frame,
+                text="Sample 10 s",
+                command=lambda: self._sample_profile(sample_label),
+            )
+            sample_button.pack(side="left")
+            sample_label.pack(side="left", padx=5)
+
         # Clock in the top-right corner (use place to precisely position it)
         clock_label = tk.Label(root, font=("Helvetica", 12))
         clock_label.place(relx=1.0, rely=0.0, anchor="ne", x=-10, y=10)
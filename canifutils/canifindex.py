@@ -0,0 +1,252 @@
+import difflib
+from collections import Counter
+
+import cantools
+
+
+class CanifTrie:
+    """
+    Prefix tree from string keys to values, for completion and prefix search.
+    """
+
+    # key of the values stored at a node, never a character
+    _VALUES = None
+
+    def __init__(self):
+        self._root: dict = {}
+
+    def insert(self, key: str, value) -> None:
+        """
+        Add a value under a key. A key can hold several values.
+
+        Args:
+            key (str): Key.
+            value: Value returned by find() for prefixes of key.
+        """
+        node = self._root
+        for char in key:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+            node = child
+        values = node.get(self._VALUES)
+        if values is None:
+            node[self._VALUES] = [value]
+        else:
+            values.append(value)
+
+    def find(self, prefix: str = "", limit: int = None) -> list:
+        """
+        Returns the values of all keys starting with prefix, in key order.
+
+        Args:
+            prefix (str, optional): Key prefix, all values if empty.
+            limit (int, optional): Stop after this many values.
+        """
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        values = []
+        # depth first in key order, children pushed in reverse
+        stack = [node]
+        while stack and (limit is None or len(values) < limit):
+            node = stack.pop()
+            values.extend(node.get(self._VALUES, ()))
+            stack.extend(
+                node[char]
+                for char in sorted((c for c in node if c is not None), reverse=True)
+            )
+        return values if limit is None else values[:limit]
+
+
+class CanifDbIndex:
+    """
+    Lookup and search index of a CAN database, built once so terminal
+    commands don't walk the database.
+
+    Messages are found by frame ID or name through dicts, the config and
+    measurement message lists are split once, and message and signal names
+    are held in tries for completion and prefix search. Signals are also
+    searched by substring, and by similar spelling through a trigram index
+    that picks the candidates difflib compares. The signal structures are
+    built on the first completion or search.
+    """
+
+    # candidates compared by difflib for a misspelled signal
+    FUZZY_CANDIDATES = 200
+
+    def __init__(self, database: cantools.database.can.Database, rx_ids):
+        """
+        Initialize CanifDbIndex instance.
+
+        Args:
+            database (cantools.database.can.Database): The database.
+            rx_ids (iterable): Frame IDs of the received (measurement)
+                messages, the others are config messages.
+        """
+        self.db: cantools.database.can.Database = database
+        self.rx_ids: set[int] = set(rx_ids)
+        self.by_id: dict[int, cantools.database.can.Message] = {}
+        self.by_name: dict[str, cantools.database.can.Message] = {}
+        # in database order, like the listings always were
+        self.cfg_messages: list[cantools.database.can.Message] = []
+        self.meas_messages: list[cantools.database.can.Message] = []
+        self.message_names: CanifTrie = CanifTrie()
+        for msg in database.messages:
+            self.by_id[msg.frame_id] = msg
+            self.by_name[msg.name] = msg
+            self.message_names.insert(msg.name, msg.name)
+            if msg.frame_id in self.rx_ids:
+                self.meas_messages.append(msg)
+            else:
+                self.cfg_messages.append(msg)
+        # lower case signal name -> 'Message.Signal'
+        self._signal_names: CanifTrie = None
+        # ('message.signal' lower case, 'Message.Signal')
+        self._signals: list[tuple[str, str]] = []
+        # lower case signal name -> ['Message.Signal', ...]
+        self._signals_by_name: dict[str, list[str]] = {}
+        # trigram -> indexes into _fuzzy_names
+        self._trigrams: dict[str, list[int]] = None
+        self._fuzzy_names: list[str] = []
+
+    def _build_signals(self) -> None:
+        if self._signal_names is not None:
+            return
+        signal_names = CanifTrie()
+        for msg in self.db.messages:
+            for signal in msg.signals:
+                full_name = f"{msg.name}.{signal.name}"
+                lower = signal.name.lower()
+                signal_names.insert(lower, full_name)
+                self._signals.append((full_name.lower(), full_name))
+                full_names = self._signals_by_name.get(lower)
+                if full_names is None:
+                    self._signals_by_name[lower] = [full_name]
+                else:
+                    full_names.append(full_name)
+        self._signal_names = signal_names
+
+    @staticmethod
+    def _trigrams_of(name: str) -> set[str]:
+        # words of a signal name start like the name itself
+        padded = f"  {name.replace('_', '  ')} "
+        return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+    def _build_trigrams(self) -> None:
+        if self._trigrams is not None:
+            return
+        self._build_signals()
+        trigrams = {}
+        self._fuzzy_names = list(self._signals_by_name)
+        for i, name in enumerate(self._fuzzy_names):
+            for trigram in self._trigrams_of(name):
+                postings = trigrams.get(trigram)
+                if postings is None:
+                    trigrams[trigram] = [i]
+                else:
+                    postings.append(i)
+        self._trigrams = trigrams
+
+    def message(self, msg_id) -> cantools.database.can.Message:
+        """
+        Returns a message by frame ID (decimal or 0x hex) or name.
+
+        Args:
+            msg_id (int or str): Frame ID or message name.
+
+        Raises:
+            KeyError: If no message matches.
+        """
+        msg = self.by_name.get(msg_id)
+        if msg is not None:
+            return msg
+        try:
+            frame_id = int(msg_id)
+        except ValueError:
+            try:
+                frame_id = int(msg_id, 16) if msg_id[:2].lower() == "0x" else None
+            except ValueError:
+                frame_id = None
+        msg = self.by_id.get(frame_id)
+        if msg is None:
+            raise KeyError(f"Invalid msg id '{msg_id}'")
+        return msg
+
+    def is_rx(self, msg: cantools.database.can.Message) -> bool:
+        """
+        Returns True for a received (measurement) message.
+        """
+        return msg.frame_id in self.rx_ids
+
+    def complete_message(self, prefix: str, limit: int = None) -> list[str]:
+        """
+        Returns the message names starting with prefix.
+        """
+        return self.message_names.find(prefix, limit)
+
+    def complete_signal(self, prefix: str) -> list[str]:
+        """
+        Returns the signal names starting with prefix, across all messages.
+        """
+        self._build_signals()
+        names = {
+            full_name.split(".", 1)[1]
+            for full_name in self._signal_names.find(prefix.lower())
+        }
+        return sorted(name for name in names if name.startswith(prefix))
+
+    def search_signals(self, query: str, limit: int = 20) -> list[str]:
+        """
+        Finds signals by name, case insensitive: signals starting with the
+        query first, then names containing it. Only if neither matches,
+        signals with a similar spelling.
+
+        Args:
+            query (str): Signal name, part of it or 'Message.Signal'.
+            limit (int, optional): Maximum number of results.
+
+        Returns:
+            list: ['Message.Signal', ...] best matches first.
+        """
+        self._build_signals()
+        query = query.lower()
+        found = dict.fromkeys(self._signal_names.find(query, limit))
+        if len(found) < limit:
+            for lower, full_name in self._signals:
+                if query in lower and full_name not in found:
+                    found[full_name] = None
+                    if len(found) >= limit:
+                        break
+        if not found:
+            for name in self._similar_names(query, limit):
+                for full_name in self._signals_by_name[name]:
+                    found.setdefault(full_name)
+        return list(found)[:limit]
+
+    def _similar_names(self, query: str, limit: int) -> list[str]:
+        """
+        Returns the lower case signal names spelled most like the query, as a
+        whole, from any '_' on or as one of its words, so prefixes like the
+        node name don't count.
+        """
+        self._build_trigrams()
+        shared = Counter()
+        for trigram in self._trigrams_of(query):
+            shared.update(self._trigrams.get(trigram, ()))
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        for i, _ in shared.most_common(self.FUZZY_CANDIDATES):
+            name = self._fuzzy_names[i]
+            parts = name.split("_")
+            best = 0.0
+            for start in range(len(parts)):
+                for part in ("_".join(parts[start:]), parts[start]):
+                    matcher.set_seq1(part)
+                    best = max(best, matcher.ratio())
+            if best >= 0.6:
+                scored.append((-best, name))
+        return [name for _, name in sorted(scored)[:limit]]
@@ -1,8 +1,16 @@
+import queue
+import threading
 import time
+from collections import deque
 
 import can
 import cantools
 
+from .canifmux import CanifMuxTable, build_mux_tables
+from .canifprof import CanifProfiler
+from .canifstore import CanifMsgValues, CanifRxStats, format_rx_time
+from .canifvec import CanifVecDecoder
+
 
 class CanifListener(can.Listener):
     """
@@ -21,6 +29,12 @@ class CanifListener(can.Listener):
         sig_vals: dict,
         database: cantools.database.can.Database,
         rx_msg_stats: dict,
+        lazy: bool = False,
+        queue_size: int = 0,
+        workers: int = 1,
+        profiler: CanifProfiler = None,
+        batch_window: float = 0,
+        history_size: int = 0,
     ):
         """
         Initialize CanGuiListener instance.
@@ -30,26 +44,96 @@ class CanifListener(can.Listener):
                 A dictionary to store the received signal values.
                 The structure is expected to be:
                 {message_name: {signal_name: signal_value, ...}, ...}.
+                With a CanifSignalStore, values are written by slot.
             database (cantools.database.can.Database):
                 The cantools database object containing the CAN message
                 and signal definitions.
             rx_msg_stats (dict):
                 {msg_name: {'last_received': timestamp, 'cycle_time': timestamp, 'count': timestamp}}
+                or a CanifRxStatsTable.
+            lazy (bool, optional):
+                Only store the latest payload of every message on receive and
+                decode it when it is read through refresh().
+            queue_size (int, optional):
+                Hand received frames to decode workers through bounded queues
+                holding this many frames in total. Frames are decoded inline
+                on the receive thread if 0. Call start() to run the workers.
+            workers (int, optional):
+                Number of decode workers. Frames are sharded by ID so every
+                message is always decoded in order by the same worker.
+            profiler (CanifProfiler, optional):
+                Records the receive lookup, decode and stats update times.
+            batch_window (float, optional):
+                Collect received frames for this many seconds and decode the
+                frames of every message at once with CanifVecDecoder. Takes
+                precedence over lazy and queue mode. Call start() to run the
+                batch thread. Decode hooks run once per message and batch.
+            history_size (int, optional):
+                Number of decoded frames kept per message in batch mode,
+                read with get_history().
         """
         self.sig_vals: dict = sig_vals
         self.db: cantools.database.can.Database = database
         self.rx_msg_stats: dict = rx_msg_stats
+        self.mux_tables: dict[str, CanifMuxTable] = build_mux_tables(database)
+        self._sig_names: dict[str, tuple[str, ...]] = {
+            msg.name: tuple(signal.name for signal in msg.signals)
+            for msg in database.messages
+        }
+        # {msg_name: slots of the message signals} for CanifSignalStore
+        # messages without mux, () if the layout doesn't match
+        self._slots: dict[str, tuple[int, ...]] = {}
+        self.profiler: CanifProfiler = profiler or CanifProfiler()
+        self.lazy: bool = lazy
+        # lazy mode: {msg_name: (data, timestamp, prev_timestamp, count)}
+        self._raw: dict[str, tuple] = {}
+        # lazy mode: raw entries last applied to sig_vals and rx_msg_stats
+        self._decoded: dict[str, tuple] = {}
+        self._stats_applied: dict[str, tuple] = {}
+        # decode queues: {'depth', 'high_water', 'dropped'} counters
+        self.queue_size: int = queue_size
+        self._queues: list[queue.Queue] = []
+        self._workers: list[threading.Thread] = []
+        if queue_size > 0:
+            per_worker = max(1, queue_size // workers)
+            self._queues = [queue.Queue(maxsize=per_worker) for _ in range(workers)]
+        self.high_water: int = 0
+        self.dropped: int = 0
+        # callables run on the receive thread for every raw frame
+        self._observers: list = []
+        # callables run after a received frame was decoded
+        self._decode_hooks: list = []
+        # messages decoded on receive even in lazy mode
+        self.eager_msgs: set[str] = set()
+        # batch mode: (frame id, data, receive time) of frames not decoded yet
+        self.batch_window: float = batch_window
+        self._batch: list[tuple] = []
+        self._batch_lock = threading.Lock()
+        self._batch_stop = threading.Event()
+        self._batch_thread: threading.Thread = None
+        self._vec_decoders: dict[int, CanifVecDecoder] = {}
+        # batch mode: {msg_name: deque of (receive time, [values])}
+        self.history_size: int = history_size
+        self.history: dict[str, deque] = {}
+        # batch mode: [batches, frames, total latency, max latency]
+        self._batch_stats: list = [0, 0, 0.0, 0.0]
+        # called as error_handler(exc) instead of raising bus errors
+        self.error_handler = None
 
     def on_error(self, exc: Exception) -> None:
         """
         Handle CAN bus errors.
 
-        This method is called by the can.Notifier instance when an error
-        frame is received. It prints the error and raises the exception.
+        This method is called by the can.Notifier instance when receiving
+        fails. The error is passed to the error handler if one is set,
+        otherwise it is printed and raised.
 
         Args:
             exc (Exception): The exception representing the error.
         """
+        if self.error_handler:
+            self.error_handler(exc)
+            return
         print(f"Listener: {repr(exc)}")
         raise exc
 
@@ -59,31 +143,369 @@ class CanifListener(can.Listener):
 
         This method is called by the can.Notifier instance when a new
         CAN message is received. It decodes the message and updates
-        the signal values in the `self.sig_vals` dictionary.
+        the signal values in the `self.sig_vals` dictionary, or queues
+        it for a decode worker.
 
         Args:
             msg (can.Message): The received CAN message.
         """
+        now = time.time()
+        for observer in self._observers:
+            observer(msg, now)
+        if self.batch_window:
+            with self._batch_lock:
+                self._batch.append((msg.arbitration_id, msg.data, now))
+            return
+        if not self._queues:
+            self._process(msg, now)
+            return
+
+        rx_queue = self._queues[msg.arbitration_id % len(self._queues)]
+        try:
+            rx_queue.put_nowait((msg, now))
+        except queue.Full:
+            self.dropped += 1
+            return
+        depth = sum(q.qsize() for q in self._queues)
+        if depth > self.high_water:
+            self.high_water = depth
+
+    def add_observer(self, observer) -> None:
+        """
+        Register a callable that sees every received frame before it is decoded.
+
+        Observers run on the receive thread and must be fast.
+
+        Args:
+            observer (callable): Called as observer(msg, receive_time).
+        """
+        self._observers.append(observer)
+
+    def add_decode_hook(self, hook, msg_names=()) -> None:
+        """
+        Register a callable that runs after a received frame was decoded and
+        sig_vals updated.
+
+        Hooks run on the decoding thread. In lazy mode only the frames of the
+        given messages are decoded on receive.
+
+        Args:
+            hook (callable): Called as hook(msg_name, receive_time).
+            msg_names (iterable, optional): Messages the hook depends on.
+        """
+        self._decode_hooks.append(hook)
+        self.eager_msgs.update(msg_names)
+
+    def apply_decoded(
+        self, msg_name: str, values: dict, stats: dict, now: float
+    ) -> None:
+        """
+        Apply a message decoded elsewhere, e.g. by a CanifDecodeProcess, and
+        run the decode hooks for it.
+
+        Args:
+            msg_name (str): Name of the message.
+            values (dict): {signal_name: value} of the message.
+            stats (dict): Receive stats of the message.
+            now (float): Receive time of the frame.
+        """
+        self.sig_vals[msg_name].update(values)
+        self.rx_msg_stats[msg_name].update(stats)
+        self._run_hooks(msg_name, now)
+
+    def _run_hooks(self, msg_name: str, now: float) -> None:
+        """
+        Run the decode hooks for a decoded message. A failing hook is counted
+        as 'hook_errors' and doesn't stop the others.
+        """
+        for hook in self._decode_hooks:
+            try:
+                hook(msg_name, now)
+            except Exception as e:
+                self.profiler.count("hook_errors")
+                print(f"Decode hook {msg_name}: {repr(e)}")
+
+    def start(self) -> None:
+        """
+        Start the decode workers when a queue size is set, or the batch
+        thread in batch mode.
+        """
+        if self.batch_window:
+            if not self._batch_thread:
+                self._batch_stop.clear()
+                self._batch_thread = threading.Thread(
+                    target=self._batch_loop, daemon=True
+                )
+                self._batch_thread.start()
+            return
+        if self._workers:
+            return
+        for rx_queue in self._queues:
+            worker = threading.Thread(
+                target=self._decode_worker, args=(rx_queue,), daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self) -> None:
+        """
+        Stop the decode workers after the queued frames are decoded.
+
+        Called by the can.Notifier instance when it is stopped.
+        """
+        if self._batch_thread:
+            self._batch_stop.set()
+            self._batch_thread.join()
+            self._batch_thread = None
+        if not self._workers:
+            return
+        for rx_queue in self._queues:
+            rx_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def get_queue_stats(self) -> dict:
+        """
+        Returns the decode queue counters.
+
+        Returns:
+            dict: {'depth': frames waiting, 'high_water': highest depth seen,
+                   'dropped': frames dropped because the queue was full}
+        """
+        return {
+            "depth": sum(q.qsize() for q in self._queues),
+            "high_water": self.high_water,
+            "dropped": self.dropped,
+        }
+
+    def get_batch_stats(self) -> dict:
+        """
+        Returns the batch mode counters. The latency is the time from
+        receiving a frame until its batch was decoded, bounded by the batch
+        window plus the decode time of a batch.
+
+        Returns:
+            dict: {'batches', 'frames', 'latency_mean_ms', 'latency_max_ms'}
+        """
+        batches, frames, total, worst = self._batch_stats
+        return {
+            "batches": batches,
+            "frames": frames,
+            "latency_mean_ms": round(1000 * total / frames, 3) if frames else 0,
+            "latency_max_ms": round(1000 * worst, 3),
+        }
+
+    def get_history(self, msg_name: str) -> tuple[tuple, list]:
+        """
+        Returns the decoded frames of a message kept in batch mode.
+
+        Args:
+            msg_name (str): Name of the message.
+
+        Returns:
+            tuple: (signal names, [(receive time, [values]), ...] oldest first)
+        """
+        return self._sig_names[msg_name], list(self.history.get(msg_name, ()))
+
+    def _batch_loop(self) -> None:
+        while not self._batch_stop.wait(self.batch_window):
+            self.flush()
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Decode the frames collected in batch mode.
+        """
+        with self._batch_lock:
+            batch = self._batch
+            self._batch = []
+        if not batch:
+            return
+        prof = self.profiler
+        start = time.perf_counter_ns()
+        by_id: dict[int, list] = {}
+        for frame in batch:
+            frames = by_id.get(frame[0])
+            if frames is None:
+                by_id[frame[0]] = [frame]
+            else:
+                frames.append(frame)
+
+        for frame_id, frames in by_id.items():
+            try:
+                rx_msg = self.db.get_message_by_frame_id(frame_id)
+            except KeyError:
+                prof.count("rx_ignored", len(frames))
+                continue
+            decoder = self._vec_decoders.get(frame_id)
+            if decoder is None:
+                decoder = self._vec_decoders[frame_id] = CanifVecDecoder(rx_msg)
+            complete = [frame for frame in frames if len(frame[1]) >= rx_msg.length]
+            if len(complete) < len(frames):
+                prof.count("decode_errors", len(frames) - len(complete))
+            frames = complete
+            if not frames:
+                continue
+            try:
+                latest, rows = decoder.decode(
+                    [frame[1] for frame in frames], rows=self.history_size > 0
+                )
+            except cantools.database.DecodeError as e:
+                prof.count("decode_errors")
+                print(f"{repr(e)}: {rx_msg.name}")
+                continue
+            self._update_sig_vals(rx_msg, latest)
+            now = frames[-1][2]
+            data = self.rx_msg_stats.get(rx_msg.name) if self.rx_msg_stats else None
+            if isinstance(data, CanifRxStats):
+                prev_ts = frames[-2][2] if len(frames) > 1 else None
+                data.received(now, len(frames), prev_ts)
+            elif data is not None:
+                prev_ts = frames[-2][2] if len(frames) > 1 else data["prev_ts"]
+                self._update_stats(data, now, prev_ts, data["count"] + len(frames))
+            if rows is not None:
+                history = self.history.get(rx_msg.name)
+                if history is None:
+                    history = self.history[rx_msg.name] = deque(
+                        maxlen=self.history_size
+                    )
+                history.extend(zip([frame[2] for frame in frames], rows))
+            self._run_hooks(rx_msg.name, now)
+
+        prof.add("batch_decode", time.perf_counter_ns() - start)
+        done = time.time()
+        stats = self._batch_stats
+        stats[0] += 1
+        stats[1] += len(batch)
+        stats[2] += done * len(batch) - sum(frame[2] for frame in batch)
+        # the first frame of the batch waited the longest
+        stats[3] = max(stats[3], done - batch[0][2])
+
+    def _decode_worker(self, rx_queue: queue.Queue) -> None:
+        while True:
+            item = rx_queue.get()
+            if item is None:
+                break
+            self._process(*item)
+
+    def _process(self, msg: can.Message, now: float) -> None:
         msg_id = msg.arbitration_id
+        prof = self.profiler
         try:
+            start = time.perf_counter_ns()
             rx_msg = self.db.get_message_by_frame_id(msg_id)
+            looked_up = time.perf_counter_ns()
+            prof.add("rx_lookup", looked_up - start)
+            if self.lazy and rx_msg.name not in self.eager_msgs:
+                # keep the latest payload only, decoding happens on read
+                prev = self._raw.get(rx_msg.name)
+                if prev:
+                    entry = (msg.data, now, prev[1], prev[3] + 1)
+                else:
+                    entry = (msg.data, now, 0, 1)
+                self._raw[rx_msg.name] = entry
+                return
+
             rx_vals = rx_msg.decode(msg.data, decode_choices=False)
-            # update main dictionary
-            for signal in rx_msg.signals:
-                self.sig_vals[rx_msg.name][signal.name] = rx_vals[signal.name]
+            decoded = time.perf_counter_ns()
+            prof.add("decode", decoded - looked_up)
+            self._update_sig_vals(rx_msg, rx_vals)
 
             if self.rx_msg_stats:
-                now = time.time()
-                milliseconds = int(round(now * 1000) % 1000)
-                timestamp = time.strftime("%H:%M:%S.") + str(milliseconds).zfill(3)
                 data = self.rx_msg_stats[rx_msg.name]
-                prev_ts = data["prev_ts"]
-                data["last_received"] = timestamp
-                data["cycle_time"] = round(now - prev_ts, 3)
-                data["count"] += 1
-                data["prev_ts"] = now
+                if isinstance(data, CanifRxStats):
+                    data.received(now)
+                else:
+                    self._update_stats(data, now, data["prev_ts"], data["count"] + 1)
+            updated = time.perf_counter_ns()
+            prof.add("stats_update", updated - decoded)
         except cantools.database.DecodeError as e:
+            prof.count("decode_errors")
             print(f"{repr(e)}: {rx_msg.name}")
+            return
         except Exception as e:
             # this message is not for us
-            pass
+            prof.count("rx_ignored")
+            return
+
+        # outside the decode errors, a failing hook isn't an ignored frame
+        if self._decode_hooks:
+            self._run_hooks(rx_msg.name, now)
+            prof.add("decode_hooks", time.perf_counter_ns() - updated)
+
+    def _update_sig_vals(
+        self, rx_msg: cantools.database.can.Message, rx_vals: dict
+    ) -> None:
+        # update main dictionary, only the active branch of a mux message
+        names = self._sig_names[rx_msg.name]
+        msg_vals = self.sig_vals[rx_msg.name]
+        mux_table = self.mux_tables.get(rx_msg.name)
+        if not mux_table and isinstance(msg_vals, CanifMsgValues):
+            slots = self._slots.get(rx_msg.name)
+            if slots is None:
+                slots = ()
+                if all(name in msg_vals for name in names):
+                    slots = msg_vals.slots(names)
+                self._slots[rx_msg.name] = slots
+            if slots:
+                msg_vals.set_slots(slots, [rx_vals[name] for name in names])
+                return
+        if mux_table:
+            if mux_table.nested:
+                names = rx_vals.keys()
+            else:
+                names = mux_table.get_signal_names(rx_vals[mux_table.mux_signal])
+        for name in names:
+            msg_vals[name] = rx_vals[name]
+
+    @staticmethod
+    def _update_stats(data: dict, now: float, prev_ts: float, count: int) -> None:
+        if isinstance(data, CanifRxStats):
+            data.set(round(now - prev_ts, 3), count, now)
+            return
+        data["last_received"] = format_rx_time(now)
+        data["cycle_time"] = round(now - prev_ts, 3)
+        data["count"] = count
+        data["prev_ts"] = now
+
+    def refresh(self, msg_name: str) -> None:
+        """
+        Decode the latest payload of a message in lazy mode.
+
+        The decoded values are cached, so the payload is only decoded again
+        after a new frame for the message was received.
+
+        Args:
+            msg_name (str): Name of the message to decode.
+        """
+        entry = self._raw.get(msg_name)
+        if entry is None or self._decoded.get(msg_name) is entry:
+            return
+        self._decoded[msg_name] = entry
+        rx_msg = self.db.get_message_by_name(msg_name)
+        try:
+            start = time.perf_counter_ns()
+            rx_vals = rx_msg.decode(entry[0], decode_choices=False)
+            self.profiler.add("decode", time.perf_counter_ns() - start)
+            self._update_sig_vals(rx_msg, rx_vals)
+        except cantools.database.DecodeError as e:
+            self.profiler.count("decode_errors")
+            print(f"{repr(e)}: {rx_msg.name}")
+        self._refresh_msg_stats(msg_name, entry)
+
+    def refresh_stats(self) -> None:
+        """
+        Update rx_msg_stats from the latest received frames in lazy mode.
+        """
+        for msg_name, entry in list(self._raw.items()):
+            self._refresh_msg_stats(msg_name, entry)
+
+    def _refresh_msg_stats(self, msg_name: str, entry: tuple) -> None:
+        if self._stats_applied.get(msg_name) is entry:
+            return
+        self._stats_applied[msg_name] = entry
+        data = self.rx_msg_stats.get(msg_name)
+        if data is not None:
+            _, now, prev_ts, count = entry
+            self._update_stats(data, now, prev_ts, count)
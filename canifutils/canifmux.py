@@ -0,0 +1,116 @@
+import cantools
+
+
+class CanifMuxTable:
+    """
+    Precomputed lookup from multiplexer value to the signals present in a
+    frame of a multiplexed message.
+
+    The table is built once from the message signal tree so the receive
+    path only needs a single dictionary lookup to know which signals of
+    a decoded frame to update.
+    """
+
+    def __init__(self, message: cantools.database.can.Message):
+        """
+        Initialize CanifMuxTable instance.
+
+        Args:
+            message (cantools.database.can.Message): A multiplexed message.
+        """
+        self.message: cantools.database.can.Message = message
+        self.mux_signal: str = None
+        # signals present in every frame, including the multiplexer
+        self.common: tuple[str, ...] = ()
+        # {mux_value: (signal names present for that value, ...)}
+        self.branches: dict[int, tuple[str, ...]] = {}
+        # nested multiplexers can't be flattened to a single table
+        self.nested: bool = False
+
+        common = []
+        for node in message.signal_tree:
+            if isinstance(node, str):
+                common.append(node)
+                continue
+            for mux_name, branches in node.items():
+                self.mux_signal = mux_name
+                common.append(mux_name)
+                for mux_value, subtree in branches.items():
+                    names = []
+                    for sub_node in subtree:
+                        if isinstance(sub_node, str):
+                            names.append(sub_node)
+                        else:
+                            self.nested = True
+                    self.branches[mux_value] = tuple(names)
+
+        self.common = tuple(common)
+        self.branches = {
+            mux_value: self.common + names for mux_value, names in self.branches.items()
+        }
+
+    def get_signal_names(self, mux_value: int) -> tuple[str, ...]:
+        """
+        Returns the names of the signals present for a multiplexer value.
+
+        Args:
+            mux_value (int): The value of the multiplexer signal.
+
+        Returns:
+            tuple: Signal names, or only the common signals for an unknown value.
+        """
+        return self.branches.get(mux_value, self.common)
+
+    def get_active_signals(self, sig_dict: dict) -> list[str]:
+        """
+        Returns the names of the signals selected by the multiplexer values
+        in a signal dictionary. Handles nested multiplexers.
+
+        Args:
+            sig_dict (dict): {signal_name: signal_value, ...}
+        """
+        if not self.nested:
+            return list(self.get_signal_names(int(sig_dict[self.mux_signal])))
+        names = []
+        self._select(self.message.signal_tree, sig_dict, names)
+        return names
+
+    def filter(self, sig_dict: dict) -> dict:
+        """
+        Returns a copy of a signal dictionary with only the active signals,
+        as required to encode the message.
+
+        Args:
+            sig_dict (dict): {signal_name: signal_value, ...}
+        """
+        return {name: sig_dict[name] for name in self.get_active_signals(sig_dict)}
+
+    @classmethod
+    def _select(cls, tree: list, sig_dict: dict, names: list[str]) -> None:
+        for node in tree:
+            if isinstance(node, str):
+                names.append(node)
+                continue
+            for mux_name, branches in node.items():
+                names.append(mux_name)
+                subtree = branches.get(int(sig_dict[mux_name]), [])
+                cls._select(subtree, sig_dict, names)
+
+
+def build_mux_tables(
+    database: cantools.database.can.Database,
+) -> dict[str, CanifMuxTable]:
+    """
+    Build the multiplexer tables for every multiplexed message in a database.
+
+    Args:
+        database (cantools.database.can.Database): CAN database object.
+
+    Returns:
+        dict: {message_name: CanifMuxTable} for multiplexed messages only.
+    """
+    return {
+        msg.name: CanifMuxTable(msg)
+        for msg in database.messages
+        if msg.is_multiplexed()
+    }
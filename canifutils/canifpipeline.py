@@ -0,0 +1,608 @@
+import base64
+import io
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import can
+import cantools
+import pandas as pd
+
+from .canifresample import CanifResampler
+from .canifvec import CanifVecDecoder
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# columns of the frame batches produced by the sources
+FRAME_COLUMNS = ["timestamp", "arbitration_id", "data"]
+
+
+def _frame_batch(rows: list[tuple], start: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        rows,
+        columns=FRAME_COLUMNS,
+        index=pd.RangeIndex(start, start + len(rows)),
+    )
+
+
+class CanifCsvSource:
+    """
+    Reads frames from a CSV log written by can.Logger, chunk by chunk,
+    optionally only a byte range of it.
+    """
+
+    def __init__(
+        self, path: Path, chunksize: int = 100000, start: int = 0, end: int = None
+    ):
+        """
+        Initialize CanifCsvSource instance.
+
+        Args:
+            path (Path): CSV log with hex 'arbitration_id' and base64 'data'
+                columns.
+            chunksize (int, optional): Rows per batch.
+            start (int, optional): Byte offset of the first row to read, a
+                row boundary after the header.
+            end (int, optional): Byte offset after the last row to read, the
+                end of the file by default.
+        """
+        self.path: Path = path
+        self.chunksize: int = chunksize
+        self.start: int = start
+        self.end: int = end
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if not self.start and self.end is None:
+            chunks = pd.read_csv(
+                self.path, chunksize=self.chunksize, usecols=FRAME_COLUMNS
+            )
+            yield from self._convert(chunks)
+            return
+        with open(self.path, "rb") as f:
+            names = f.readline().decode().strip().split(",")
+            start = max(self.start, f.tell())
+            end = self.end if self.end is not None else Path(self.path).stat().st_size
+            if start >= end:
+                return
+            f.seek(start)
+            chunks = pd.read_csv(
+                io.BufferedReader(_RangeReader(f, end - start)),
+                chunksize=self.chunksize,
+                header=None,
+                names=names,
+                usecols=FRAME_COLUMNS,
+            )
+            yield from self._convert(chunks)
+
+    @staticmethod
+    def _convert(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            chunk["arbitration_id"] = chunk["arbitration_id"].map(lambda x: int(x, 16))
+            chunk["data"] = chunk["data"].map(base64.b64decode)
+            yield chunk
+
+
+class _RangeReader(io.RawIOBase):
+    # reads at most size bytes from the current position of a file
+    def __init__(self, f, size: int):
+        self._f = f
+        self._left: int = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._left)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buffer[: len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+class CanifFrameSource:
+    """
+    Batches an iterable of can.Message, e.g. a list or a log reader.
+    Error and remote frames are skipped.
+    """
+
+    def __init__(self, frames: Iterable[can.Message], batch_size: int = 10000):
+        """
+        Initialize CanifFrameSource instance.
+
+        Args:
+            frames (Iterable): Frames in time order.
+            batch_size (int, optional): Frames per batch.
+        """
+        self.frames: Iterable[can.Message] = frames
+        self.batch_size: int = batch_size
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        rows = []
+        start = 0
+        for msg in self.frames:
+            if msg.is_error_frame or msg.is_remote_frame:
+                continue
+            rows.append((msg.timestamp, msg.arbitration_id, bytes(msg.data)))
+            if len(rows) >= self.batch_size:
+                yield _frame_batch(rows, start)
+                start += len(rows)
+                rows = []
+        if rows:
+            yield _frame_batch(rows, start)
+
+
+class CanifLogSource(CanifFrameSource):
+    """
+    Reads frames from any log format of can.LogReader (ASC, BLF, TRC, ...).
+    """
+
+    def __init__(self, path: Path, batch_size: int = 10000):
+        """
+        Initialize CanifLogSource instance.
+
+        Args:
+            path (Path): Log file, the format is picked from its suffix.
+            batch_size (int, optional): Frames per batch.
+        """
+        self.path: Path = path
+        super().__init__(frames=None, batch_size=batch_size)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        with can.LogReader(self.path) as reader:
+            self.frames = reader
+            yield from super().__iter__()
+
+
+class CanifBusSource:
+    """
+    Receives frames from a live bus and yields a batch every batch interval,
+    until stopped or the duration elapsed.
+    """
+
+    def __init__(
+        self,
+        bus: can.BusABC,
+        batch_interval: float = 0.1,
+        duration: float = None,
+        stop_event: threading.Event = None,
+    ):
+        """
+        Initialize CanifBusSource instance.
+
+        Args:
+            bus (can.BusABC): Bus to receive from.
+            batch_interval (float, optional): Seconds per batch.
+            duration (float, optional): Seconds to receive, until stopped by
+                default.
+            stop_event (threading.Event, optional): Stops receiving when set.
+        """
+        self.bus: can.BusABC = bus
+        self.batch_interval: float = batch_interval
+        self.duration: float = duration
+        self.stop_event: threading.Event = stop_event or threading.Event()
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        end = None if self.duration is None else time.monotonic() + self.duration
+        start = 0
+        while not self.stop_event.is_set():
+            rows = []
+            batch_end = time.monotonic() + self.batch_interval
+            if end is not None:
+                batch_end = min(batch_end, end)
+            while (timeout := batch_end - time.monotonic()) > 0:
+                msg = self.bus.recv(timeout)
+                if msg is None:
+                    break
+                if msg.is_error_frame or msg.is_remote_frame:
+                    continue
+                rows.append((msg.timestamp, msg.arbitration_id, bytes(msg.data)))
+            if rows:
+                yield _frame_batch(rows, start)
+                start += len(rows)
+            if end is not None and time.monotonic() >= end:
+                break
+
+
+class CanifFilterStage:
+    """
+    Keeps the frames of a set of arbitration IDs and/or matching a predicate.
+    """
+
+    def __init__(
+        self,
+        ids: set[int] = None,
+        predicate: Callable[[pd.DataFrame], pd.Series] = None,
+    ):
+        """
+        Initialize CanifFilterStage instance.
+
+        Args:
+            ids (set, optional): Arbitration IDs to keep.
+            predicate (Callable, optional): Returns a boolean mask of the rows
+                of a frame batch to keep.
+        """
+        self.ids: set[int] = ids
+        self.predicate: Callable[[pd.DataFrame], pd.Series] = predicate
+
+    def process(self, frames: pd.DataFrame) -> pd.DataFrame:
+        if self.ids is not None:
+            frames = frames[frames["arbitration_id"].isin(self.ids)]
+        if self.predicate is not None:
+            frames = frames[self.predicate(frames)]
+        return frames
+
+    def finish(self) -> None:
+        return None
+
+
+class CanifDecodeStage:
+    """
+    Decodes a frame batch into {msg_name: DataFrame}, all frames of a
+    message at once with CanifVecDecoder.
+
+    The DataFrames have a 'timestamp' column and a column per signal and
+    keep the index of the frames in the batch. Signals outside the active
+    branch of a mux message are empty.
+    """
+
+    def __init__(
+        self,
+        database: cantools.database.can.Database,
+        enum: int = 0,
+        decode_choices: bool = False,
+    ):
+        """
+        Initialize CanifDecodeStage instance.
+
+        Args:
+            database (cantools.database.can.Database): CAN database.
+            enum (int, optional): Enumeration offset of the node IDs.
+            decode_choices (bool, optional): Convert values with choices to
+                their names, decoded frame by frame with cantools.
+        """
+        self.database: cantools.database.can.Database = database
+        self.enum: int = enum
+        self.decode_choices: bool = decode_choices
+        self.messages: dict[int, cantools.database.can.Message] = {
+            msg.frame_id: msg for msg in database.messages
+        }
+        self._decoders: dict[int, CanifVecDecoder] = {}
+
+    def _decode_frames(self, message, datas: list[bytes]) -> tuple[list, list]:
+        # frame by frame, skipping the frames that don't decode
+        rows = []
+        decoded = []
+        for i, data in enumerate(datas):
+            try:
+                rows.append(message.decode(data, decode_choices=self.decode_choices))
+                decoded.append(i)
+            except Exception as e:
+                print(f"[WARN] Skipping {message.name} frame due to error: {e}")
+        return rows, decoded
+
+    def process(self, frames: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        samples = {}
+        ids = frames["arbitration_id"] - self.enum
+        for arbitration_id, rows in frames.groupby(ids, sort=False):
+            message = self.messages.get(arbitration_id)
+            if message is None:
+                continue
+            decoder = self._decoders.get(arbitration_id)
+            if decoder is None:
+                decoder = self._decoders[arbitration_id] = CanifVecDecoder(message)
+            datas = rows["data"].to_list()
+            short = rows["data"].map(len) < message.length
+            if short.any():
+                print(f"[WARN] Skipping {short.sum()} short frames of {message.name}")
+                rows = rows[~short]
+                datas = rows["data"].to_list()
+                if not datas:
+                    continue
+
+            values = None
+            if not self.decode_choices:
+                try:
+                    _, values = decoder.decode(datas, rows=True)
+                except Exception:
+                    values = None
+            if values is None:
+                decoded, kept = self._decode_frames(message, datas)
+                if not decoded:
+                    continue
+                rows = rows.iloc[kept]
+                values = [[row.get(name) for name in decoder.names] for row in decoded]
+
+            df = pd.DataFrame(values, columns=decoder.names, index=rows.index)
+            df.insert(0, "timestamp", rows["timestamp"])
+            samples[message.name] = df
+        return samples
+
+    def finish(self) -> None:
+        return None
+
+    def to_table(
+        self, samples: dict[str, pd.DataFrame], columns: list[str] = None
+    ) -> pd.DataFrame:
+        """
+        Merge decoded samples into one table in frame order.
+
+        Args:
+            samples (dict): Output of process().
+            columns (list, optional): Signal columns of the table, the
+                decoded signals in order of appearance by default.
+
+        Returns:
+            pd.DataFrame: 'timestamp', 'arbitration_id' (hex) and a column
+                per signal name.
+        """
+        frames = []
+        for msg_name, df in samples.items():
+            message = self.database.get_message_by_name(msg_name)
+            df = df.copy()
+            df.insert(1, "arbitration_id", hex(message.frame_id + self.enum))
+            frames.append(df)
+        if not frames:
+            table = pd.DataFrame(columns=["timestamp", "arbitration_id"])
+        else:
+            table = pd.concat(frames).sort_index(kind="stable")
+        if columns is not None:
+            table = table.reindex(columns=["timestamp", "arbitration_id"] + columns)
+        return table
+
+
+class CanifTableStage:
+    """
+    Merges decoded samples into one table with a column per database signal,
+    so every batch has the same columns.
+    """
+
+    def __init__(self, decode_stage: CanifDecodeStage):
+        """
+        Initialize CanifTableStage instance.
+
+        Args:
+            decode_stage (CanifDecodeStage): Stage that decoded the samples.
+        """
+        self.decode_stage: CanifDecodeStage = decode_stage
+        self.columns: list[str] = list(
+            dict.fromkeys(
+                signal.name
+                for msg in decode_stage.database.messages
+                for signal in msg.signals
+            )
+        )
+
+    def process(self, samples: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        return self.decode_stage.to_table(samples, self.columns)
+
+    def finish(self) -> None:
+        return None
+
+
+class CanifResampleStage:
+    """
+    Places decoded samples on a fixed time grid with CanifResampler.
+    """
+
+    def __init__(
+        self,
+        database: cantools.database.can.Database,
+        period: float,
+        method: str = "last",
+        signals: list[str] = None,
+    ):
+        """
+        Initialize CanifResampleStage instance.
+
+        Args:
+            database (cantools.database.can.Database): CAN database.
+            period (float): Grid period in seconds.
+            method (str, optional): 'last', 'mean' or 'interp'.
+            signals (list, optional): 'Message' or 'Message.Signal' names,
+                all database signals by default.
+
+        Raises:
+            KeyError: If a message or signal isn't in the database.
+        """
+        selected = {}
+        for name in signals or [msg.name for msg in database.messages]:
+            msg_name, _, sig_name = name.partition(".")
+            message = database.get_message_by_name(msg_name)
+            if sig_name:
+                message.get_signal_by_name(sig_name)
+                selected.setdefault(msg_name, []).append(sig_name)
+            else:
+                selected[msg_name] = [signal.name for signal in message.signals]
+        self.resampler: CanifResampler = CanifResampler(period, selected, method)
+
+    def process(self, samples: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        return self.resampler.push(samples)
+
+    def finish(self) -> pd.DataFrame:
+        return self.resampler.finish()
+
+
+class CanifCsvSink:
+    """
+    Appends table batches to a CSV file, the header is written once.
+    """
+
+    def __init__(self, path: Path, columns: list[str] = None):
+        """
+        Initialize CanifCsvSink instance.
+
+        Args:
+            path (Path): Output CSV file.
+            columns (list, optional): Columns to write, the columns of the
+                first batch by default. Always written as the header, even
+                without rows.
+        """
+        self.path: Path = path
+        self.columns: list[str] = columns
+        self.rows: int = 0
+        self._file = None
+
+    def write(self, table: pd.DataFrame) -> None:
+        if self._file is None:
+            self._file = open(self.path, "w", newline="")
+            if self.columns is None:
+                self.columns = list(table.columns)
+            pd.DataFrame(columns=self.columns).to_csv(self._file, index=False)
+        if table.empty:
+            return
+        table.reindex(columns=self.columns).to_csv(
+            self._file, header=False, index=False
+        )
+        self.rows += len(table)
+
+    def close(self) -> None:
+        if self._file is None and self.columns is not None:
+            self.write(pd.DataFrame(columns=self.columns))
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CanifParquetSink:
+    """
+    Writes table batches or decoded samples to Parquet files with pyarrow,
+    one row group per batch.
+
+    Tables are written to the path, decoded samples to one file per message
+    in the path directory.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize CanifParquetSink instance.
+
+        Args:
+            path (Path): Output file for tables, output directory for decoded
+                samples.
+
+        Raises:
+            ImportError: If pyarrow isn't installed.
+        """
+        if pyarrow is None:
+            raise ImportError("CanifParquetSink requires pyarrow")
+        self.path: Path = Path(path)
+        self.rows: int = 0
+        # {file path: pyarrow.parquet.ParquetWriter}
+        self._writers: dict[Path, object] = {}
+
+    def _write_table(self, path: Path, table: pd.DataFrame) -> None:
+        if table.empty:
+            return
+        arrow_table = pyarrow.Table.from_pandas(table, preserve_index=False)
+        writer = self._writers.get(path)
+        if writer is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            writer = pyarrow.parquet.ParquetWriter(path, arrow_table.schema)
+            self._writers[path] = writer
+        writer.write_table(arrow_table.cast(writer.schema))
+        self.rows += len(table)
+
+    def write(self, batch) -> None:
+        if isinstance(batch, dict):
+            for msg_name, df in batch.items():
+                self._write_table(self.path / f"{msg_name}.parquet", df)
+        else:
+            self._write_table(self.path, batch)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+class CanifCallbackSink:
+    """
+    Passes every batch to a callback.
+    """
+
+    def __init__(self, callback: Callable):
+        """
+        Initialize CanifCallbackSink instance.
+
+        Args:
+            callback (Callable): Called with every batch.
+        """
+        self.callback: Callable = callback
+
+    def write(self, batch) -> None:
+        self.callback(batch)
+
+    def close(self) -> None:
+        pass
+
+
+class CanifPipeline:
+    """
+    Moves batches from a source through stages into sinks.
+
+    A source is an iterable of frame batches, DataFrames with 'timestamp',
+    'arbitration_id' and 'data' (bytes) columns. A stage has process(batch),
+    returning the next batch or None to drop it, and finish(), returning
+    the last batch or None when the source is exhausted. A sink has
+    write(batch) and close(). Offline logs and live buses go through the
+    same stages.
+
+    Example:
+        db = cantools.database.load_file("a.dbc")
+        decode = CanifDecodeStage(db)
+        CanifPipeline(
+            CanifLogSource("log.blf"),
+            [decode, CanifResampleStage(db, 0.01)],
+            [CanifCsvSink("resampled.csv")],
+        ).run()
+    """
+
+    def __init__(self, source: Iterable, stages: list, sinks: list):
+        """
+        Initialize CanifPipeline instance.
+
+        Args:
+            source (Iterable): Yields frame batches.
+            stages (list): Stages applied in order.
+            sinks (list): Sinks that receive the output of the last stage.
+        """
+        self.source: Iterable = source
+        self.stages: list = stages
+        self.sinks: list = sinks
+        self.batches: int = 0
+
+    def _run_stages(self, batch, start: int = 0) -> None:
+        for stage in self.stages[start:]:
+            batch = stage.process(batch)
+            if batch is None:
+                return
+        for sink in self.sinks:
+            sink.write(batch)
+
+    def run(self) -> int:
+        """
+        Run until the source is exhausted, then flush the stages and close
+        the sinks.
+
+        Returns:
+            int: Number of batches read from the source.
+        """
+        try:
+            for batch in self.source:
+                self.batches += 1
+                self._run_stages(batch)
+            for i, stage in enumerate(self.stages):
+                batch = stage.finish()
+                if batch is not None:
+                    self._run_stages(batch, i + 1)
+        finally:
+            for sink in self.sinks:
+                sink.close()
+        return self.batches
@@ -0,0 +1,315 @@
+import multiprocessing
+import queue
+import threading
+import time
+from pathlib import Path
+
+import can
+import cantools
+
+from .canifbusload import CanifBusLoad
+from .canifgen import CanifTrafficGen
+from .caniflistener import CanifListener
+from .canifstore import CanifRxStatsTable, CanifSignalStore
+
+
+def _run_decoder(
+    bus_kwargs: dict,
+    dbc_path: str,
+    options: dict,
+    updates: multiprocessing.Queue,
+    tx_frames: multiprocessing.Queue,
+    stop: multiprocessing.Event,
+) -> None:
+    """
+    Entry point of the decoder process. Receives and decodes frames and puts
+    batches of the messages updated since the previous batch on the updates
+    queue.
+    """
+    db = cantools.database.load_file(dbc_path)
+    sig_vals = CanifSignalStore(
+        {msg.name: {signal.name: 0 for signal in msg.signals} for msg in db.messages},
+        db,
+    )
+    rx_msg_stats = CanifRxStatsTable(msg.name for msg in db.messages)
+    listener = CanifListener(
+        sig_vals=sig_vals,
+        database=db,
+        rx_msg_stats=rx_msg_stats,
+        queue_size=options["queue_size"],
+        workers=options["workers"],
+    )
+    bus_load = CanifBusLoad(bitrate=options["bitrate"])
+    listener.add_observer(bus_load.on_frame)
+    # {msg_name: receive time} of messages decoded since the last batch
+    dirty = {}
+    dirty_lock = threading.Lock()
+
+    def mark_dirty(msg_name, now):
+        with dirty_lock:
+            dirty[msg_name] = now
+
+    listener.add_decode_hook(mark_dirty)
+
+    with can.Bus(**bus_kwargs) as bus:
+        listeners = [listener]
+        if options["log_path"]:
+            Path(options["log_path"]).parent.mkdir(parents=True, exist_ok=True)
+            listeners.append(can.Logger(options["log_path"]))
+        listener.start()
+        notifier = can.Notifier(bus, listeners)
+
+        def send_frames():
+            while True:
+                frame = tx_frames.get()
+                if frame is None:
+                    break
+                arbitration_id, data, is_extended_id = frame
+                try:
+                    bus.send(
+                        can.Message(
+                            arbitration_id=arbitration_id,
+                            data=data,
+                            is_extended_id=is_extended_id,
+                        )
+                    )
+                except can.CanError as e:
+                    print(f"CanifDecodeProcess: {repr(e)}")
+
+        tx_thread = threading.Thread(target=send_frames, daemon=True)
+        tx_thread.start()
+
+        traffic_gen = None
+        gen_bus = None
+        gen_stop = threading.Event()
+        if options["test_traffic"]:
+            test = options["test_traffic"]
+            # a second bus instance, so the traffic is received like external
+            gen_bus = can.Bus(**bus_kwargs)
+            traffic_gen = CanifTrafficGen(
+                bus=gen_bus,
+                messages=[db.get_message_by_name(name) for name in test["messages"]],
+                rate=test.get("rate", 1.0),
+                pattern=test.get("pattern", "ramp"),
+                default_cycle_time=test.get("default_cycle_time", 1000),
+            )
+            gen_thread = threading.Thread(
+                target=traffic_gen.run, args=(gen_stop,), daemon=True
+            )
+            gen_thread.start()
+
+        while not stop.wait(options["batch_interval"]):
+            with dirty_lock:
+                batch = dict(dirty)
+                dirty.clear()
+            updates.put(
+                {
+                    "signals": {
+                        msg_name: (
+                            dict(sig_vals[msg_name]),
+                            dict(rx_msg_stats[msg_name]),
+                            now,
+                        )
+                        for msg_name, now in batch.items()
+                    },
+                    "queue": listener.get_queue_stats(),
+                    "load": bus_load.get_load(top=options["top"]),
+                }
+            )
+
+        gen_stop.set()
+        notifier.stop()
+        tx_frames.put(None)
+        tx_thread.join()
+        if traffic_gen:
+            gen_thread.join()
+            gen_bus.shutdown()
+            traffic_gen.report()
+
+
+class CanifDecodeProcess:
+    """
+    Receives and decodes frames of a CAN bus in a child process.
+
+    The child process owns the bus, so decoding doesn't compete with the Tk
+    GUI for the GIL. It sends the values and receive stats of the messages
+    updated since the previous batch every batch interval; the parent
+    applies these batches with poll(). send() forwards frames to the child,
+    so an instance can be passed as the bus of Canif or CanifBus.
+    """
+
+    def __init__(
+        self,
+        bus_kwargs: dict,
+        dbc_path: Path,
+        batch_interval: float = 0.05,
+        bitrate: int = 500000,
+        queue_size: int = 0,
+        workers: int = 1,
+        log_path: Path = None,
+        test_traffic: dict = None,
+        top: int = 5,
+    ):
+        """
+        Initialize CanifDecodeProcess instance.
+
+        Args:
+            bus_kwargs (dict): Arguments of can.Bus for the child process,
+                e.g. {'interface': 'socketcan', 'channel': 'can0'}.
+            dbc_path (Path): CAN database file loaded by the child process.
+            batch_interval (float, optional): Seconds between two batches.
+            bitrate (int, optional): Nominal bitrate used for the bus load.
+            queue_size (int, optional): Decode queue size in the child, 0
+                decodes inline.
+            workers (int, optional): Number of decode workers in the child.
+            log_path (Path, optional): Log received frames with can.Logger in
+                the child process.
+            test_traffic (dict, optional): Run a CanifTrafficGen in the child:
+                {'messages': [msg_name, ...], 'rate', 'pattern',
+                'default_cycle_time'}.
+            top (int, optional): Number of top talkers sent with every batch.
+        """
+        self.bus_kwargs: dict = bus_kwargs
+        self.dbc_path: str = str(dbc_path)
+        self.options: dict = {
+            "batch_interval": batch_interval,
+            "bitrate": bitrate,
+            "queue_size": queue_size,
+            "workers": workers,
+            "log_path": str(log_path) if log_path else None,
+            "test_traffic": test_traffic,
+            "top": top,
+        }
+        # spawn, since the parent may already run threads
+        self._ctx = multiprocessing.get_context("spawn")
+        self._updates: multiprocessing.Queue = None
+        self._tx_frames: multiprocessing.Queue = None
+        self._stop: multiprocessing.Event = None
+        self._process: multiprocessing.Process = None
+        # batches drained while stopping, returned by the next poll()
+        self._drained: list[dict] = []
+        self.batches: int = 0
+
+    @property
+    def channel_info(self) -> str:
+        return f"decode process: {self.bus_kwargs.get('channel')}"
+
+    def start(self) -> None:
+        """
+        Start the decoder process.
+        """
+        if self._process:
+            return
+        self._updates = self._ctx.Queue()
+        self._tx_frames = self._ctx.Queue()
+        self._stop = self._ctx.Event()
+        self._process = self._ctx.Process(
+            target=_run_decoder,
+            args=(
+                self.bus_kwargs,
+                self.dbc_path,
+                self.options,
+                self._updates,
+                self._tx_frames,
+                self._stop,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop the decoder process.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the process to exit.
+        """
+        if not self._process:
+            return
+        self._stop.set()
+        # keep draining so the child can flush its queue and exit, the last
+        # batches are kept for the next poll()
+        end = time.monotonic() + timeout
+        while self._process.is_alive() and time.monotonic() < end:
+            self._drained += self._get_batches()
+            self._process.join(0.05)
+        self._drained += self._get_batches()
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def shutdown(self) -> None:
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def send(self, msg: can.Message, timeout: float = None) -> None:
+        """
+        Send a frame on the bus of the decoder process.
+
+        Args:
+            msg (can.Message): Frame to send.
+            timeout (float, optional): Unused, the frame is queued.
+
+        Raises:
+            can.CanOperationError: If the decoder process isn't running.
+        """
+        self.check_alive()
+        self._tx_frames.put((msg.arbitration_id, bytes(msg.data), msg.is_extended_id))
+
+    def check_alive(self) -> None:
+        """
+        Raises can.CanOperationError if the decoder process isn't running,
+        e.g. when it failed to open the bus or load the database.
+        """
+        if not self._process:
+            raise can.CanOperationError("Decoder process not running")
+        if not self._process.is_alive():
+            raise can.CanOperationError(
+                f"Decoder process exited with code {self._process.exitcode}"
+            )
+
+    def poll(self, timeout: float = 0) -> list[dict]:
+        """
+        Returns the batches received since the last poll, including the ones
+        drained while stopping.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a batch if none is
+                pending, 0 doesn't block.
+
+        Returns:
+            list: [{'signals': {msg_name: (values, stats, receive time)},
+                    'queue': decode queue counters, 'load': bus load}, ...]
+
+        Raises:
+            can.CanOperationError: If the decoder process exited without
+                being stopped and no batches are left.
+        """
+        batches, self._drained = self._drained, []
+        if not batches:
+            batches = self._get_batches(timeout)
+        if not batches and self._process:
+            self.check_alive()
+        return batches
+
+    def _get_batches(self, timeout: float = 0) -> list[dict]:
+        batches = []
+        if not self._updates:
+            return batches
+        if timeout > 0:
+            try:
+                batches.append(self._updates.get(timeout=timeout))
+            except queue.Empty:
+                return batches
+        while True:
+            try:
+                batches.append(self._updates.get_nowait())
+            except queue.Empty:
+                break
+        self.batches += len(batches)
+        return batches
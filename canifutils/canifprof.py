@@ -0,0 +1,162 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class CanifProfiler:
+    """
+    Lightweight counters and timers for the hot paths of Canif.
+
+    Timers accumulate a count, total and maximum of elapsed perf_counter_ns()
+    durations under a name. Updates are plain list operations without a
+    lock, cheap enough to keep enabled while running; concurrent updates
+    of the same timer from two threads may rarely lose a sample.
+
+    A sampling profiler can additionally record the stacks of all threads
+    for a time window and dump them in the folded format used by flame
+    graph tools.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize CanifProfiler instance.
+
+        Args:
+            enabled (bool, optional): Record timers and counters.
+        """
+        self.enabled: bool = enabled
+        # {name: [count, total ns, max ns]}
+        self._timers: dict[str, list[int]] = {}
+        self._counters: dict[str, int] = {}
+        self._sampler: threading.Thread = None
+
+    def add(self, name: str, elapsed_ns: int) -> None:
+        """
+        Add a duration to a timer.
+
+        Args:
+            name (str): Name of the timer.
+            elapsed_ns (int): Duration in nanoseconds.
+        """
+        if not self.enabled:
+            return
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers.setdefault(name, [0, 0, 0])
+        timer[0] += 1
+        timer[1] += elapsed_ns
+        if elapsed_ns > timer[2]:
+            timer[2] = elapsed_ns
+
+    def count(self, name: str, n: int = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name (str): Name of the counter.
+            n (int, optional): Increment.
+        """
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def timed(self, name: str):
+        """
+        Context manager timing the enclosed block.
+
+        Args:
+            name (str): Name of the timer.
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter_ns() - start)
+
+    def reset(self) -> None:
+        """
+        Clear all timers and counters.
+        """
+        self._timers = {}
+        self._counters = {}
+
+    def get_stats(self) -> dict:
+        """
+        Returns the timers and counters.
+
+        Returns:
+            dict: {'timers': {name: {'count', 'total_ms', 'mean_us',
+                   'max_us'}}, 'counters': {name: count}}
+        """
+        timers = {}
+        for name, (count, total, worst) in sorted(self._timers.items()):
+            timers[name] = {
+                "count": count,
+                "total_ms": round(total / 1e6, 3),
+                "mean_us": round(total / count / 1e3, 2) if count else 0,
+                "max_us": round(worst / 1e3, 2),
+            }
+        return {"timers": timers, "counters": dict(sorted(self._counters.items()))}
+
+    def sample(
+        self, duration: float, path: Path = None, interval: float = 0.001
+    ) -> Path:
+        """
+        Sample the stacks of all threads in a background thread and write
+        them to a file when the window ends.
+
+        Args:
+            duration (float): Length of the window in seconds.
+            path (Path, optional): Output file. logs/profile_<time>.txt if not
+                given.
+            interval (float, optional): Seconds between two samples.
+
+        Returns:
+            Path: The file the profile is written to.
+
+        Raises:
+            RuntimeError: If a sampling window is already running.
+        """
+        if self._sampler and self._sampler.is_alive():
+            raise RuntimeError("Profile sampling already running")
+        path = Path(
+            path or Path("logs") / f"profile_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+        )
+        self._sampler = threading.Thread(
+            target=self._sample_window, args=(duration, path, interval), daemon=True
+        )
+        self._sampler.start()
+        return path
+
+    @staticmethod
+    def _sample_window(duration: float, path: Path, interval: float) -> None:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: dict[str, int] = {}
+        samples = 0
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                key = ";".join(reversed(stack))
+                stacks[key] = stacks.get(key, 0) + 1
+            samples += 1
+            time.sleep(interval)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as fprof:
+                for stack, count in sorted(stacks.items(), key=lambda s: -s[1]):
+                    fprof.write(f"{stack} {count}\n")
+            print(f"Wrote {samples} profile samples to {path}")
+        except OSError as e:
+            print(f"Error: Failed to write profile {repr(e)}")
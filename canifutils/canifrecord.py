@@ -0,0 +1,335 @@
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+
+class CanifRecorder:
+    """
+    Records decoded signal values into a SQLite database for long runs.
+
+    Decode hooks compare every signal of a received message with the last
+    recorded value and only queue a (signal, time, value) row when it moved
+    by more than the signal deadband, or for values that aren't numbers,
+    e.g. choice names, when the text changed. A background thread writes the
+    queued rows in one transaction per flush interval, rows of a failed write
+    stay queued for the next one. The database runs in WAL mode, so it can
+    be queried while recording. Samples are stored clustered by signal and
+    time, so the changes of one signal over a time range are read as one
+    contiguous range. In batch decode mode the latest values of
+    every batch are recorded.
+
+    Tables:
+        signals: id, name ('Message.Signal', namespaced for added buses)
+        samples: signal_id, ts (receive time in seconds), value; a second
+                 change of a signal at the same time replaces the first
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS signals "
+        "(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS samples "
+        "(signal_id INTEGER NOT NULL, ts REAL NOT NULL, value REAL, "
+        "PRIMARY KEY (signal_id, ts)) WITHOUT ROWID",
+    )
+
+    def __init__(
+        self,
+        path: Path,
+        deadband: float = 0.0,
+        deadbands: dict[str, float] = None,
+        flush_interval: float = 1.0,
+    ):
+        """
+        Initialize CanifRecorder instance.
+
+        Args:
+            path (Path): SQLite database file, created if missing. Recording
+                into an existing file appends to it.
+            deadband (float, optional): Change a value must exceed to be
+                recorded, 0 records every change.
+            deadbands (dict, optional): {'Message.Signal': deadband} overriding
+                the default per signal.
+            flush_interval (float, optional): Seconds between writes.
+        """
+        self.path: Path = Path(path)
+        self.deadband: float = deadband
+        self.deadbands: dict[str, float] = deadbands or {}
+        self.flush_interval: float = flush_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # used by the writer thread, and by watch() before it starts
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+        self._conn_lock = threading.Lock()
+        # (signal_id, ts, value) rows waiting for the writer
+        self._pending: deque = deque()
+        self._thread: threading.Thread = None
+        self._stop_event = threading.Event()
+        # [rows queued, rows skipped by the deadband, rows written, flushes,
+        #  max flush time in s, failed flushes]
+        self._stats: list = [0, 0, 0, 0, 0.0, 0]
+
+    def _signal_id(self, name: str) -> int:
+        with self._conn_lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO signals (name) VALUES (?)", (name,)
+            )
+            return self._conn.execute(
+                "SELECT id FROM signals WHERE name = ?", (name,)
+            ).fetchone()[0]
+
+    def watch(self, sig_vals: dict, msg_names, prefix: str = ""):
+        """
+        Create a decode hook recording the signals of messages.
+
+        Args:
+            sig_vals (dict): Signal values by message name the hook reads,
+                e.g. CanifBus.sig_vals.
+            msg_names (iterable): Messages to record.
+            prefix (str, optional): Prefix of the recorded message names,
+                e.g. '<bus>.' for an added bus.
+
+        Returns:
+            callable: Decode hook called as hook(msg_name, receive_time).
+        """
+        # {msg_name: (signal names, signal ids, deadbands, last values)}
+        plans: dict[str, tuple] = {}
+        for msg_name in msg_names:
+            names = tuple(sig_vals[msg_name])
+            full_names = [f"{prefix}{msg_name}.{name}" for name in names]
+            plans[msg_name] = (
+                names,
+                tuple(self._signal_id(name) for name in full_names),
+                tuple(self.deadbands.get(name, self.deadband) for name in full_names),
+                [None] * len(names),
+            )
+        pending = self._pending
+        stats = self._stats
+
+        def hook(msg_name: str, now: float) -> None:
+            plan = plans.get(msg_name)
+            if plan is None:
+                return
+            values = sig_vals[msg_name]
+            names, ids, bands, last = plan
+            for i, name in enumerate(names):
+                value = values[name]
+                prev = last[i]
+                if not isinstance(value, (int, float)):
+                    # choice names and other values are recorded as text
+                    value = str(value)
+                    changed = value != prev
+                elif prev is None or isinstance(prev, str):
+                    changed = True
+                else:
+                    changed = abs(value - prev) > bands[i]
+                if changed:
+                    last[i] = value
+                    pending.append((ids[i], now, value))
+                    stats[0] += 1
+                else:
+                    stats[1] += 1
+
+        return hook
+
+    def start(self) -> None:
+        """
+        Start the writer thread.
+        """
+        if self._thread:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="canif-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the writer thread after writing the queued rows.
+        """
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self) -> None:
+        """
+        Stop recording and close the database.
+        """
+        self.stop()
+        self._flush()
+        self._conn.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        pending = self._pending
+        # rows queued while writing stay for the next flush
+        rows = [pending.popleft() for _ in range(len(pending))]
+        if not rows:
+            return
+        start = time.perf_counter()
+        try:
+            with self._conn_lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO samples VALUES (?, ?, ?)", rows
+                )
+        except sqlite3.Error as e:
+            # e.g. locked or a full disk, retried with the next flush
+            pending.extendleft(reversed(rows))
+            self._stats[5] += 1
+            print(f"CanifRecorder: {repr(e)}, {len(rows)} rows kept for retry")
+            return
+        stats = self._stats
+        stats[2] += len(rows)
+        stats[3] += 1
+        stats[4] = max(stats[4], time.perf_counter() - start)
+
+    def get_stats(self) -> dict:
+        """
+        Returns the recording counters.
+
+        Returns:
+            dict: {'recorded': rows queued, 'skipped': values within the
+                   deadband, 'written': rows written, 'pending': rows queued
+                   for the next flush, 'flushes', 'flush_max_ms',
+                   'flush_errors': failed flushes}
+        """
+        recorded, skipped, written, flushes, flush_max, errors = self._stats
+        return {
+            "recorded": recorded,
+            "skipped": skipped,
+            "written": written,
+            "pending": len(self._pending),
+            "flushes": flushes,
+            "flush_max_ms": round(1000 * flush_max, 3),
+            "flush_errors": errors,
+        }
+
+
+class CanifRecordReader:
+    """
+    Reads signal history recorded by a CanifRecorder, also while it is
+    recording.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize CanifRecordReader instance.
+
+        Args:
+            path (Path): SQLite database written by a CanifRecorder.
+        """
+        self.path: Path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"No recording at '{self.path}'")
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def signals(self) -> list[str]:
+        """
+        Returns the recorded 'Message.Signal' names.
+        """
+        rows = self._conn.execute("SELECT name FROM signals ORDER BY name")
+        return [name for (name,) in rows]
+
+    def query(
+        self, signal: str, start: float = None, end: float = None
+    ) -> list[tuple[float, float]]:
+        """
+        Returns the recorded changes of a signal in a time range. The value
+        at the start of the range, recorded before it, comes first.
+
+        Args:
+            signal (str): 'Message.Signal' name.
+            start (float, optional): First receive time, from the beginning
+                if not given.
+            end (float, optional): Last receive time, to the end if not given.
+
+        Returns:
+            list: [(receive time, value), ...] in time order.
+
+        Raises:
+            KeyError: If the signal isn't recorded.
+        """
+        row = self._conn.execute(
+            "SELECT id FROM signals WHERE name = ?", (signal,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"Signal '{signal}' not recorded")
+        signal_id = row[0]
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        samples = []
+        if start > float("-inf"):
+            samples = self._conn.execute(
+                "SELECT ts, value FROM samples WHERE signal_id = ? AND ts < ? "
+                "ORDER BY ts DESC LIMIT 1",
+                (signal_id, start),
+            ).fetchall()
+        samples += self._conn.execute(
+            "SELECT ts, value FROM samples WHERE signal_id = ? AND ts >= ? "
+            "AND ts <= ? ORDER BY ts",
+            (signal_id, start, end),
+        ).fetchall()
+        return samples
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query signal history recorded with 'canif --record'."
+    )
+    parser.add_argument("db", help="Path to the recording")
+    parser.add_argument(
+        "--signal",
+        required=False,
+        help="Message.Signal to print, lists the recorded signals if not given",
+    )
+    parser.add_argument(
+        "--start", required=False, type=float, help="First receive time (epoch s)"
+    )
+    parser.add_argument(
+        "--end", required=False, type=float, help="Last receive time (epoch s)"
+    )
+    args = parser.parse_args()
+
+    try:
+        reader = CanifRecordReader(args.db)
+        if not args.signal:
+            for name in reader.signals():
+                print(name)
+            return
+        start = time.perf_counter()
+        samples = reader.query(args.signal, args.start, args.end)
+        elapsed = time.perf_counter() - start
+        print("timestamp,value")
+        for ts, value in samples:
+            print(f"{ts:.6f},{value}")
+        print(
+            f"[INFO] {len(samples)} samples in {1000 * elapsed:.1f} ms",
+            file=sys.stderr,
+        )
+        reader.close()
+    except Exception as e:
+        print(repr(e))
+
+
+if __name__ == "__main__":
+    main()
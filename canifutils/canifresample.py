@@ -0,0 +1,180 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class CanifResampler:
+    """
+    Places decoded signals of several messages on a fixed time grid.
+
+    Samples are pushed per message in time order, e.g. chunk by chunk while
+    reading a log. Every push emits the grid rows up to a watermark that no
+    later sample can change, so the output can be written as a stream and
+    only the samples after the watermark are kept.
+
+    Methods:
+        last:   value of the last sample at or before the grid time (as-of)
+        mean:   mean of the samples in (t - period, t], the last value for
+                empty intervals
+        interp: linear interpolation between the samples around the grid
+                time, the last value after the last sample
+    """
+
+    METHODS = ("last", "mean", "interp")
+
+    def __init__(
+        self,
+        period: float,
+        signals: dict[str, list[str]],
+        method: str = "last",
+        stale: float = 1.0,
+    ):
+        """
+        Initialize CanifResampler instance.
+
+        Args:
+            period (float): Grid period in seconds.
+            signals (dict): {msg_name: [signal names]} to place on the grid.
+            method (str, optional): 'last', 'mean' or 'interp'.
+            stale (float, optional): With 'interp', messages without samples
+                for this many seconds don't hold back the watermark.
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Invalid method '{method}'")
+        if period <= 0:
+            raise ValueError(f"Invalid period '{period}'")
+        self.period: float = period
+        self.signals: dict[str, list[str]] = signals
+        self.method: str = method
+        self.stale: float = stale
+        self.columns: list[str] = ["timestamp"] + [
+            f"{msg_name}.{name}"
+            for msg_name, names in signals.items()
+            for name in names
+        ]
+        self._t0: float = None
+        # index of the next grid time to emit
+        self._next_k: int = 0
+        # {msg_name: (timestamps, values)} of the samples not fully emitted
+        self._tails: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._latest: float = -math.inf
+
+    def push(self, samples: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Add decoded samples and emit the grid rows they complete.
+
+        Args:
+            samples (dict): {msg_name: DataFrame with a 'timestamp' column and
+                the signal columns}, each in time order.
+
+        Returns:
+            pd.DataFrame: Grid rows with a 'timestamp' column and a
+                'Message.Signal' column per signal.
+        """
+        first = math.inf
+        for msg_name, df in samples.items():
+            names = self.signals.get(msg_name)
+            if names is None or df.empty:
+                continue
+            timestamps = df["timestamp"].to_numpy(dtype=float)
+            values = df.reindex(columns=names).to_numpy(dtype=float)
+            first = min(first, timestamps[0])
+            tail = self._tails.get(msg_name)
+            if tail is not None:
+                timestamps = np.concatenate((tail[0], timestamps))
+                values = np.concatenate((tail[1], values))
+            self._tails[msg_name] = (timestamps, values)
+            self._latest = max(self._latest, timestamps[-1])
+        if self._t0 is None and first < math.inf:
+            self._t0 = math.floor(first / self.period) * self.period
+        return self._emit(self._watermark())
+
+    def finish(self) -> pd.DataFrame:
+        """
+        Emit the remaining grid rows up to the latest sample.
+
+        Returns:
+            pd.DataFrame: The remaining grid rows.
+        """
+        return self._emit(self._latest)
+
+    def _watermark(self) -> float:
+        if self.method != "interp":
+            return self._latest
+        # interpolation needs the next sample of every active message
+        active = [
+            tail[0][-1]
+            for tail in self._tails.values()
+            if tail[0][-1] >= self._latest - self.stale
+        ]
+        return min(active) if active else self._latest
+
+    def _emit(self, watermark: float) -> pd.DataFrame:
+        if self._t0 is None or watermark < self._t0:
+            return pd.DataFrame(columns=self.columns)
+        last_k = math.floor((watermark - self._t0) / self.period + 1e-9)
+        if last_k < self._next_k:
+            return pd.DataFrame(columns=self.columns)
+        ks = np.arange(self._next_k, last_k + 1)
+        grid = self._t0 + ks * self.period
+        self._next_k = last_k + 1
+
+        columns = {"timestamp": grid}
+        for msg_name, names in self.signals.items():
+            tail = self._tails.get(msg_name)
+            if tail is None:
+                for name in names:
+                    columns[f"{msg_name}.{name}"] = np.full(len(grid), np.nan)
+                continue
+            timestamps, values = tail
+            # latest valid value of every signal at every sample, signals
+            # outside the active mux branch are NaN in the samples
+            filled = pd.DataFrame(values).ffill().to_numpy()
+            aligned = self._align(timestamps, values, filled, grid)
+            for i, name in enumerate(names):
+                columns[f"{msg_name}.{name}"] = aligned[:, i]
+            # keep the last sample at or before the last grid time, holding
+            # the latest valid values, and the samples after it
+            keep = max(0, np.searchsorted(timestamps, grid[-1], side="right") - 1)
+            values = values[keep:].copy()
+            values[0] = filled[keep]
+            self._tails[msg_name] = (timestamps[keep:], values)
+        return pd.DataFrame(columns, columns=self.columns)
+
+    def _align(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        filled: np.ndarray,
+        grid: np.ndarray,
+    ) -> np.ndarray:
+        # as-of: the last sample at or before every grid time
+        idx = np.searchsorted(timestamps, grid, side="right") - 1
+        last = np.where(idx[:, None] >= 0, filled[np.maximum(idx, 0)], np.nan)
+        if self.method == "last":
+            return last
+
+        if self.method == "mean":
+            # samples in (t - period, t] are in the interval of grid time t
+            bins = np.ceil((timestamps - self._t0) / self.period - 1e-9)
+            grid_k = np.rint((grid - self._t0) / self.period)
+            start = np.searchsorted(bins, grid_k, side="left")
+            end = np.searchsorted(bins, grid_k, side="right")
+            zeros = np.zeros((1, values.shape[1]))
+            sums = np.concatenate((zeros, np.nancumsum(values, axis=0)))
+            counts = np.concatenate((zeros, np.cumsum(~np.isnan(values), axis=0)))
+            n = counts[end] - counts[start]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = (sums[end] - sums[start]) / n
+            return np.where(n > 0, mean, last)
+
+        result = np.empty((len(grid), values.shape[1]))
+        for i in range(values.shape[1]):
+            valid = ~np.isnan(values[:, i])
+            if not valid.any():
+                result[:, i] = np.nan
+                continue
+            ts, vals = timestamps[valid], values[valid, i]
+            result[:, i] = np.interp(grid, ts, vals, left=np.nan, right=vals[-1])
+        return result
@@ -0,0 +1,218 @@
+import bisect
+import threading
+from collections import deque
+
+
+class CanifRttPair:
+    """
+    Round-trip latency between a sent request message and the received
+    response message.
+
+    Every send of the request is timestamped when the frame is transmitted.
+    A received response (optionally only one with matching signal values)
+    completes the oldest outstanding request sent before it. A response
+    received before every outstanding request, e.g. one decoded late behind
+    the decode queue, completes none. Requests without a response within the
+    timeout are counted as timeouts.
+    """
+
+    # upper bucket edges of the latency histogram in ms, the last bucket is open
+    HIST_EDGES_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+    # number of latest samples kept for the percentiles
+    SAMPLES = 1000
+
+    def __init__(
+        self,
+        name: str,
+        request: str,
+        response: str,
+        match: dict[str, float] = None,
+        timeout: float = 1.0,
+    ):
+        """
+        Initialize CanifRttPair instance.
+
+        Args:
+            name (str): Name of the pair.
+            request (str): Name of the sent request message.
+            response (str): Name of the received response message.
+            match (dict, optional): {signal_name: value} the response must
+                contain to complete a request.
+            timeout (float, optional): Seconds after which a request without
+                response counts as a timeout.
+        """
+        self.name: str = name
+        self.request: str = request
+        self.response: str = response
+        self.match: dict[str, float] = match or {}
+        self.timeout: float = timeout
+        # send times of the outstanding requests, sorted oldest first
+        self._pending: deque = deque()
+        self._samples: deque = deque(maxlen=self.SAMPLES)
+        self.histogram: list[int] = [0] * (len(self.HIST_EDGES_MS) + 1)
+        self.sent: int = 0
+        self.received: int = 0
+        self.timeouts: int = 0
+        self._lock = threading.Lock()
+
+    def on_sent(self, now: float) -> None:
+        """
+        Record a send of the request.
+
+        Args:
+            now (float): Send time in seconds.
+        """
+        with self._lock:
+            self._expire(now)
+            # sends stamped on different threads can arrive out of order
+            bisect.insort(self._pending, now)
+            self.sent += 1
+
+    def on_received(self, sig_vals: dict, now: float) -> None:
+        """
+        Complete the oldest outstanding request sent before a received
+        response.
+
+        Args:
+            sig_vals (dict): Decoded signal values of the response.
+            now (float): Receive time in seconds.
+        """
+        for sig_name, value in self.match.items():
+            if sig_vals.get(sig_name) != value:
+                return
+        with self._lock:
+            self._expire(now)
+            if not self._pending or self._pending[0] > now:
+                # received before the request was sent, not its response
+                return
+            latency_ms = 1000 * (now - self._pending.popleft())
+            self.received += 1
+            self._samples.append(latency_ms)
+            self.histogram[bisect.bisect_left(self.HIST_EDGES_MS, latency_ms)] += 1
+
+    def _expire(self, now: float) -> None:
+        pending = self._pending
+        while pending and now - pending[0] > self.timeout:
+            pending.popleft()
+            self.timeouts += 1
+
+    def get_stats(self) -> dict:
+        """
+        Returns the latency percentiles and histogram of the pair.
+
+        Returns:
+            dict: {'name', 'request', 'response', 'sent', 'received',
+                   'timeouts', 'min_ms', 'p50_ms', 'p90_ms', 'p99_ms',
+                   'max_ms', 'histogram': [(upper edge in ms, count), ...]}
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            histogram = list(self.histogram)
+
+        def percentile(p):
+            if not samples:
+                return 0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+
+        return {
+            "name": self.name,
+            "request": self.request,
+            "response": self.response,
+            "sent": self.sent,
+            "received": self.received,
+            "timeouts": self.timeouts,
+            "min_ms": round(samples[0], 3) if samples else 0,
+            "p50_ms": percentile(0.5),
+            "p90_ms": percentile(0.9),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1], 3) if samples else 0,
+            "histogram": list(zip(self.HIST_EDGES_MS + (float("inf"),), histogram)),
+        }
+
+
+class CanifRttTracker:
+    """
+    Tracks the round-trip latency of request/response message pairs on a bus.
+    """
+
+    def __init__(self, sig_vals: dict[str, dict]):
+        """
+        Initialize CanifRttTracker instance.
+
+        Args:
+            sig_vals (dict): Signal values the response matches are checked on.
+        """
+        self.sig_vals: dict[str, dict] = sig_vals
+        self.pairs: list[CanifRttPair] = []
+        self._by_request: dict[str, list[CanifRttPair]] = {}
+        self._by_response: dict[str, list[CanifRttPair]] = {}
+
+    def add(
+        self,
+        request: str,
+        response: str,
+        match: dict[str, float] = None,
+        timeout: float = 1.0,
+        name: str = None,
+    ) -> CanifRttPair:
+        """
+        Add a request/response pair.
+
+        Args:
+            request (str): Name of the sent request message.
+            response (str): Name of the received response message.
+            match (dict, optional): {signal_name: value} the response must
+                contain to complete a request.
+            timeout (float, optional): Seconds to wait for a response.
+            name (str, optional): Name of the pair.
+
+        Returns:
+            CanifRttPair: The added pair.
+        """
+        if response not in self.sig_vals:
+            raise ValueError(f"Unknown response message '{response}'")
+        for sig_name in match or {}:
+            if sig_name not in self.sig_vals[response]:
+                raise ValueError(f"Unknown signal '{response}.{sig_name}'")
+        pair = CanifRttPair(
+            name=name or f"{request}->{response}",
+            request=request,
+            response=response,
+            match=match,
+            timeout=timeout,
+        )
+        self.pairs.append(pair)
+        self._by_request.setdefault(request, []).append(pair)
+        self._by_response.setdefault(response, []).append(pair)
+        return pair
+
+    def on_sent(self, msg_name: str, now: float) -> None:
+        """
+        Timestamp a sent message.
+
+        Args:
+            msg_name (str): Name of the sent message.
+            now (float): Send time in seconds.
+        """
+        for pair in self._by_request.get(msg_name, ()):
+            pair.on_sent(now)
+
+    def on_decoded(self, msg_name: str, now: float) -> None:
+        """
+        Timestamp a received message after it was decoded.
+
+        Args:
+            msg_name (str): Name of the decoded message.
+            now (float): Receive time in seconds.
+        """
+        pairs = self._by_response.get(msg_name)
+        if not pairs:
+            return
+        for pair in pairs:
+            pair.on_received(self.sig_vals[msg_name], now)
+
+    def get_stats(self) -> list[dict]:
+        """
+        Returns the stats of every pair.
+        """
+        return [pair.get_stats() for pair in self.pairs]
@@ -0,0 +1,206 @@
+import re
+import time
+
+import can
+import cantools
+
+
+class CanifScript:
+    """
+    A command script for CanifTerm, parsed and validated up front and then
+    run on a fixed schedule.
+
+    Every send is resolved and encoded when the script is parsed, so running
+    it only waits for the scheduled time and sends the prepared frame. Send
+    times are planned on one timeline from the start of the run, so a late
+    send doesn't delay the following ones.
+
+    Commands, one per line, '#' starts a comment:
+        s <msg_id|msg_name> <signal val ...>  send, like the terminal command
+        wait <time>                           advance the timeline, e.g.
+                                              'wait 0.5', 'wait 20ms'
+        rate <hz>                             space the following sends by
+                                              1/hz, 0 sends back to back
+        repeat <n> ... end                    run the lines in between n times
+    """
+
+    # sleep until this many seconds before a send, then spin
+    SPIN = 0.002
+
+    def __init__(self, lines, resolve):
+        """
+        Initialize CanifScript instance.
+
+        Args:
+            lines (iterable): Script lines.
+            resolve (callable): Called as resolve(msg_id, [signal, value, ...])
+                once per send line in script order, returns (cantools message,
+                {signal: value}) or raises for an invalid send.
+
+        Raises:
+            ValueError: With the line number of the first invalid line.
+        """
+        self._resolve = resolve
+        numbered = []
+        for number, line in enumerate(lines, 1):
+            words = line.split("#", 1)[0].split()
+            if words:
+                numbered.append((number, words))
+        nodes, i = self._parse(numbered, 0)
+        if i < len(numbered):
+            raise ValueError(f"Line {numbered[i][0]}: 'end' without 'repeat'")
+        # (intended time from the start in s, frame, message, signal values,
+        #  line number)
+        self.steps: list[tuple] = []
+        self._rate_period: float = 0.0
+        self.duration: float = self._schedule(nodes, 0.0)
+
+    @staticmethod
+    def _parse_time(word: str) -> float:
+        match = re.fullmatch(r"([0-9]*\.?[0-9]+)(ms|s)?", word)
+        if not match:
+            raise ValueError(f"Invalid time '{word}'")
+        value = float(match.group(1))
+        return value / 1000 if match.group(2) == "ms" else value
+
+    def _parse_line(self, cmd: str, args: list[str]) -> tuple:
+        if cmd == "s":
+            if len(args) < 3 or len(args) % 2 == 0:
+                raise TypeError("Usage: s <msg_id|msg_name> <signal val ...>")
+            message, sig_dict = self._resolve(args[0], args[1:])
+            frame = can.Message(
+                arbitration_id=message.frame_id, data=message.encode(sig_dict)
+            )
+            return ("s", frame, message, sig_dict)
+        if cmd == "wait":
+            if len(args) != 1:
+                raise TypeError("Usage: wait <time>")
+            return ("wait", self._parse_time(args[0]))
+        if cmd == "rate":
+            if len(args) != 1:
+                raise TypeError("Usage: rate <hz>")
+            hz = float(args[0])
+            if hz < 0:
+                raise ValueError(f"Invalid rate '{args[0]}'")
+            return ("rate", 1 / hz if hz else 0.0)
+        if cmd == "repeat":
+            if len(args) != 1 or not args[0].isdigit():
+                raise TypeError("Usage: repeat <n> ... end")
+            return ("repeat", int(args[0]))
+        raise SyntaxError(f"Unknown command '{cmd}'")
+
+    def _parse(self, lines: list, i: int) -> tuple[list, int]:
+        """
+        Parse lines into nodes until the end or an 'end' line.
+
+        Returns:
+            tuple: (nodes, index of the 'end' line or len(lines))
+        """
+        nodes = []
+        while i < len(lines) and lines[i][1][0] != "end":
+            number, words = lines[i]
+            try:
+                node = self._parse_line(words[0], words[1:])
+            except (
+                LookupError,
+                SyntaxError,
+                TypeError,
+                ValueError,
+                cantools.database.EncodeError,
+            ) as e:
+                raise ValueError(f"Line {number}: {repr(e)}") from e
+            if node[0] == "repeat":
+                body, i = self._parse(lines, i + 1)
+                if i == len(lines):
+                    raise ValueError(f"Line {number}: 'repeat' without 'end'")
+                node = ("repeat", node[1], body)
+            nodes.append(node + (number,))
+            i += 1
+        return nodes, i
+
+    def _schedule(self, nodes: list, cursor: float) -> float:
+        """
+        Append the steps of nodes starting at cursor.
+
+        Returns:
+            float: Time after the last step.
+        """
+        for node in nodes:
+            if node[0] == "s":
+                _, frame, message, sig_dict, number = node
+                self.steps.append((cursor, frame, message, sig_dict, number))
+                cursor += self._rate_period
+            elif node[0] == "wait":
+                cursor += node[1]
+            elif node[0] == "rate":
+                self._rate_period = node[1]
+            else:
+                for _ in range(node[1]):
+                    cursor = self._schedule(node[2], cursor)
+        return cursor
+
+    def run(self, send, on_sent=None) -> dict:
+        """
+        Send the steps at their scheduled times.
+
+        Args:
+            send (callable): Called as send(frame) to send a frame.
+            on_sent (callable, optional): Called as on_sent(message,
+                signal values) after every send.
+
+        Returns:
+            dict: Timing report, see report().
+        """
+        actual = []
+        errors = 0
+        start = time.perf_counter()
+        for intended, frame, message, sig_dict, _ in self.steps:
+            deadline = start + intended
+            delay = deadline - time.perf_counter()
+            if delay > self.SPIN:
+                time.sleep(delay - self.SPIN)
+            while time.perf_counter() < deadline:
+                # yield the GIL so the receive threads don't delay the send
+                time.sleep(0)
+            sent = time.perf_counter()
+            try:
+                send(frame)
+            except can.CanError as e:
+                errors += 1
+                print(f"CanifScript: {repr(e)}")
+            actual.append(sent - start)
+            if on_sent:
+                on_sent(message, sig_dict)
+        return self.report(actual, time.perf_counter() - start, errors)
+
+    def report(self, actual: list[float], elapsed: float, errors: int = 0) -> dict:
+        """
+        Returns the actual against the intended send times.
+
+        Args:
+            actual (list): Send time of every step from the start in seconds.
+            elapsed (float): Run time in seconds.
+            errors (int, optional): Failed sends.
+
+        Returns:
+            dict: {'sends', 'errors', 'intended_s', 'elapsed_s', 'late_mean_ms',
+                   'late_p99_ms', 'late_max_ms',
+                   'messages': {msg_name: sends}}
+        """
+        lateness = sorted(sent - step[0] for sent, step in zip(actual, self.steps)) or [
+            0.0
+        ]
+        messages = {}
+        for step in self.steps:
+            messages[step[2].name] = messages.get(step[2].name, 0) + 1
+        p99 = lateness[min(len(lateness) - 1, int(0.99 * len(lateness)))]
+        return {
+            "sends": len(actual),
+            "errors": errors,
+            "intended_s": round(self.duration, 6),
+            "elapsed_s": round(elapsed, 6),
+            "late_mean_ms": round(1000 * sum(lateness) / len(lateness), 3),
+            "late_p99_ms": round(1000 * p99, 3),
+            "late_max_ms": round(1000 * lateness[-1], 3),
+            "messages": messages,
+        }
@@ -0,0 +1,252 @@
+import json
+import math
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+# names of the blocks created by writers in this process, the resource
+# tracker registration belongs to them
+_created: set[str] = set()
+
+
+class CanifShmLayout:
+    """
+    Fixed layout of the shared memory signal table.
+
+    The table starts with a header and a JSON index describing every
+    message block, followed by the blocks. Each block holds a sequence
+    number, the receive timestamp and the values of the message signals as
+    little-endian 8 byte fields:
+
+        header: magic, version, index length, data offset
+        index:  {"messages": [[msg_name, [signal names], block offset], ...]}
+        block:  seq (u64), timestamp (f64), value (f64) per signal
+
+    The sequence number is a seqlock: the writer makes it odd before
+    changing a block and even again after, so readers retry when it is odd
+    or changed while they read.
+    """
+
+    MAGIC = b"CANIFSHM"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIII")
+    SEQ = struct.Struct("<Q")
+
+    @staticmethod
+    def block_struct(n_signals: int) -> struct.Struct:
+        """
+        Returns the struct of the timestamp and values of a message block.
+        """
+        return struct.Struct(f"<{n_signals + 1}d")
+
+
+class CanifShmWriter:
+    """
+    Publishes the latest decoded signal values into a shared memory table.
+    """
+
+    def __init__(self, name: str, sig_vals: dict[str, dict]):
+        """
+        Create the shared memory table for a set of messages.
+
+        Args:
+            name (str): Name of the shared memory block.
+            sig_vals (dict): {msg_name: {signal_name: value}} of the messages
+                to publish. The table layout is fixed from its signal names.
+        """
+        self.sig_vals: dict[str, dict] = sig_vals
+        messages = []
+        offset = 0
+        for msg_name, signals in sig_vals.items():
+            names = list(signals.keys())
+            messages.append([msg_name, names, offset])
+            offset += CanifShmLayout.SEQ.size + 8 * (len(names) + 1)
+        index = json.dumps({"messages": messages}, separators=(",", ":")).encode()
+        data_offset = CanifShmLayout.HEADER.size + len(index)
+        data_offset += -data_offset % 8
+
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=True, size=data_offset + offset
+        )
+        _created.add(self.shm._name)
+        buf = self.shm.buf
+        CanifShmLayout.HEADER.pack_into(
+            buf,
+            0,
+            CanifShmLayout.MAGIC,
+            CanifShmLayout.VERSION,
+            len(index),
+            data_offset,
+        )
+        buf[
+            CanifShmLayout.HEADER.size : CanifShmLayout.HEADER.size + len(index)
+        ] = index
+
+        # {msg_name: [block offset, signal names, block struct, seq]}
+        self._blocks: dict[str, list] = {}
+        for msg_name, names, block_offset in messages:
+            block = [
+                data_offset + block_offset,
+                tuple(names),
+                CanifShmLayout.block_struct(len(names)),
+                0,
+            ]
+            self._blocks[msg_name] = block
+            CanifShmLayout.SEQ.pack_into(buf, block[0], 0)
+            block[2].pack_into(
+                buf, block[0] + CanifShmLayout.SEQ.size, 0.0, *[math.nan] * len(names)
+            )
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def publish(self, msg_name: str, now: float) -> None:
+        """
+        Write the current values of a message to the table.
+
+        Meant as a decode hook, so it runs on the thread that decoded the
+        message; every message has a single writer.
+
+        Args:
+            msg_name (str): Name of the message.
+            now (float): Receive time of the frame.
+        """
+        block = self._blocks.get(msg_name)
+        if block is None:
+            return
+        offset, names, block_struct, seq = block
+        values = self.sig_vals[msg_name]
+        buf = self.shm.buf
+        CanifShmLayout.SEQ.pack_into(buf, offset, seq + 1)
+        block_struct.pack_into(
+            buf,
+            offset + CanifShmLayout.SEQ.size,
+            now,
+            *[float(values[name]) for name in names],
+        )
+        CanifShmLayout.SEQ.pack_into(buf, offset, seq + 2)
+        block[3] = seq + 2
+
+    def close(self) -> None:
+        """
+        Release and remove the shared memory table.
+        """
+        self.shm.close()
+        self.shm.unlink()
+        _created.discard(self.shm._name)
+
+
+class CanifShmReader:
+    """
+    Reads the signal table published by a CanifShmWriter from another process.
+
+    Values are read directly from the shared memory with the offsets of the
+    table index, without any IPC round trip.
+
+    Example:
+        reader = CanifShmReader("canif")
+        value, timestamp = reader.read("PHW_Status.PHW_Vbat")
+    """
+
+    def __init__(self, name: str = "canif", retries: int = 100):
+        """
+        Attach to a shared memory table.
+
+        Args:
+            name (str, optional): Name of the shared memory block.
+            retries (int, optional): Attempts to get a consistent read while
+                the writer updates a block.
+
+        Raises:
+            ValueError: If the block isn't a Canif signal table.
+        """
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13 always tracks attached blocks and removes them
+            # when this process exits. The tracker holds one entry per name,
+            # a writer of this process unlinks it itself
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm._name not in _created:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.retries: int = retries
+        buf = self.shm.buf
+        magic, version, index_len, data_offset = CanifShmLayout.HEADER.unpack_from(
+            buf, 0
+        )
+        if magic != CanifShmLayout.MAGIC or version != CanifShmLayout.VERSION:
+            self.shm.close()
+            raise ValueError(f"'{name}' is not a Canif signal table")
+        start = CanifShmLayout.HEADER.size
+        index = json.loads(bytes(buf[start : start + index_len]))
+
+        # {msg_name: (block offset, signal names, block struct)}
+        self.messages: dict[str, tuple] = {}
+        # {'Message.Signal': (block offset, value offset, position in block)}
+        self.signals: dict[str, tuple] = {}
+        for msg_name, names, block_offset in index["messages"]:
+            offset = data_offset + block_offset
+            self.messages[msg_name] = (
+                offset,
+                tuple(names),
+                CanifShmLayout.block_struct(len(names)),
+            )
+            for i, sig_name in enumerate(names):
+                value_offset = offset + CanifShmLayout.SEQ.size + 8 * (i + 1)
+                self.signals[f"{msg_name}.{sig_name}"] = (offset, value_offset, i)
+
+    def _read_consistent(self, offset: int, read):
+        seq_struct = CanifShmLayout.SEQ
+        buf = self.shm.buf
+        for _ in range(self.retries):
+            seq = seq_struct.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            result = read(buf)
+            if seq_struct.unpack_from(buf, offset)[0] == seq:
+                return result
+        raise TimeoutError("No consistent read of the signal table")
+
+    def read(self, signal: str) -> tuple[float, float]:
+        """
+        Read the latest value of a signal.
+
+        Args:
+            signal (str): 'Message.Signal' name.
+
+        Returns:
+            tuple: (value, receive timestamp). The value is NaN and the
+                   timestamp 0 if the message wasn't received yet.
+        """
+        offset, value_offset, _ = self.signals[signal]
+        ts_offset = offset + CanifShmLayout.SEQ.size
+        return self._read_consistent(
+            offset,
+            lambda buf: (
+                struct.unpack_from("<d", buf, value_offset)[0],
+                struct.unpack_from("<d", buf, ts_offset)[0],
+            ),
+        )
+
+    def read_message(self, msg_name: str) -> tuple[dict[str, float], float]:
+        """
+        Read the latest values of all signals of a message from one frame.
+
+        Args:
+            msg_name (str): Name of the message.
+
+        Returns:
+            tuple: ({signal_name: value}, receive timestamp)
+        """
+        offset, names, block_struct = self.messages[msg_name]
+        timestamp, *values = self._read_consistent(
+            offset,
+            lambda buf: block_struct.unpack_from(buf, offset + CanifShmLayout.SEQ.size),
+        )
+        return dict(zip(names, values)), timestamp
+
+    def close(self) -> None:
+        """
+        Detach from the shared memory table.
+        """
+        self.shm.close()
@@ -0,0 +1,366 @@
+import time
+from array import array
+from collections.abc import Iterator, Mapping, MutableMapping
+
+import cantools
+
+
+def format_rx_time(now: float) -> str:
+    """
+    Returns a receive time as 'HH:MM:SS.mmm' local time.
+    """
+    milliseconds = int(round(now * 1000) % 1000)
+    return time.strftime("%H:%M:%S.", time.localtime(now)) + str(milliseconds).zfill(3)
+
+
+class CanifMsgValues(MutableMapping):
+    """
+    Signal values of one message in a fixed layout.
+
+    Every signal has a slot in a preallocated array and a precomputed name
+    to slot map. Values are kept in a typed float array when the database
+    says every signal fits a double exactly; otherwise in a list. In the
+    array, integer signals of the database and slots last written with an
+    int are returned as int. Writing any other value, e.g. a choice name,
+    moves the message to a list. Reads and writes of known signals work like
+    a dict; signals can't be added or removed.
+    """
+
+    # ints beyond this don't fit a double exactly
+    MAX_EXACT_INT = 2**53
+
+    __slots__ = ("_index", "_values", "_ints", "_int_slots")
+
+    def __init__(
+        self, signals: dict, index: dict[str, int] = None, ints: frozenset = None
+    ):
+        """
+        Initialize CanifMsgValues instance.
+
+        Args:
+            signals (dict): {signal_name: initial value}, fixes the layout.
+            index (dict, optional): {signal_name: slot} shared with other
+                messages of the same layout.
+            ints (frozenset, optional): Slots of integer signals. Values are
+                kept in a typed array if given.
+        """
+        self._index: dict[str, int] = index or {
+            name: i for i, name in enumerate(signals)
+        }
+        self._ints: frozenset = ints
+        # other slots of the array holding an int
+        self._int_slots: set[int] = set()
+        if ints is None:
+            self._values = list(signals.values())
+        else:
+            self._values = array("d", signals.values())
+            self._int_slots = {
+                i
+                for i, value in enumerate(signals.values())
+                if type(value) is int and i not in ints
+            }
+
+    def __getitem__(self, name: str):
+        slot = self._index[name]
+        ints = self._ints
+        if ints is not None and (slot in ints or slot in self._int_slots):
+            return int(self._values[slot])
+        return self._values[slot]
+
+    def __setitem__(self, name: str, value) -> None:
+        slot = self._index[name]
+        if self._ints is not None:
+            kind = type(value)
+            if kind is float:
+                self._int_slots.discard(slot)
+            elif kind is int and abs(value) <= self.MAX_EXACT_INT:
+                if slot not in self._ints:
+                    self._int_slots.add(slot)
+            else:
+                self._to_list()
+        self._values[slot] = value
+
+    def _to_list(self) -> None:
+        # keep any value like a dict, with the ints read back as ints
+        values = [None] * len(self._index)
+        for name, slot in self._index.items():
+            values[slot] = self[name]
+        self._values = values
+        self._ints = None
+        self._int_slots = set()
+
+    def __delitem__(self, name: str) -> None:
+        raise TypeError("Signals can't be removed from a message")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def slots(self, names) -> tuple[int, ...]:
+        """
+        Returns the slots of signals, to write them with set_slots().
+
+        Args:
+            names (iterable): Signal names.
+        """
+        return tuple(self._index[name] for name in names)
+
+    def set_slots(self, slots: tuple[int, ...], values) -> None:
+        """
+        Write values by slot without name lookups.
+
+        Args:
+            slots (tuple): Slots from slots().
+            values (iterable): A value per slot.
+        """
+        store = self._values
+        for slot, value in zip(slots, values):
+            store[slot] = value
+        if self._int_slots:
+            # decoded values of the other slots are floats
+            self._int_slots.difference_update(slots)
+
+
+class CanifSignalStore(Mapping):
+    """
+    Read-only mapping of message names to CanifMsgValues.
+
+    Every message gets a slot when the store is created and keeps the same
+    CanifMsgValues object, so references held by triggers, vitals or the
+    shared memory writer stay valid. Existing code reading
+    sig_vals[msg][signal] or writing known signals keeps working. A store
+    made with wrap() shares its records with the dict it was made from, so
+    a listener built on that dict updates the store.
+    """
+
+    def __init__(
+        self,
+        sig_vals: dict[str, dict],
+        database: cantools.database.can.Database = None,
+    ):
+        """
+        Initialize CanifSignalStore instance.
+
+        Args:
+            sig_vals (dict): {msg_name: {signal_name: value}} initial values,
+                fixes the layout of every message. CanifMsgValues are kept,
+                not copied.
+            database (cantools.database.can.Database, optional): Database of
+                the messages, decides which messages use typed arrays.
+        """
+        messages = {msg.name: msg for msg in database.messages} if database else {}
+        # {signal names: index} shared by messages of the same layout
+        layouts: dict[tuple, dict[str, int]] = {}
+        self._records: dict[str, CanifMsgValues] = {}
+        for msg_name, signals in sig_vals.items():
+            if isinstance(signals, CanifMsgValues):
+                self._records[msg_name] = signals
+                continue
+            names = tuple(signals)
+            index = layouts.get(names)
+            if index is None:
+                index = layouts[names] = {name: i for i, name in enumerate(names)}
+            ints = self._typed_ints(messages.get(msg_name), signals)
+            self._records[msg_name] = CanifMsgValues(signals, index, ints)
+        # {msg_name: slot} and the records by slot
+        self.msg_index: dict[str, int] = {
+            msg_name: i for i, msg_name in enumerate(self._records)
+        }
+        self.records: tuple[CanifMsgValues, ...] = tuple(self._records.values())
+
+    @staticmethod
+    def _typed_ints(message: cantools.database.can.Message, signals: dict) -> frozenset:
+        # slots of the integer signals if every value fits a double exactly
+        if message is None:
+            return None
+        ints = set()
+        for i, (name, value) in enumerate(signals.items()):
+            if type(value) not in (int, float):
+                return None
+            try:
+                signal = message.get_signal_by_name(name)
+            except KeyError:
+                return None
+            if signal.is_float:
+                continue
+            if isinstance(signal.scale, int) and isinstance(signal.offset, int):
+                if signal.length > 52:
+                    return None
+                ints.add(i)
+        return frozenset(ints)
+
+    @classmethod
+    def wrap(
+        cls, sig_vals: dict, database: cantools.database.can.Database = None
+    ) -> "CanifSignalStore":
+        """
+        Returns sig_vals if it is a store, otherwise a store of its values.
+
+        The messages of a dict sig_vals are replaced with the records of the
+        store, so the dict and the store stay views of the same values, e.g.
+        for a CanifListener built on the dict.
+        """
+        if isinstance(sig_vals, cls):
+            return sig_vals
+        store = cls(sig_vals, database)
+        if isinstance(sig_vals, MutableMapping):
+            sig_vals.update(store._records)
+        return store
+
+    def __getitem__(self, msg_name: str) -> CanifMsgValues:
+        return self._records[msg_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, msg_name) -> bool:
+        return msg_name in self._records
+
+    def to_dict(self) -> dict[str, dict]:
+        """
+        Returns a copy as plain dicts.
+        """
+        return {msg_name: dict(record) for msg_name, record in self._records.items()}
+
+
+class CanifRxStats(MutableMapping):
+    """
+    Dict-like view of the receive stats of one message in a
+    CanifRxStatsTable, with the keys 'last_received', 'cycle_time', 'count'
+    and 'prev_ts'. 'last_received' is formatted from 'prev_ts' when read.
+    """
+
+    __slots__ = ("_table", "_slot")
+
+    KEYS = ("last_received", "cycle_time", "count", "prev_ts")
+
+    def __init__(self, table: "CanifRxStatsTable", slot: int):
+        self._table: CanifRxStatsTable = table
+        self._slot: int = slot
+
+    def __getitem__(self, key: str):
+        if key == "last_received":
+            now = self._table.prev_ts[self._slot]
+            return format_rx_time(now) if now else 0
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self._table, key)[self._slot]
+
+    def __setitem__(self, key: str, value) -> None:
+        if key == "last_received":
+            # follows prev_ts
+            return
+        if key not in self.KEYS:
+            raise KeyError(key)
+        getattr(self._table, key)[self._slot] = value
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Receive stats can't be removed")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def received(self, now: float, frames: int = 1, prev_ts: float = None) -> None:
+        """
+        Count received frames of the message.
+
+        Args:
+            now (float): Receive time of the latest frame.
+            frames (int, optional): Number of frames received.
+            prev_ts (float, optional): Receive time of the frame before the
+                latest, the previous latest by default.
+        """
+        table = self._table
+        slot = self._slot
+        if prev_ts is None:
+            prev_ts = table.prev_ts[slot]
+        table.cycle_time[slot] = round(now - prev_ts, 3)
+        table.count[slot] += frames
+        table.prev_ts[slot] = now
+
+    def set(self, cycle_time: float, count: int, prev_ts: float) -> None:
+        """
+        Write all stats of the message without key lookups.
+        """
+        table = self._table
+        slot = self._slot
+        table.cycle_time[slot] = cycle_time
+        table.count[slot] = count
+        table.prev_ts[slot] = prev_ts
+
+
+class CanifRxStatsTable(Mapping):
+    """
+    Receive stats of a fixed set of messages in preallocated typed arrays,
+    one slot per message. Read-only mapping of message names to CanifRxStats
+    views.
+    """
+
+    def __init__(self, msg_names):
+        """
+        Initialize CanifRxStatsTable instance.
+
+        Args:
+            msg_names (iterable): Messages to keep stats for.
+        """
+        names = list(dict.fromkeys(msg_names))
+        self.msg_index: dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.cycle_time: array = array("d", bytes(8 * len(names)))
+        self.count: array = array("q", bytes(8 * len(names)))
+        self.prev_ts: array = array("d", bytes(8 * len(names)))
+        self._views: dict[str, CanifRxStats] = {
+            name: CanifRxStats(self, i) for name, i in self.msg_index.items()
+        }
+
+    @classmethod
+    def wrap(cls, rx_msg_stats: dict) -> "CanifRxStatsTable":
+        """
+        Returns rx_msg_stats if it is a table, otherwise a table of its stats.
+        """
+        if isinstance(rx_msg_stats, cls):
+            return rx_msg_stats
+        table = cls(rx_msg_stats)
+        for msg_name, stats in rx_msg_stats.items():
+            table[msg_name].update(stats)
+        return table
+
+    def __getitem__(self, msg_name: str) -> CanifRxStats:
+        return self._views[msg_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._views)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def __contains__(self, msg_name) -> bool:
+        return msg_name in self._views
+
+    def total_count(self) -> int:
+        """
+        Returns the number of frames received for all messages.
+        """
+        return sum(self.count)
+
+    def seen(self) -> int:
+        """
+        Returns the number of messages received at least once.
+        """
+        return sum(1 for count in self.count if count)
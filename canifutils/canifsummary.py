@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class CanifLogSummary:
+    """
+    Single pass summary of a decoded log with constant memory.
+
+    Keeps per message frame counts and cycle time statistics, and per signal
+    min, max and mean. Chunks are merged into running aggregates, the cycle
+    time variance with the parallel form of Welford's algorithm.
+    """
+
+    def __init__(self):
+        """
+        Initialize CanifLogSummary instance.
+        """
+        # {msg_name: {'count', 'first', 'last', 'cycle_n', 'cycle_mean',
+        #             'cycle_m2', 'cycle_min', 'cycle_max'}}
+        self.messages: dict[str, dict] = {}
+        # {msg_name: {signal_name: {'count', 'sum', 'min', 'max'}}}
+        self.signals: dict[str, dict[str, dict]] = {}
+
+    def update(self, samples: dict[str, pd.DataFrame]) -> None:
+        """
+        Add a chunk of decoded samples.
+
+        Args:
+            samples (dict): {msg_name: DataFrame with a 'timestamp' column and
+                a column per signal}, each in time order.
+        """
+        for msg_name, df in samples.items():
+            if df.empty:
+                continue
+            timestamps = df["timestamp"].to_numpy(dtype=float)
+            stats = self.messages.get(msg_name)
+            if stats is None:
+                stats = self.messages[msg_name] = {
+                    "count": 0,
+                    "first": timestamps[0],
+                    "last": None,
+                    "cycle_n": 0,
+                    "cycle_mean": 0.0,
+                    "cycle_m2": 0.0,
+                    "cycle_min": math.inf,
+                    "cycle_max": -math.inf,
+                }
+            else:
+                timestamps = np.concatenate(([stats["last"]], timestamps))
+            stats["count"] += len(df)
+            stats["last"] = timestamps[-1]
+            self._merge_cycles(stats, np.diff(timestamps))
+
+            values = df.drop(columns="timestamp").to_numpy(dtype=float)
+            # signals outside the active mux branch are NaN
+            valid = ~np.isnan(values)
+            counts = valid.sum(axis=0)
+            sums = np.where(valid, values, 0.0).sum(axis=0)
+            mins = np.where(valid, values, math.inf).min(axis=0)
+            maxs = np.where(valid, values, -math.inf).max(axis=0)
+            signals = self.signals.setdefault(msg_name, {})
+            for i, name in enumerate(df.columns[1:]):
+                if not counts[i]:
+                    continue
+                agg = signals.get(name)
+                if agg is None:
+                    signals[name] = {
+                        "count": int(counts[i]),
+                        "sum": sums[i],
+                        "min": mins[i],
+                        "max": maxs[i],
+                    }
+                    continue
+                agg["count"] += int(counts[i])
+                agg["sum"] += sums[i]
+                agg["min"] = min(agg["min"], mins[i])
+                agg["max"] = max(agg["max"], maxs[i])
+
+    @staticmethod
+    def _merge_cycles(stats: dict, cycles: np.ndarray) -> None:
+        if not len(cycles):
+            return
+        n = len(cycles)
+        mean = cycles.mean()
+        m2 = ((cycles - mean) ** 2).sum()
+        total = stats["cycle_n"] + n
+        delta = mean - stats["cycle_mean"]
+        stats["cycle_mean"] += delta * n / total
+        stats["cycle_m2"] += m2 + delta**2 * stats["cycle_n"] * n / total
+        stats["cycle_n"] = total
+        stats["cycle_min"] = min(stats["cycle_min"], cycles.min())
+        stats["cycle_max"] = max(stats["cycle_max"], cycles.max())
+
+    def report(self) -> pd.DataFrame:
+        """
+        Returns the summary as one row per message followed by one row per
+        signal of the message.
+
+        Returns:
+            pd.DataFrame: Columns 'message', 'signal' (empty on message rows),
+                'count', 'cycle_mean_ms', 'cycle_std_ms', 'cycle_min_ms',
+                'cycle_max_ms', 'min', 'max', 'mean'.
+        """
+        rows = []
+        for msg_name, stats in self.messages.items():
+            n = stats["cycle_n"]
+            rows.append(
+                {
+                    "message": msg_name,
+                    "signal": "",
+                    "count": stats["count"],
+                    "cycle_mean_ms": 1000 * stats["cycle_mean"] if n else None,
+                    "cycle_std_ms": (
+                        1000 * math.sqrt(stats["cycle_m2"] / n) if n else None
+                    ),
+                    "cycle_min_ms": 1000 * stats["cycle_min"] if n else None,
+                    "cycle_max_ms": 1000 * stats["cycle_max"] if n else None,
+                }
+            )
+            for sig_name, agg in self.signals.get(msg_name, {}).items():
+                rows.append(
+                    {
+                        "message": msg_name,
+                        "signal": sig_name,
+                        "count": agg["count"],
+                        "min": agg["min"],
+                        "max": agg["max"],
+                        "mean": agg["sum"] / agg["count"],
+                    }
+                )
+        return pd.DataFrame(
+            rows,
+            columns=[
+                "message",
+                "signal",
+                "count",
+                "cycle_mean_ms",
+                "cycle_std_ms",
+                "cycle_min_ms",
+                "cycle_max_ms",
+                "min",
+                "max",
+                "mean",
+            ],
+        )
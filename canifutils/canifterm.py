@@ -1,10 +1,20 @@
 import threading
 import time
+from collections import ChainMap
 from queue import SimpleQueue
 
 import can
 import cantools
 
+from .canifindex import CanifDbIndex
+from .canifscript import CanifScript
+
+try:
+    import readline
+except ImportError:
+    # not available on Windows, commands work without completion
+    readline = None
+
 
 class CanifTerm:
     """
@@ -17,6 +27,27 @@ class CanifTerm:
     values.
     """
 
+    COMMANDS = (
+        "h",
+        "s",
+        "d",
+        "p",
+        "find",
+        "pp",
+        "dc",
+        "dm",
+        "b",
+        "load",
+        "trig",
+        "estop",
+        "rtt",
+        "stats",
+        "run",
+        "q",
+        "save",
+        "profile",
+    )
+
     def __init__(self, event: threading.Event):
         self.periodic: threading.Thread = threading.Thread(
             target=self._periodic_refresh
@@ -24,6 +55,8 @@ class CanifTerm:
         self.ui_update_period = 0
         self.ui_running = False
         self.event = event
+        self.db_index: CanifDbIndex = CanifDbIndex(self.db, self.rx_ids)
+        self._completions: list[str] = []
 
     def _periodic_refresh(self):
         run = True
@@ -49,40 +82,29 @@ class CanifTerm:
                 print(repr(e))
 
     def _print_measurement_signals(self):
+        start = time.perf_counter_ns()
         print("\n")
         for msg in self.db.messages:
             if msg.name in self.vitals.keys():
+                self.refresh_rx(msg.name)
+                active = self._get_active_sig_vals(msg.name, self.sig_vals[msg.name])
                 for sig in msg.signals:
+                    if sig.name not in active:
+                        continue
                     if sig.choices:
                         val = sig.choices[self.sig_vals[msg.name][sig.name]].name
                     else:
                         val = self.sig_vals[msg.name][sig.name]
                     print(f"{sig.name}: {val}")
         print("\n>")
+        self.profiler.add("term_print", time.perf_counter_ns() - start)
 
     def _get_message_from_database(self, msg_id):
         """
         Looks for a message from the message name or ID
-        Example: EPC_status_Address001 or 15400961
+        Example: EPC_status_Address001, 15400961 or 0xEAFE01
         """
-        msg = None
-        try:
-            frame_id = int(msg_id)
-            msg = self.db.get_message_by_frame_id(frame_id)
-        except ValueError:
-            try:
-                msg = self.db.get_message_by_name(msg_id)
-            except ValueError:
-                raise KeyError(f"Invalid msg id '{msg_id}'")
-            except:
-                raise
-        except KeyError:
-            raise KeyError(f"Invalid msg id '{msg_id}'")
-        except Exception as e:
-            print(repr(e))
-            raise
-        finally:
-            return msg
+        return self.db_index.message(msg_id)
 
     def _print_message_signals(self, msg, choices=False):
         """
@@ -93,7 +115,11 @@ class CanifTerm:
         )
 
         s_choices = ""
+        self.refresh_rx(msg.name)
+        active = self._get_active_sig_vals(msg.name, self.sig_vals[msg.name])
         for signal in msg.signals:
+            if signal.name not in active:
+                continue
             if signal.choices:
                 val = signal.choices[self.sig_vals[msg.name][signal.name]]
                 val = f"{val.value}: {val.name}"
@@ -110,53 +136,37 @@ class CanifTerm:
 
     def _list_config_signals(self):
         """
-        Prints configuration message details for given ID or entire database
+        Prints configuration message details for the entire database
         """
-        try:
-            for message in self.db.messages:
-                if message.frame_id in self.rx_ids:
-                    continue
-                self._print_message_signals(msg=message, choices=True)
-        except KeyError as e:
-            print(repr(e) + f" Invalid message name: {msg_id}")
-        except ValueError as e:
-            print(repr(e) + f" Invalid frame id: {msg_id}")
-        except:
-            raise
+        for message in self.db_index.cfg_messages:
+            self._print_message_signals(msg=message, choices=True)
 
     def _list_meas_signals(self):
         """
-        Prints measurement message details for given ID or entire database
+        Prints measurement message details for the entire database
         """
-        try:
-            for message in self.db.messages:
-                if message.frame_id not in self.rx_ids:
-                    continue
-                self._print_message_signals(message)
-        except KeyError as e:
-            print(repr(e) + f" Invalid message name: {msg_id}")
-        except ValueError as e:
-            print(repr(e) + f" Invalid frame id: {msg_id}")
-        except:
-            raise
+        for message in self.db_index.meas_messages:
+            self._print_message_signals(message)
 
-    def _set_message(self, msg_id, msg_sigvals):
+    def _find_signals(self, query):
         """
-        Sets message signals in configuration dictionary and returns packed CAN
-        message with new signal data
+        Prints the signals matching a name, part of it or a misspelling
+        """
+        for full_name in self.db_index.search_signals(query):
+            print(full_name)
+
+    def _parse_set_message(self, msg_id, msg_sigvals, sig_vals=None):
+        """
+        Validates the arguments of a send command and returns the message and
+        its signal values. The mux branch is checked against sig_vals, the
+        current signal values by default
         """
+        sig_vals = self.sig_vals if sig_vals is None else sig_vals
         msg = self._get_message_from_database(msg_id)
-        if not msg:
-            raise KeyError(f"Invalid msg id: {msg_id}")
         msg_name = msg.name
         signals = [signal.name for signal in msg.signals]
 
-        if (len(msg_sigvals) / 2) != len(signals):
-            raise LookupError(
-                f"Expected {len(msg.signals)} but received {len(signals)} signals"
-            )
-
-        if msg.frame_id in self.rx_ids:
+        if self.db_index.is_rx(msg):
             raise IndexError(
                 f"Trying to set response message: {hex(msg.frame_id)} {msg.name}"
             )
@@ -165,12 +175,31 @@ class CanifTerm:
         for i, s in enumerate(msg_sigvals[::2]):
             if s in signals:
                 signals.remove(s)
-                val = float(msg_sigvals[2 * i + 1])
-                sig_dict[s] = val
-                self.sig_vals[msg_name][s] = val
+                sig_dict[s] = float(msg_sigvals[2 * i + 1])
             else:
                 raise ValueError(f"Duplicate or invalid signal: {s}")
 
+        # a multiplexed message only needs the signals of the selected branch
+        mux_table = self.mux_tables.get(msg_name)
+        if mux_table:
+            expected = mux_table.get_active_signals({**sig_vals[msg_name], **sig_dict})
+        else:
+            expected = [signal.name for signal in msg.signals]
+        if set(sig_dict) != set(expected):
+            raise LookupError(
+                f"Expected signals {sorted(expected)} but received {sorted(sig_dict)}"
+            )
+        return msg, sig_dict
+
+    def _set_message(self, msg_id, msg_sigvals):
+        """
+        Sets message signals in configuration dictionary and returns packed CAN
+        message with new signal data
+        """
+        msg, sig_dict = self._parse_set_message(msg_id, msg_sigvals)
+        msg_name = msg.name
+        self.sig_vals[msg_name].update(sig_dict)
+        self._mark_cfg_dirty(msg_name)
         self.send_can_message(msg=msg, sig_dict=sig_dict)
 
     def _print_message(self, msg_id):
@@ -178,25 +207,253 @@ class CanifTerm:
         Returns signal values for given message ID
         """
         msg = self._get_message_from_database(msg_id)
-        self._print_message_signals(msg=msg, choices=(msg.frame_id in self.rx_ids))
+        self._print_message_signals(msg=msg, choices=self.db_index.is_rx(msg))
+
+    def _print_bus_stats(self):
+        """
+        Prints receive statistics for every attached bus
+        """
+        for bus_name, stats in self.get_bus_stats().items():
+            print(
+                f"{bus_name}: frames={stats['frames']} messages={stats['messages']} "
+                f"rate={stats['rate']}/s queue={stats['depth']} "
+                f"high_water={stats['high_water']} dropped={stats['dropped']} "
+                f"batch_latency={stats['batch_latency_ms']} ms"
+            )
+            print(
+                f"\tstate={stats['state']} faults={stats['faults']} "
+                f"recoveries={stats['recoveries']} downtime={stats['downtime_s']} s "
+                f"tx_held={stats['tx_held']} tx_dropped={stats['tx_dropped']}"
+            )
+
+    def _print_bus_load(self, top=5):
+        """
+        Prints the bus load and top talkers for every attached bus
+        """
+        for bus_name, load in self.get_bus_load(top=top).items():
+            print(f"{bus_name}: load={load['load']}% fps={load['fps']}")
+            for frame_id, msg_name, fps, id_load in load["top"]:
+                print(f"\t{hex(frame_id)} {msg_name} fps={fps} load={id_load}%")
+
+    def _print_triggers(self):
+        """
+        Prints how often every trigger fired and its action latency
+        """
+        for bus_name, triggers in self.get_trigger_stats().items():
+            for stats in triggers:
+                print(
+                    f"{bus_name}: {stats['name']} '{stats['expression']}' "
+                    f"fired={stats['fired']} latency mean={stats['latency_mean_ms']} "
+                    f"ms max={stats['latency_max_ms']} ms"
+                )
+
+    def _print_rtt(self, histogram=False):
+        """
+        Prints the round-trip latency of every request/response pair
+        """
+        for stats in self.get_rtt_stats():
+            print(
+                f"{stats['name']}: sent={stats['sent']} received={stats['received']} "
+                f"timeouts={stats['timeouts']} min={stats['min_ms']} "
+                f"p50={stats['p50_ms']} p90={stats['p90_ms']} p99={stats['p99_ms']} "
+                f"max={stats['max_ms']} ms"
+            )
+            if histogram:
+                for edge, count in stats["histogram"]:
+                    if count:
+                        print(f"\t<= {edge} ms: {count}")
+
+    def _print_estop(self):
+        """
+        Prints the latency from estop request to bus.send per source
+        """
+        for source, stats in self.get_estop_stats().items():
+            print(
+                f"estop {source}: count={stats['count']} last={stats['last_ms']} "
+                f"mean={stats['mean_ms']} p50={stats['p50_ms']} "
+                f"p99={stats['p99_ms']} max={stats['max_ms']} ms"
+            )
+
+    def run_script(self, lines) -> dict:
+        """
+        Validates a command script, runs it on its schedule and prints the
+        timing report. Nothing is sent if any line is invalid.
+
+        Args:
+            lines (iterable): Script lines, see CanifScript.
+
+        Returns:
+            dict: Timing report, see CanifScript.report().
+
+        Raises:
+            ValueError: If a line of the script is invalid.
+            NotImplementedError: If no CAN bus is available.
+        """
+        if not self.bus:
+            raise NotImplementedError("No CAN bus to run the script on")
+        # the mux branch of every send is checked against the values the
+        # script has set by then
+        shadow = {}
+
+        def resolve(msg_id, msg_sigvals):
+            view = ChainMap(shadow, self.sig_vals)
+            msg, sig_dict = self._parse_set_message(msg_id, msg_sigvals, view)
+            shadow[msg.name] = {**view[msg.name], **sig_dict}
+            return msg, sig_dict
+
+        script = CanifScript(lines, resolve)
+        bus = self.buses[self.bus_name]
+        print(f"Running {len(script.steps)} sends over {script.duration:.3f} s")
+        report = script.run(bus.send, self._on_script_sent)
+        self._print_script_report(report)
+        return report
+
+    def _on_script_sent(self, msg, sig_dict):
+        """
+        Keeps the config values and estop frame current after a script send
+        """
+        self.sig_vals[msg.name].update(sig_dict)
+        self._mark_cfg_dirty(msg.name)
+        if self.estop and msg.name == self.estop.message.name:
+            self.estop.update(self.sig_vals[msg.name])
+
+    def _print_script_report(self, report):
+        """
+        Prints the actual against the intended send times of a script run
+        """
+        print(
+            f"script: sends={report['sends']} errors={report['errors']} "
+            f"intended={report['intended_s']} s elapsed={report['elapsed_s']} s"
+        )
+        print(
+            f"\tlate: mean={report['late_mean_ms']} p99={report['late_p99_ms']} "
+            f"max={report['late_max_ms']} ms"
+        )
+        for name, count in report["messages"].items():
+            print(f"\t{name}: {count}")
+
+    def _print_profile_stats(self, args):
+        """
+        Prints the hot path timers and counters, resets them or samples a
+        profile of all threads
+        """
+        if args == ["reset"]:
+            self.profiler.reset()
+            return
+        if args and args[0] == "sample":
+            if len(args) not in (2, 3):
+                raise TypeError("Usage: stats sample <seconds> [path]")
+            path = self.sample_profile(float(args[1]), *args[2:])
+            print(f"Sampling {args[1]} s to {path}")
+            return
+        stats = self.get_profile_stats()
+        for name, timer in stats["timers"].items():
+            print(
+                f"{name}: count={timer['count']} total={timer['total_ms']} ms "
+                f"mean={timer['mean_us']} us max={timer['max_us']} us"
+            )
+        for name, count in stats["counters"].items():
+            print(f"{name}: {count}")
+
+    def _run_profile_command(self, args):
+        """
+        Lists, saves or applies named config profiles
+        """
+        if not args:
+            for name in self.list_profiles():
+                print(name)
+        elif args[0] == "save" and len(args) == 2:
+            self.save_profile(args[1])
+            print(f"Saved profile {args[1]}")
+        elif args[0] == "apply" and len(args) == 2:
+            changed = self.apply_profile(args[1])
+            print(f"Applied profile {args[1]}, sent {len(changed)} messages")
+        else:
+            raise TypeError("Usage: profile [save|apply <name>]")
 
     def _print_help_menu(self):
         print("Command list:")
         print("\th Print help menu")
         print(
             "\ts <msg_id|msg_name> <signal_name val signal_name val ...>\n\
-            Send message (must populate all signals. See 'u')"
+            Send message (must populate all signals of the active mux branch)"
         )
         print("\td Print database")
         print("\tp <msg_id|msg_name> Print message details")
+        print("\tfind <name> Search signals by name, part of it or similar spelling")
         print("\tpp <#> Periodic measurement print period in seconds")
         print("\tdc Print all config messages from database")
         print("\tdm Print all response messages from database")
+        print("\tb Print per bus receive stats")
+        print("\tload <#> Print bus load and the top # talkers")
+        print("\ttrig Print triggers with fired count and latency")
+        print("\testop [stats] Send the emergency stop message or print its latency")
+        print("\trtt [h] Print request/response latency, h adds the histogram")
+        print(
+            "\tstats [reset|sample <seconds> [path]] Print or reset hot path timers,\n\
+            or write a sampled profile of all threads"
+        )
+        print(
+            "\trun <path> Validate and run a command script\n\
+            (s, wait <time>, rate <hz>, repeat <n> ... end), then print timing"
+        )
         print("\tq Quit")
         print("\tsave Save config file with current config")
+        print("\tprofile [save|apply <name>] List, save or apply config profiles")
+        if readline:
+            print("Tab completes commands, message and signal names")
+
+    def _get_completions(self, words, text):
+        """
+        Returns the completions of text after the words already entered
+        """
+        if not words:
+            return [cmd for cmd in self.COMMANDS if cmd.startswith(text)]
+        cmd = words[0]
+        if cmd in ("s", "p") and len(words) == 1:
+            return self.db_index.complete_message(text)
+        if cmd == "s" and len(words) % 2 == 0:
+            # signal names of the message not given yet
+            msg = self.db_index.by_name.get(words[1])
+            if msg is None:
+                return []
+            given = set(words[2::2])
+            return [
+                signal.name
+                for signal in msg.signals
+                if signal.name.startswith(text) and signal.name not in given
+            ]
+        if cmd == "find" and len(words) == 1:
+            return self.db_index.complete_signal(text)
+        return []
+
+    def _complete(self, text, state):
+        """
+        readline completer
+        """
+        if state == 0:
+            line = readline.get_line_buffer()[: readline.get_begidx()]
+            try:
+                self._completions = self._get_completions(line.split(), text)
+            except Exception:
+                self._completions = []
+        if state < len(self._completions):
+            return self._completions[state]
+        return None
+
+    def _setup_completion(self):
+        if not readline:
+            return
+        readline.set_completer(self._complete)
+        readline.set_completer_delims(" ")
+        if "libedit" in (readline.__doc__ or ""):
+            readline.parse_and_bind("bind ^I rl_complete")
+        else:
+            readline.parse_and_bind("tab: complete")
 
     def _get_user_input(self):
         self.ui_running = True
+        self._setup_completion()
         self.periodic.start()
         while self.ui_running:
             try:
@@ -211,10 +468,30 @@ class CanifTerm:
                     self._list_config_signals()
                 elif cmd[0] == "dm":
                     self._list_meas_signals()
+                elif cmd[0] == "b":
+                    self._print_bus_stats()
+                elif cmd[0] == "load":
+                    top = int(cmd[1]) if len(cmd) > 1 else 5
+                    self._print_bus_load(top)
+                elif cmd[0] == "stats":
+                    self._print_profile_stats(cmd[1:])
+                elif cmd[0] == "rtt":
+                    self._print_rtt(histogram=cmd[1:] == ["h"])
+                elif cmd[0] == "trig":
+                    self._print_triggers()
+                elif cmd[0] == "estop":
+                    if cmd[1:] == ["stats"]:
+                        self._print_estop()
+                    else:
+                        self.send_estop("term")
                 elif cmd[0] == "p":
                     if len(cmd) < 2:
                         raise TypeError("Insufficient arguments")
                     self._print_message(cmd[1])
+                elif cmd[0] == "find":
+                    if len(cmd) != 2:
+                        raise TypeError("Usage: find <name>")
+                    self._find_signals(cmd[1])
                 elif cmd[0] == "pp":
                     if len(cmd) != 2:
                         raise TypeError("Update period not given")
@@ -231,10 +508,20 @@ class CanifTerm:
                     if len(cmd) < 4:
                         raise TypeError("Insufficient arguments")
                     self._set_message(cmd[1], cmd[2:])
+                elif cmd[0] == "run":
+                    if len(cmd) != 2:
+                        raise TypeError("Usage: run <path>")
+                    with open(cmd[1]) as f:
+                        self.run_script(f.readlines())
                 elif cmd[0] == "q":
                     self.close()
+                elif cmd[0] == "profile":
+                    self._run_profile_command(cmd[1:])
                 elif cmd[0] == "save":
-                    self.send_save_config_message()
+                    try:
+                        self.send_save_config_message()
+                    except NotImplementedError:
+                        self._write_config_file()
             except Exception as e:
                 print(repr(e))
 
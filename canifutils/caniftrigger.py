@@ -0,0 +1,260 @@
+import ast
+import threading
+import time
+
+
+class CanifTrigger:
+    """
+    A compiled condition on received signals with an action to run when the
+    condition becomes true.
+
+    Conditions are Python expressions on 'Message.Signal' names, e.g.
+    'PHW_Status.PHW_Vbat > 50 and PHW_Status.PHW_mode != 5'.
+    """
+
+    # expression nodes a condition may use
+    ALLOWED_NODES = (
+        ast.Expression,
+        ast.BoolOp,
+        ast.And,
+        ast.Or,
+        ast.UnaryOp,
+        ast.Not,
+        ast.USub,
+        ast.UAdd,
+        ast.BinOp,
+        ast.Add,
+        ast.Sub,
+        ast.Mult,
+        ast.Div,
+        ast.Mod,
+        ast.BitAnd,
+        ast.BitOr,
+        ast.Compare,
+        ast.Eq,
+        ast.NotEq,
+        ast.Lt,
+        ast.LtE,
+        ast.Gt,
+        ast.GtE,
+        ast.Constant,
+        ast.Attribute,
+        ast.Name,
+        ast.Load,
+        ast.Call,
+    )
+    FUNCTIONS = {"abs": abs, "min": min, "max": max}
+
+    def __init__(
+        self,
+        name: str,
+        expression: str,
+        action,
+        sig_vals: dict[str, dict],
+        holdoff: float = 0.0,
+    ):
+        """
+        Initialize CanifTrigger instance. The expression is compiled once.
+
+        Args:
+            name (str): Name of the trigger.
+            expression (str): Condition on 'Message.Signal' names.
+            action (callable): Called as action(trigger, receive_time) when
+                the condition changes from false to true.
+            sig_vals (dict): Signal values the condition is evaluated on.
+            holdoff (float, optional): Minimum seconds between two firings.
+
+        Raises:
+            ValueError: If the expression is invalid or references unknown
+                messages or signals.
+        """
+        self.name: str = name
+        self.expression: str = expression
+        self.action = action
+        self.holdoff: float = holdoff
+        self.msg_names: set[str] = set()
+        self._code = self._compile(expression, sig_vals)
+        # message signal dicts are updated in place, so the namespace is fixed
+        self._namespace: dict = {
+            msg_name: sig_vals[msg_name] for msg_name in self.msg_names
+        }
+        self._state: bool = False
+        # decode workers evaluate concurrently, the edge is taken once
+        self._lock = threading.Lock()
+        self.fired: int = 0
+        self.last_fired: float = 0
+        self.latency_count: int = 0
+        self.latency_total: float = 0.0
+        self.latency_max: float = 0.0
+
+    def _compile(self, expression: str, sig_vals: dict[str, dict]):
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid condition '{expression}': {e}")
+
+        for node in ast.walk(tree):
+            if not isinstance(node, self.ALLOWED_NODES):
+                raise ValueError(f"Invalid condition '{expression}'")
+            if isinstance(node, ast.Call) and not (
+                isinstance(node.func, ast.Name) and node.func.id in self.FUNCTIONS
+            ):
+                raise ValueError(f"Invalid function in condition '{expression}'")
+
+        trigger = self
+
+        class SignalRewriter(ast.NodeTransformer):
+            # Message.Signal -> Message["Signal"]
+            def visit_Attribute(self, node):
+                if not isinstance(node.value, ast.Name):
+                    raise ValueError(f"Invalid signal in condition '{expression}'")
+                msg_name, sig_name = node.value.id, node.attr
+                if sig_name not in sig_vals.get(msg_name, {}):
+                    raise ValueError(f"Unknown signal '{msg_name}.{sig_name}'")
+                trigger.msg_names.add(msg_name)
+                return ast.copy_location(
+                    ast.Subscript(
+                        value=ast.Name(id=msg_name, ctx=ast.Load()),
+                        slice=ast.Constant(value=sig_name),
+                        ctx=ast.Load(),
+                    ),
+                    node,
+                )
+
+        tree = ast.fix_missing_locations(SignalRewriter().visit(tree))
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Name)
+                and node.id not in self.msg_names
+                and node.id not in self.FUNCTIONS
+            ):
+                raise ValueError(f"Unknown name '{node.id}' in '{expression}'")
+        if not self.msg_names:
+            raise ValueError(f"Condition '{expression}' references no signals")
+        return compile(tree, f"<trigger {self.name}>", "eval")
+
+    def evaluate(self, now: float) -> None:
+        """
+        Evaluate the condition and run the action on a false to true edge.
+
+        Args:
+            now (float): Receive time of the frame that updated the signals.
+        """
+        with self._lock:
+            state = bool(
+                eval(self._code, {"__builtins__": self.FUNCTIONS}, self._namespace)
+            )
+            edge = state and not self._state
+            self._state = state
+            if not edge or (self.fired and now - self.last_fired < self.holdoff):
+                return
+            self.fired += 1
+            self.last_fired = now
+
+        try:
+            self.action(self, now)
+        except Exception as e:
+            print(f"Trigger {self.name}: {repr(e)}")
+        latency = time.time() - now
+        with self._lock:
+            self.latency_count += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def get_stats(self) -> dict:
+        """
+        Returns how often the trigger fired and the latency from receiving the
+        frame to completing the action.
+
+        Returns:
+            dict: {'name', 'expression', 'fired', 'latency_mean_ms',
+                   'latency_max_ms'}
+        """
+        mean = self.latency_total / self.latency_count if self.latency_count else 0
+        return {
+            "name": self.name,
+            "expression": self.expression,
+            "fired": self.fired,
+            "latency_mean_ms": round(1000 * mean, 3),
+            "latency_max_ms": round(1000 * self.latency_max, 3),
+        }
+
+
+class CanifTriggerEngine:
+    """
+    Evaluates triggers in the receive path.
+
+    Triggers are indexed by the messages their conditions reference, so a
+    received message only evaluates the triggers that depend on it.
+    """
+
+    def __init__(self, sig_vals: dict[str, dict]):
+        """
+        Initialize CanifTriggerEngine instance.
+
+        Args:
+            sig_vals (dict): Signal values the conditions are evaluated on.
+        """
+        self.sig_vals: dict[str, dict] = sig_vals
+        self.triggers: list[CanifTrigger] = []
+        self._by_msg: dict[str, list[CanifTrigger]] = {}
+        # (time, trigger name) of 'marker' actions
+        self.markers: list[tuple[float, str]] = []
+
+    def add(
+        self,
+        expression: str,
+        action,
+        name: str = None,
+        holdoff: float = 0.0,
+    ) -> CanifTrigger:
+        """
+        Compile and add a trigger.
+
+        Args:
+            expression (str): Condition on 'Message.Signal' names.
+            action (callable): Called as action(trigger, receive_time).
+            name (str, optional): Name of the trigger.
+            holdoff (float, optional): Minimum seconds between two firings.
+
+        Returns:
+            CanifTrigger: The added trigger.
+        """
+        trigger = CanifTrigger(
+            name=name or f"trigger{len(self.triggers)}",
+            expression=expression,
+            action=action,
+            sig_vals=self.sig_vals,
+            holdoff=holdoff,
+        )
+        self.triggers.append(trigger)
+        for msg_name in trigger.msg_names:
+            self._by_msg.setdefault(msg_name, []).append(trigger)
+        return trigger
+
+    def on_decoded(self, msg_name: str, now: float) -> None:
+        """
+        Evaluate the triggers that reference a message after it was decoded.
+
+        Args:
+            msg_name (str): Name of the decoded message.
+            now (float): Receive time of the frame.
+        """
+        triggers = self._by_msg.get(msg_name)
+        if not triggers:
+            return
+        for trigger in triggers:
+            trigger.evaluate(now)
+
+    def add_marker(self, trigger: CanifTrigger, now: float) -> None:
+        """
+        Trigger action that records a marker with the receive time.
+        """
+        self.markers.append((now, trigger.name))
+        print(f"Marker {trigger.name} at {time.strftime('%H:%M:%S')}")
+
+    def get_stats(self) -> list[dict]:
+        """
+        Returns the stats of every trigger.
+        """
+        return [trigger.get_stats() for trigger in self.triggers]
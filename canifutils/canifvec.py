@@ -0,0 +1,112 @@
+import cantools
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CanifVecDecoder:
+    """
+    Decodes a batch of frames of one message at once.
+
+    When only the latest values are needed, only the last frame is decoded.
+    Otherwise signals are extracted from all frames with numpy shifts and
+    masks on the 64 bit payload words, little endian signals from the little
+    endian word and big endian signals from the byte swapped word. Small
+    batches, messages numpy can't decode exactly (multiplexed, float
+    signals, integers longer than 52 bits, payloads longer than 8 bytes) and
+    installs without numpy are decoded frame by frame with cantools.
+    """
+
+    # smallest batch worth the numpy call overhead
+    MIN_VECTOR_FRAMES = 8
+
+    def __init__(self, message: cantools.database.can.Message):
+        """
+        Initialize CanifVecDecoder instance.
+
+        Args:
+            message (cantools.database.can.Message): Message to decode.
+        """
+        self.message: cantools.database.can.Message = message
+        self.names: tuple[str, ...] = tuple(signal.name for signal in message.signals)
+        self.vectorized: bool = (
+            np is not None
+            and message.length <= 8
+            and not message.is_multiplexed()
+            and all(
+                not signal.is_float and signal.length <= 52
+                for signal in message.signals
+            )
+        )
+        # (shift, mask, big endian, sign threshold, scale, offset, integer)
+        self._fields: list[tuple] = []
+        if self.vectorized:
+            for signal in message.signals:
+                self._fields.append(
+                    (
+                        np.uint64(self._shift(signal)),
+                        np.uint64((1 << signal.length) - 1),
+                        signal.byte_order == "big_endian",
+                        1 << (signal.length - 1) if signal.is_signed else 0,
+                        signal.scale,
+                        signal.offset,
+                        isinstance(signal.scale, int)
+                        and isinstance(signal.offset, int),
+                    )
+                )
+
+    @staticmethod
+    def _shift(signal: cantools.database.can.Signal) -> int:
+        """
+        Returns the position of the signal LSB in the payload word.
+        """
+        if signal.byte_order == "little_endian":
+            return signal.start
+        # cantools numbers the MSB of big endian signals in sawtooth order
+        msb = (signal.start // 8) * 8 + (7 - signal.start % 8)
+        return 64 - msb - signal.length
+
+    def decode(self, datas: list[bytes], rows: bool = False) -> tuple[dict, list]:
+        """
+        Decode the payloads of a batch of frames.
+
+        Args:
+            datas (list): Payloads in receive order.
+            rows (bool, optional): Also return the values of every frame.
+
+        Returns:
+            tuple: ({signal_name: value} of the last frame,
+                    [[value per signal name] per frame] or None)
+        """
+        if not rows:
+            return self.message.decode(datas[-1], decode_choices=False), None
+        if not self.vectorized or len(datas) < self.MIN_VECTOR_FRAMES:
+            decoded = [
+                self.message.decode(data, decode_choices=False) for data in datas
+            ]
+            return decoded[-1], [
+                [row.get(name) for name in self.names] for row in decoded
+            ]
+
+        payload = b"".join(bytes(data).ljust(8, b"\0") for data in datas)
+        words_le = np.frombuffer(payload, dtype="<u8")
+        words_be = None
+        values = np.empty((len(datas), len(self.names)))
+        for i, (shift, mask, big, sign, scale, offset, _) in enumerate(self._fields):
+            if big:
+                if words_be is None:
+                    words_be = words_le.byteswap()
+                raw = (words_be >> shift) & mask
+            else:
+                raw = (words_le >> shift) & mask
+            if sign:
+                raw = raw.astype(np.int64)
+                raw = np.where(raw >= sign, raw - 2 * sign, raw)
+            values[:, i] = raw * scale + offset
+
+        latest = {}
+        for name, value, field in zip(self.names, values[-1].tolist(), self._fields):
+            latest[name] = int(value) if field[6] else value
+        return latest, values.tolist()
@@ -14,6 +14,8 @@ setup(
         "console_scripts": [
             "canif=canifutils.canif_cli:main",
             "canlogdecode=canifutils.canif_csvdecoder:main",
+            "canifbench=canifutils.canifbench:main",
+            "canifrecord=canifutils.canifrecord:main",
         ],
     },
     license="MIT",
@@ -0,0 +1,81 @@
+import base64
+from pathlib import Path
+
+import cantools
+import pandas as pd
+import pytest
+
+from canifutils.canif_csvdecoder import CanifCsvDecoder
+
+DBC = Path(__file__).resolve().parent.parent / "SSB.dbc"
+
+HEADER = "timestamp,arbitration_id,extended,remote,error,dlc,data\n"
+
+
+def row(ts: float, frame_id: int, data: bytes) -> str:
+    payload = base64.b64encode(data).decode()
+    return f"{ts:.6f},{frame_id:#x},0,0,0,{len(data)},{payload}\n"
+
+
+def baseline_decode(dbc, log, enum: int = 0) -> pd.DataFrame:
+    # one table of the whole log, frame by frame, like the decoder always did
+    database = cantools.database.load_file(dbc)
+    decoded_rows = []
+    for _, frame in pd.read_csv(log).iterrows():
+        arbitration_id = int(frame["arbitration_id"], 16) - enum
+        message = database.get_message_by_frame_id(arbitration_id)
+        decoded_rows.append(
+            {
+                "timestamp": frame["timestamp"],
+                "arbitration_id": hex(arbitration_id + enum),
+                **message.decode(base64.b64decode(frame["data"])),
+            }
+        )
+    return pd.DataFrame(decoded_rows)
+
+
+@pytest.fixture
+def log(tmp_path):
+    # PHW_rx_mode 115 and 7 have no choice name, 2 has, so the column is
+    # float next to missing values in some chunks and names in others
+    modes = [115, None, None, 2, None, 7, None, None, 115, 1]
+    lines = []
+    for i, mode in enumerate(modes):
+        if mode is None:
+            lines.append(row(i / 10, 0x400, bytes([0, i, 1, 2, 3, 4, 5, 6])))
+        else:
+            lines.append(row(i / 10, 0x100, bytes([mode, i % 2])))
+    path = tmp_path / "log.csv"
+    path.write_text(HEADER + "".join(lines))
+    return path
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 100000])
+def test_decode_in_chunks_matches_baseline(log, tmp_path, chunksize):
+    expected = tmp_path / "expected.csv"
+    baseline_decode(DBC, log).to_csv(expected, index=False)
+
+    decoder = CanifCsvDecoder(str(DBC), str(log))
+    decoder.decode(chunksize)
+    out = tmp_path / "out.csv"
+    decoder.to_csv(str(out))
+
+    assert out.read_text() == expected.read_text()
+    assert ",115," in out.read_text()
+
+
+@pytest.mark.parametrize("chunksize", [1, 3])
+def test_incremental_decode_matches_baseline(log, tmp_path, chunksize):
+    lines = log.read_text().splitlines(keepends=True)
+    log.write_text("".join(lines[:4]))
+    out = tmp_path / "out.csv"
+    decoder = CanifCsvDecoder(str(DBC), str(log))
+    decoder.decode_incremental(str(out), chunksize=chunksize)
+
+    with open(log, "a") as f:
+        f.writelines(lines[4:])
+    decoder.decode_incremental(str(out), chunksize=chunksize)
+
+    expected = tmp_path / "expected.csv"
+    baseline_decode(DBC, log).to_csv(expected, index=False)
+    assert out.read_text() == expected.read_text()
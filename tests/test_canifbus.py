@@ -0,0 +1,141 @@
+import functools
+import time
+from pathlib import Path
+
+import can
+import cantools
+import pytest
+
+from canifutils.canif import Canif
+from canifutils.canifbus import CanifBus
+from canifutils.caniffault import CanifFaultBus
+
+DBC = Path(__file__).resolve().parent.parent / "SSB.dbc"
+
+
+class SendOffBus(CanifFaultBus):
+    """
+    Opens and receives, but fails to send until send_off_until, like a
+    socketcan bus during bus-off.
+    """
+
+    send_off_until: float = 0
+
+    def send(self, msg: can.Message, timeout: float = None) -> None:
+        if time.monotonic() < self.send_off_until:
+            raise can.CanOperationError("Send failed, bus-off")
+        super().send(msg, timeout)
+
+
+@pytest.fixture
+def database():
+    return cantools.database.load_file(DBC)
+
+
+def make_bus(database, name, bus, bus_factory=None, tx_queue_size=3) -> CanifBus:
+    sig_dict = {}
+    Canif.init_sig_dict(sig_dict=sig_dict, db=database)
+    canif_bus = CanifBus(
+        name,
+        bus,
+        database,
+        sig_dict,
+        node="PHW_CTLR",
+        bus_factory=bus_factory,
+        tx_queue_size=tx_queue_size,
+    )
+    canif_bus.BACKOFF_MIN = 0.01
+    canif_bus.BACKOFF_MAX = 0.04
+    return canif_bus
+
+
+def wait_up(canif_bus: CanifBus, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = canif_bus.get_fault_stats()
+        if stats["state"] == "up" and stats["recoveries"]:
+            return stats
+        time.sleep(0.01)
+    raise AssertionError(f"Bus didn't recover: {canif_bus.get_fault_stats()}")
+
+
+def frames(count: int) -> list[can.Message]:
+    return [
+        can.Message(arbitration_id=0x100 + i, data=bytes([i])) for i in range(count)
+    ]
+
+
+def received_ids(observer: can.BusABC) -> list[int]:
+    ids = []
+    while msg := observer.recv(0.2):
+        ids.append(msg.arbitration_id)
+    return ids
+
+
+@pytest.mark.parametrize("reopen", [True, False], ids=["factory", "polling"])
+def test_bus_off_holds_and_flushes_frames_in_order(database, reopen):
+    channel = f"fault_{reopen}"
+    factory = functools.partial(CanifFaultBus, channel, interface="virtual")
+    bus = factory()
+    canif_bus = make_bus(database, "main", bus, factory if reopen else None)
+    with can.Bus(interface="virtual", channel=channel) as observer:
+        canif_bus.start()
+        CanifFaultBus.bus_off(channel, 0.3)
+        for msg in frames(5):
+            canif_bus.send(msg)
+
+        stats = wait_up(canif_bus)
+        canif_bus.stop()
+        bus.shutdown()
+
+        # the oldest held frames are dropped beyond tx_queue_size
+        assert received_ids(observer) == [0x102, 0x103, 0x104]
+    assert stats["faults"] == 1
+    assert stats["recoveries"] == 1
+    assert stats["tx_dropped"] == 2
+    assert stats["tx_held"] == 0
+    assert 0.2 <= stats["downtime_s"] < 5
+
+
+def test_failed_flush_backs_off(database, capsys):
+    channel = "fault_flush"
+    factory = functools.partial(SendOffBus, channel, interface="virtual")
+    bus = factory()
+    canif_bus = make_bus(database, "main", bus, factory)
+    canif_bus.start()
+    # every retry also waits for the notifier thread to stop
+    SendOffBus.send_off_until = time.monotonic() + 2.5
+    canif_bus.send(frames(1)[0])
+
+    stats = wait_up(canif_bus)
+    canif_bus.stop()
+    bus.shutdown()
+
+    delays = [
+        float(line.split("retry in ")[1].split(" s")[0])
+        for line in capsys.readouterr().out.splitlines()
+        if "retry in" in line
+    ]
+    # doubled after every failed flush, not reset
+    assert delays[:2] == [0.01, 0.02]
+    assert delays == sorted(delays)
+    assert stats["faults"] == 1
+    assert stats["recoveries"] == 1
+
+
+def test_listener_error_keeps_bus_up(database, capsys):
+    class FullDisk(can.Listener):
+        def on_message_received(self, msg: can.Message) -> None:
+            raise OSError(28, "No space left on device")
+
+    with can.Bus(interface="virtual", channel="fault_listener") as bus:
+        canif_bus = make_bus(database, "main", bus)
+        canif_bus.start([FullDisk()])
+        with can.Bus(interface="virtual", channel="fault_listener") as sender:
+            sender.send(can.Message(arbitration_id=0x400, data=bytes(8)))
+            time.sleep(0.2)
+        canif_bus.stop()
+
+    assert canif_bus.get_fault_stats()["faults"] == 0
+    assert canif_bus.listener.profiler.get_stats()["counters"]["listener_errors"] == 1
+    assert "listener error" in capsys.readouterr().out
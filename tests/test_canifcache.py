@@ -0,0 +1,170 @@
+import base64
+
+import pytest
+
+from canifutils.canif_csvdecoder import CanifCsvDecoder
+
+DBC = """VERSION ""
+
+NS_ :
+
+BS_:
+
+BU_: NODE
+
+BO_ 256 MSG_A: 2 NODE
+ SG_ A_count : 0|8@1+ (1,0) [0|255] "" NODE
+ SG_ A_mode : 8|8@1+ (1,0) [0|255] "" NODE
+
+BO_ 512 MSG_B: 2 NODE
+ SG_ B_volts : 0|16@1+ (0.1,0) [0|6553.5] "V" NODE
+
+VAL_ 256 A_mode 0 "IDLE" 1 "RUN" ;
+"""
+
+HEADER = "timestamp,arbitration_id,extended,remote,error,dlc,data\n"
+
+CHUNKSIZE = 2
+
+
+def row(ts: float, frame_id: int, data: bytes) -> str:
+    payload = base64.b64encode(data).decode()
+    return f"{ts:.6f},{frame_id:#x},0,0,0,{len(data)},{payload}\n"
+
+
+def rows_a(start: int, count: int) -> list[str]:
+    return [row(i / 10, 0x100, bytes([i % 256, i % 2])) for i in range(start, count)]
+
+
+def rows_b(start: int, count: int) -> list[str]:
+    return [
+        row(i / 10 + 0.05, 0x200, (i * 7).to_bytes(2, "little"))
+        for i in range(start, count)
+    ]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    dbc = tmp_path / "test.dbc"
+    dbc.write_text(DBC)
+    return dbc, tmp_path / "log.csv", tmp_path / "out.csv"
+
+
+def write_log(path, lines: list[str], mode: str = "w") -> None:
+    with open(path, mode) as f:
+        if mode == "w":
+            f.write(HEADER)
+        f.writelines(lines)
+
+
+def decode(dbc, log, out, enum: int = 0) -> int:
+    return CanifCsvDecoder(str(dbc), str(log), enum).decode_incremental(
+        str(out), chunksize=CHUNKSIZE
+    )
+
+
+def full_decode(dbc, log, tmp_path, enum: int = 0) -> str:
+    expected = tmp_path / "expected.csv"
+    decoder = CanifCsvDecoder(str(dbc), str(log), enum)
+    decoder.decode()
+    decoder.to_csv(str(expected))
+    return expected.read_text()
+
+
+def test_append_decodes_only_new_rows(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 5))
+    assert decode(dbc, log, out) == 5
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+    write_log(log, rows_a(5, 8), "a")
+    # the partial chunk of the first run is decoded again
+    assert decode(dbc, log, out) == 4
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_append_integers_to_float_columns(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 4) + rows_b(0, 4))
+    decode(dbc, log, out)
+
+    write_log(log, rows_a(4, 10), "a")
+    assert decode(dbc, log, out) == 6
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_integer_column_turned_float_decodes_from_start(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 4))
+    decode(dbc, log, out)
+
+    write_log(log, rows_b(0, 4), "a")
+    assert decode(dbc, log, out) == 8
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_incomplete_last_line_is_left_for_next_run(paths, tmp_path):
+    dbc, log, out = paths
+    line = rows_a(4, 5)[0]
+    write_log(log, rows_a(0, 4) + [line[:10]])
+    assert decode(dbc, log, out) == 4
+
+    write_log(log, [line[10:]], "a")
+    assert decode(dbc, log, out) == 1
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_dbc_change_decodes_from_start(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 4))
+    decode(dbc, log, out)
+
+    dbc.write_text(DBC.replace('"RUN"', '"ACTIVE"'))
+    write_log(log, rows_a(4, 6), "a")
+    assert decode(dbc, log, out) == 6
+    assert "ACTIVE" in out.read_text()
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_enum_change_decodes_from_start(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 4))
+    decode(dbc, log, out)
+
+    write_log(log, [row(1.0, 0x101, bytes([1, 0]))], "a")
+    assert decode(dbc, log, out, enum=1) == 1
+    assert out.read_text() == full_decode(dbc, log, tmp_path, enum=1)
+
+
+def test_rotated_log_decodes_from_start(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 6))
+    decode(dbc, log, out)
+
+    # a new log of the same size with other content
+    log.unlink()
+    write_log(log, rows_a(10, 16))
+    assert decode(dbc, log, out) == 6
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_truncated_log_decodes_from_start(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 6))
+    decode(dbc, log, out)
+
+    write_log(log, rows_a(0, 3))
+    assert decode(dbc, log, out) == 3
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
+
+
+def test_changed_output_decodes_from_start(paths, tmp_path):
+    dbc, log, out = paths
+    write_log(log, rows_a(0, 4))
+    decode(dbc, log, out)
+
+    with open(out, "a") as f:
+        f.write("edited\n")
+    write_log(log, rows_a(4, 5), "a")
+    assert decode(dbc, log, out) == 5
+    assert out.read_text() == full_decode(dbc, log, tmp_path)
@@ -0,0 +1,24 @@
+import time
+from pathlib import Path
+
+import can
+import pytest
+
+from canifutils.canifproc import CanifDecodeProcess
+
+DBC = Path(__file__).resolve().parent.parent / "SSB.dbc"
+
+
+def test_exited_process_raises_on_poll_and_send():
+    process = CanifDecodeProcess({"interface": "no_such_interface"}, DBC)
+    process.start()
+    deadline = time.monotonic() + 30
+    while process._process.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    with pytest.raises(can.CanOperationError, match="exited"):
+        process.poll()
+    with pytest.raises(can.CanOperationError, match="exited"):
+        process.send(can.Message(arbitration_id=0x100))
+    process.stop()
+    assert process.poll() == []
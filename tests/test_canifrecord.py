@@ -0,0 +1,39 @@
+import sqlite3
+
+from canifutils.canifrecord import CanifRecorder, CanifRecordReader
+
+
+def test_failed_flush_keeps_rows(tmp_path):
+    path = tmp_path / "record.db"
+    recorder = CanifRecorder(path)
+    sig_vals = {"MSG": {"value": 1.0, "mode": "IDLE"}}
+    hook = recorder.watch(sig_vals, ["MSG"])
+
+    # fail every insert while the block table has a row
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE block (x)")
+        conn.execute("INSERT INTO block VALUES (1)")
+        conn.execute(
+            "CREATE TRIGGER fail BEFORE INSERT ON samples "
+            "WHEN EXISTS (SELECT 1 FROM block) "
+            "BEGIN SELECT RAISE(ABORT, 'blocked'); END"
+        )
+    hook("MSG", 1.0)
+    recorder._flush()
+    stats = recorder.get_stats()
+    assert stats["flush_errors"] == 1
+    assert stats["pending"] == 2
+    assert stats["written"] == 0
+
+    sig_vals["MSG"]["mode"] = "RUN"
+    hook("MSG", 2.0)
+    with conn:
+        conn.execute("DELETE FROM block")
+    conn.close()
+    recorder.close()
+
+    assert recorder.get_stats()["written"] == 3
+    reader = CanifRecordReader(path)
+    assert reader.query("MSG.mode") == [(1.0, "IDLE"), (2.0, "RUN")]
+    assert reader.query("MSG.value") == [(1.0, 1.0)]
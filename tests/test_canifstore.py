@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import can
+import cantools
+import pytest
+
+from canifutils.canif import Canif
+from canifutils.caniflistener import CanifListener
+from canifutils.canifstore import CanifMsgValues, CanifSignalStore
+
+DBC = Path(__file__).resolve().parent.parent / "SSB.dbc"
+
+
+@pytest.fixture
+def database():
+    return cantools.database.load_file(DBC)
+
+
+@pytest.fixture
+def sig_dict(database):
+    sig_dict = {}
+    Canif.init_sig_dict(sig_dict=sig_dict, db=database)
+    return sig_dict
+
+
+def status_frame(database, **values) -> can.Message:
+    message = database.get_message_by_name("PHW_Status")
+    signals = {signal.name: 0 for signal in message.signals}
+    signals.update(values)
+    return can.Message(
+        arbitration_id=message.frame_id,
+        data=message.encode(signals),
+        timestamp=1.0,
+    )
+
+
+def test_listener_on_original_dict_updates_canif(database, sig_dict):
+    with can.Bus(interface="virtual", channel="test_store") as bus:
+        canif = Canif(
+            sig_vals=sig_dict,
+            vitals_msgs=None,
+            database=database,
+            node="PHW_CTLR",
+            bus=bus,
+            use_term=True,
+        )
+        listener = CanifListener(
+            sig_vals=sig_dict, database=database, rx_msg_stats=canif.rx_msg_stats
+        )
+        listener.on_message_received(status_frame(database, PHW_Vpv=42))
+
+        assert canif.sig_vals["PHW_Status"]["PHW_Vpv"] == 42
+        assert canif.sig_vals["PHW_Status"] is sig_dict["PHW_Status"]
+        canif.stop_buses()
+
+
+def test_wrap_shares_records_with_dict(database, sig_dict):
+    store = CanifSignalStore.wrap(sig_dict, database)
+    assert CanifSignalStore.wrap(store) is store
+    assert all(isinstance(record, CanifMsgValues) for record in sig_dict.values())
+
+    sig_dict["PHW_rx_Command"]["PHW_rx_mode"] = 2
+    assert store["PHW_rx_Command"]["PHW_rx_mode"] == 2
+    # a second store made from the dict keeps the same records
+    again = CanifSignalStore.wrap(sig_dict, database)
+    assert again["PHW_rx_Command"] is store["PHW_rx_Command"]
+
+
+def test_msg_values_keep_int_and_text_values(database, sig_dict):
+    store = CanifSignalStore.wrap(sig_dict, database)
+    values = store["PHW_Status"]
+    values["PHW_Vbat"] = 5
+    assert type(values["PHW_Vbat"]) is int
+    values["PHW_Vbat"] = 5.5
+    assert values["PHW_Vbat"] == 5.5
+    values["PHW_mode"] = "IDLE"
+    assert values["PHW_mode"] == "IDLE"
+    assert values["PHW_Vbat"] == 5.5